@@ -7,25 +7,28 @@ st.set_page_config(page_title="Listings Consistency Agent", page_icon="🧭", la
 ensure_db()
 
 st.title("Listings Consistency Agent")
-st.write("Use the sidebar to navigate: **Dashboard**, **Client Manager**, **XPath Manager**.")
+st.write("Use the sidebar to navigate: **Dashboard**, **Client Manager**, **XPath Manager**, **Portfolio Report**.")
 
 st.markdown(
     """
 - **Dashboard** scans live pages and compares to your SSOT.
 - **Client Manager** adds/edits clients, their SSOT, and 5 listing URLs.
 - **XPath Manager** manages multiple XPaths per site/field and lets you **test** them.
+- **Portfolio Report** shows match rates across all clients, the worst offenders, and changes since the last scan.
     """
 )
 
 st.divider()
 st.subheader("Quick Links")
-cols = st.columns(3)
+cols = st.columns(4)
 with cols[0]:
     st.page_link("pages/01_📊_Dashboard.py", label="📊 Go to Dashboard")
 with cols[1]:
     st.page_link("pages/02_👤_Client_Manager.py", label="👤 Go to Client Manager")
 with cols[2]:
     st.page_link("pages/03_🧭_XPath_Manager.py", label="🧭 Go to XPath Manager")
+with cols[3]:
+    st.page_link("pages/04_📈_Portfolio_Report.py", label="📈 Go to Portfolio Report")
 
 st.divider()
 st.caption("Respect each site's Terms and robots.txt. XPaths here are user-configurable and may require updates as sites evolve.")
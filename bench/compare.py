@@ -0,0 +1,55 @@
+import sys, json, argparse
+from typing import Dict, Any, List, Optional
+
+# Diff two bench.run reports: python -m bench.compare base.json new.json [--threshold 10]
+# Exit status 1 when any tracked metric regressed by more than the threshold (for CI).
+LOWER_IS_BETTER = {"mean_ms", "p50_ms", "p90_ms", "p99_ms", "py_peak_mb", "rss_peak_mb"}
+HIGHER_IS_BETTER = {"ops_per_s", "pages_per_s"}
+
+def flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        path = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(flatten(v, path))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool) and k in LOWER_IS_BETTER | HIGHER_IS_BETTER:
+            out[path] = float(v)
+    return out
+
+def diff(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    a, b = flatten(base.get("benchmarks", {})), flatten(new.get("benchmarks", {}))
+    rows = []
+    for path in sorted(a.keys() & b.keys()):
+        old, cur = a[path], b[path]
+        if not old:
+            continue
+        change = (cur - old) / old * 100
+        worse = change if path.rsplit(".", 1)[-1] in LOWER_IS_BETTER else -change
+        rows.append({"metric": path, "base": old, "new": cur, "change_pct": round(change, 1),
+                     "regression": worse > threshold})
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.compare", description="Compare two benchmark reports")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    p.add_argument("--all", action="store_true", help="list every metric, not just regressions/improvements")
+    args = p.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows = diff(base, new, args.threshold)
+    print(f"base {base['meta'].get('commit')} ({base['meta'].get('lxml')})  ->  new {new['meta'].get('commit')} ({new['meta'].get('lxml')})")
+    for r in rows:
+        if args.all or r["regression"] or abs(r["change_pct"]) > args.threshold:
+            flag = "REGRESSION" if r["regression"] else ("improved" if abs(r["change_pct"]) > args.threshold else "")
+            print(f"{r['metric']:<60} {r['base']:>12.3f} {r['new']:>12.3f} {r['change_pct']:>+8.1f}%  {flag}")
+    regressions = sum(r["regression"] for r in rows)
+    print(f"{len(rows)} metrics compared, {regressions} regression(s) over {args.threshold:g}%")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import os, sys, gc, json, time, platform, argparse, tempfile, subprocess, tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Optional
+
+try:
+    import resource  # peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+import lxml.etree
+
+from src import storage, page_cache, engine, metrics, parse_pool
+from src.engine import HostScheduler
+from src.scraper import to_doc, extract_field, scan_clients
+from src.matching import compare, similar, KEY_FUNCS
+from src.hours import parse_hours
+from src.utils import FIELDS, SITES
+from bench.server import start_server, load_fixtures, inflate
+
+# Offline benchmarks over the recorded pages in bench/fixtures:
+#   python -m bench.run                               # everything, results in bench/results/<time>-<commit>.json
+#   python -m bench.run --only to_doc,extract_field --iterations 500
+#   python -m bench.compare bench/results/old.json bench/results/new.json
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BENCHES = ["to_doc", "extract_field", "compare", "scan_client"]
+
+# fixture name -> site whose XPaths apply (Yelp has one fixture per page type)
+FIXTURE_SITES = {
+    "google": "google", "apple": "apple", "bing": "bing", "yahoo": "yahoo",
+    "yelp_modern": "yelp", "yelp_legacy": "yelp",
+}
+SITE_FIXTURES = {"google": "google", "apple": "apple", "bing": "bing", "yelp": "yelp_modern", "yahoo": "yahoo"}
+
+SSOT = {
+    "name": "Acme Dental Care",
+    "address": "123 North Main Street, Suite 4B, Springfield, Illinois 62704",
+    "phone": "217-555-0142",
+    "website": "https://acmedental.example",
+    "hours": "Mon-Wed 8am-5pm, Thu 8am-7pm, Fri 8am-3pm",
+}
+# Extracted-value variants per field: exact, formatting-only and genuine mismatches
+COMPARE_CASES = {
+    "name": ["Acme Dental Care", "ACME Dental Care, LLC", "Acme Dental", "Zenith Family Dentistry"],
+    "address": ["123 N Main St, Suite 4B, Springfield, IL 62704", "123 North Main St. #4B Springfield IL 62704-1234",
+                "125 N Main St, Springfield, IL 62704", "9 Elm Ave, Shelbyville, IL 62565"],
+    "phone": ["(217) 555-0142", "+1 217-555-0142", "217.555.0199", "555-0142"],
+    "website": ["https://www.acmedental.example/", "http://acmedental.example", "https://acmedental.example/contact",
+                "https://other.example/"],
+    "hours": ["Monday 8AM–5PM Tuesday 8AM–5PM Wednesday 8AM–5PM Thursday 8AM–7PM Friday 8AM–3PM Saturday Closed Sunday Closed",
+              "Mon–Wed 8:00–17:00; Thu 8:00–19:00; Fri 8:00–15:00", "Mon-Fri 9-5", "Open 24 hours"],
+}
+
+def stats(samples: List[float], items: int = 0, wall: float = 0.0) -> Dict[str, Any]:
+    # Latency percentiles in ms; throughput from wall time when given (concurrent runs), else from the sample sum
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+    pct = lambda p: s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))] * 1000
+    total = wall or sum(s)
+    return {
+        "n": len(s),
+        "mean_ms": round(sum(s) / len(s) * 1000, 4),
+        "p50_ms": round(pct(50), 4),
+        "p90_ms": round(pct(90), 4),
+        "p99_ms": round(pct(99), 4),
+        "max_ms": round(s[-1] * 1000, 4),
+        "ops_per_s": round((items or len(s)) / total, 2) if total else None,
+    }
+
+def timed(fn: Callable[[], Any], iterations: int, warmup: int = 3) -> List[float]:
+    for _ in range(min(warmup, iterations)):
+        fn()
+    out = []
+    for _ in range(iterations):
+        t = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t)
+    return out
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def measure(fn: Callable[[], Dict[str, Any]], trace_memory: bool = False) -> Dict[str, Any]:
+    # Timed pass first; with trace_memory, a second pass under tracemalloc reports the Python-heap peak (tracing
+    # slows everything down, so it never overlaps the timings). Peak RSS also covers libxml2's C heap but is a
+    # process-wide high-water mark, so it only grows across benchmarks.
+    gc.collect()
+    t = time.perf_counter()
+    out = {"results": fn(), "wall_s": 0.0, "rss_peak_mb": None, "py_peak_mb": None}
+    out["wall_s"] = round(time.perf_counter() - t, 3)
+    out["rss_peak_mb"] = peak_rss_mb()
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            out["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        finally:
+            tracemalloc.stop()
+    return out
+
+def bench_to_doc(pages: Dict[str, str], iterations: int) -> Dict[str, Any]:
+    return {name: stats(timed(lambda: to_doc(text), iterations)) for name, text in pages.items()}
+
+def bench_extract_field(pages: Dict[str, str], iterations: int) -> Dict[str, Any]:
+    out = {}
+    for name, text in pages.items():
+        site, doc = FIXTURE_SITES[name], to_doc(text)
+        out[name] = {field: stats(timed(lambda: extract_field(site, field, doc), iterations)) for field in FIELDS}
+        out[name]["all_fields"] = stats(timed(lambda: [extract_field(site, f, doc) for f in FIELDS], iterations))
+    return out
+
+def _clear_match_caches():
+    for fn in (*KEY_FUNCS.values(), similar, parse_hours):
+        if hasattr(fn, "cache_clear"):
+            fn.cache_clear()
+
+def bench_compare(iterations: int) -> Dict[str, Any]:
+    # cold: key/similarity caches cleared before every sample (first sighting of a value); warm: repeats hit them
+    out = {}
+    for field, values in COMPARE_CASES.items():
+        key = "href" if field == "website" else "value"
+        cold = []
+        for i in range(iterations):
+            ext = {key: values[i % len(values)]}
+            _clear_match_caches()
+            t = time.perf_counter()
+            compare(field, ext, SSOT)
+            cold.append(time.perf_counter() - t)
+        i = iter(range(10 ** 9))
+        warm = timed(lambda: compare(field, {key: values[next(i) % len(values)]}, SSOT), iterations)
+        out[field] = {"cold": stats(cold), "warm": stats(warm)}
+    return out
+
+def bench_scan(base_url: str, levels: List[int], clients: int, parse_workers: int = 0) -> Dict[str, Any]:
+    # Full pipeline (fetch -> parse -> extract -> compare) per client against the local server; each level runs
+    # `level` scan_client calls at a time over a scheduler allowing `level` requests in flight, no politeness spacing.
+    # parse_workers > 0 moves parse/extract onto a process pool of that size (spawned before timing starts).
+    host = base_url.split("://", 1)[1]
+    parser = parse_pool.ParsePool(parse_workers) if parse_workers > 0 else None
+    if parser:
+        parser.warm_up()  # spawn the workers outside the timed region
+    out = {}
+    for level in levels:
+        sched = HostScheduler(limits={host: {"concurrency": level, "min_interval": 0.0}})
+        batch = [{"id": None, "name": f"bench-{level}-{i}",
+                  **{f"url_{site}": f"{base_url}/{SITE_FIXTURES[site]}/{level}-{i}" for site in SITES}}
+                 for i in range(clients)]
+        errors = []
+
+        def one(client):
+            t = time.perf_counter()
+            res = scan_clients([client], scheduler=sched, force_refresh=True, parse_pool=parser)[0]
+            errors.extend(s for s, d in res.items() if d.get("_meta", {}).get("error"))
+            return time.perf_counter() - t
+
+        t = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            samples = list(pool.map(one, batch))
+        wall = time.perf_counter() - t
+        sched.shutdown()
+        out[f"c{level}"] = {**stats(samples, clients, wall), "pages_per_s": round(clients * len(SITES) / wall, 2),
+                            "errors": len(errors)}
+    if parser:
+        parser.shutdown()
+    return out
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(args) -> Dict[str, Any]:
+    only = [b for b in (args.only.split(",") if args.only else BENCHES) if b]
+    unknown = set(only) - set(BENCHES)
+    if unknown:
+        raise SystemExit(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    # Scratch DB and page cache so runs neither touch nor depend on the app's data/
+    tmp = tempfile.mkdtemp(prefix="listings-bench-")
+    storage.DB_PATH = os.path.join(tmp, "bench.db")
+    page_cache.CACHE_DIR = os.path.join(tmp, "page_cache")
+    engine.JITTER = 0.0
+    metrics.METRICS_ENABLED = not args.no_metrics
+    storage.ensure_db()
+
+    pages = {k: inflate(v, args.inflate_kb).decode("utf-8") for k, v in load_fixtures().items()}
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "lxml": ".".join(map(str, lxml.etree.LXML_VERSION)), "libxml2": ".".join(map(str, lxml.etree.LIBXML_VERSION)),
+            "iterations": args.iterations, "clients": args.clients, "concurrency": args.concurrency, "parse_workers": args.parse_workers,
+            "trace_memory": args.trace_memory, "latency_ms": args.latency_ms, "inflate_kb": args.inflate_kb, "metrics": not args.no_metrics,
+            "fixture_bytes": {k: len(v.encode("utf-8")) for k, v in pages.items()},
+        },
+        "benchmarks": {},
+    }
+
+    server, base = start_server(latency_ms=args.latency_ms, inflate_kb=args.inflate_kb) if "scan_client" in only else (None, "")
+    runs = {
+        "to_doc": lambda: bench_to_doc(pages, args.iterations),
+        "extract_field": lambda: bench_extract_field(pages, args.iterations),
+        "compare": lambda: bench_compare(args.iterations * 5),
+        "scan_client": lambda: bench_scan(base, args.concurrency, args.clients, args.parse_workers),
+    }
+    try:
+        for name in only:
+            print(f"running {name} ...", file=sys.stderr)
+            report["benchmarks"][name] = measure(runs[name], args.trace_memory)
+    finally:
+        if server is not None:
+            server.shutdown()
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.run", description="Scraper pipeline benchmarks")
+    p.add_argument("--only", default="", help=f"comma-separated subset of {','.join(BENCHES)}")
+    p.add_argument("--iterations", type=int, default=200, help="samples per micro-benchmark (compare uses 5x)")
+    p.add_argument("--clients", type=int, default=40, help="clients per scan_client concurrency level")
+    p.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16],
+                   help="scan_client concurrency levels, e.g. 1,4,16")
+    p.add_argument("--parse-workers", type=int, default=0, help="scan_client parse/extract processes (0 = in-process)")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="artificial server latency per request")
+    p.add_argument("--inflate-kb", type=int, default=0, help="pad every fixture page by this many KB")
+    p.add_argument("--no-metrics", action="store_true", help="disable src.metrics instrumentation while measuring")
+    p.add_argument("--trace-memory", action="store_true", help="extra untimed pass per benchmark for the Python heap peak")
+    p.add_argument("--out", default="", help="output JSON path (default bench/results/<time>-<commit>.json)")
+    args = p.parse_args(argv)
+
+    report = run(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
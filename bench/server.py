@@ -0,0 +1,72 @@
+import os, time, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+# Local stand-in for the listing sites: GET /<fixture>[/<anything>] serves bench/fixtures/<fixture>.html. The request
+# path is appended as an HTML comment so every distinct URL has its own content hash, i.e. no page-cache or
+# parsed-tree reuse across clients, as with real listings.
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixtures(fixture_dir: str = FIXTURE_DIR) -> Dict[str, bytes]:
+    out = {}
+    for fn in sorted(os.listdir(fixture_dir)):
+        if fn.endswith(".html"):
+            with open(os.path.join(fixture_dir, fn), "rb") as f:
+                out[fn[:-5]] = f.read()
+    return out
+
+def inflate(body: bytes, kb: int) -> bytes:
+    # Pad with script/markup boilerplate before </body> to approximate real page weights (typically 300KB-1MB)
+    if kb <= 0:
+        return body
+    chunk = b'<div class="pad"><span>lorem ipsum dolor sit amet</span><a href="/x">more</a></div>' \
+            b'<script>var _p="0123456789abcdef0123456789abcdef0123456789abcdef";</script>'
+    pad = chunk * (kb * 1024 // len(chunk) + 1)
+    i = body.rfind(b"</body>")
+    return body[:i] + pad + body[i:] if i >= 0 else body + pad
+
+def start_server(port: int = 0, latency_ms: float = 0.0, inflate_kb: int = 0,
+                 fixture_dir: str = FIXTURE_DIR) -> Tuple[ThreadingHTTPServer, str]:
+    pages = {k: inflate(v, inflate_kb) for k, v in load_fixtures(fixture_dir).items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real sites
+        disable_nagle_algorithm = True  # headers and body go out in separate writes; avoid delayed-ACK stalls
+
+        def do_GET(self):
+            name = self.path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+            body = pages.get(name)
+            if body is not None:
+                body += f"<!-- {self.path} -->\n".encode("utf-8")
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench-http", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Serve the benchmark fixtures")
+    p.add_argument("--port", type=int, default=8900)
+    p.add_argument("--latency-ms", type=float, default=0.0)
+    p.add_argument("--inflate-kb", type=int, default=0)
+    a = p.parse_args()
+    srv, url = start_server(a.port, a.latency_ms, a.inflate_kb)
+    print(f"serving {', '.join(load_fixtures())} at {url}/<fixture>/<id>")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
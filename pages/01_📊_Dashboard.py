@@ -1,22 +1,26 @@
 import streamlit as st
 import pandas as pd
-from src.storage import ensure_db, list_clients, get_client_by_id, get_all_xpaths_for_site, load_yaml_defaults
-from src.scraper import scan_client
+from src.storage import ensure_db, count_clients, get_client_by_id, get_all_xpaths_for_site, load_yaml_defaults, list_scans
+from src.scraper import last_results
+from src.jobs import submit_scans, recent_jobs, job_progress, has_active_jobs
+from src.engine import get_breaker
+from src import metrics
+from src.ui import client_picker, reload_button
 from src.utils import SITES, FIELDS
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 ensure_db()
 
 st.title("📊 Dashboard")
+reload_button()
 
-clients = list_clients()
-if not clients:
+if not count_clients():
     st.info("No clients yet. Add one in **Client Manager**.")
     st.stop()
 
-client_names = {f"{c['name']} (ID {c['id']})": c['id'] for c in clients}
-choice = st.selectbox("Choose a client", list(client_names.keys()))
-client_id = client_names[choice]
+client_id, client_names = client_picker("Choose a client", key="dash_client")
+if client_id is None:
+    st.stop()
 client = get_client_by_id(client_id)
 
 st.subheader("Single Source of Truth (SSOT)")
@@ -29,28 +33,109 @@ ssot_cols[4].metric("Hours", client.get("ssot_hours","") or "—")
 
 st.divider()
 
-if st.button("🔍 Scan Now", type="primary"):
-    with st.spinner("Scanning..."):
-        result = scan_client(client)
-        # result = {site: {field: {"value": str, "url": str?, "match": bool}}}
-        rows = []
-        for site, data in result.items():
-            row = {"Site": site}
-            for field in FIELDS:
-                if field == "website":
-                    val = data.get(field, {})
-                    label = val.get("anchor","")
-                    href = val.get("href","")
-                    cell = f"[{label}]({href})" if href else (label or "—")
-                    match = "✅" if val.get("match") else "❌"
-                else:
-                    val = data.get(field, {})
-                    cell = val.get("value","") or "—"
-                    match = "✅" if val.get("match") else "❌"
-                row[f"{field.title()}"] = cell
-                row[f"{field.title()} Match"] = match
-            rows.append(row)
-        df = pd.DataFrame(rows).set_index("Site")
-        st.dataframe(df, use_container_width=True)
-else:
-    st.info("Click **Scan Now** to fetch live data and compare to SSOT.")
+def results_table(result):
+    # result = {site: {field: {"value": str, "url": str?, "match": bool}}}
+    rows = []
+    for site, data in result.items():
+        row = {"Site": site}
+        for field in FIELDS:
+            if field == "website":
+                val = data.get(field, {})
+                label = val.get("anchor","")
+                href = val.get("href","")
+                cell = f"[{label}]({href})" if href else (label or "—")
+                match = "✅" if val.get("match") else "❌"
+            else:
+                val = data.get(field, {})
+                cell = val.get("value","") or "—"
+                match = "✅" if val.get("match") else "❌"
+            row[f"{field.title()}"] = cell
+            row[f"{field.title()} Match"] = match
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("Site")
+
+opt_cols = st.columns(2)
+force_refresh = opt_cols[0].checkbox("Force refresh (bypass page cache)", value=False)
+incremental = opt_cols[1].checkbox("Changed-only rescan (skip pages unchanged since last scan)", value=True)
+
+btn_cols = st.columns([1, 3])
+if btn_cols[0].button("🔍 Scan Now", type="primary"):
+    submit_scans([client_id], force_refresh=force_refresh, incremental=incremental)
+    st.toast("Scan queued — results appear below as each site finishes.")
+with btn_cols[1].expander("Queue scans for several clients"):
+    many = st.multiselect("Clients (from the page above)", list(client_names.keys()))
+    if st.button("Queue selected", disabled=not many):
+        ids = submit_scans([client_names[c] for c in many], force_refresh=force_refresh, incremental=incremental)
+        st.toast(f"Queued {len(ids)} scans.")
+
+@st.fragment(run_every=2)
+def scan_progress():
+    # Re-runs on its own every 2s, so finished sites show up without blocking the rest of the page
+    jobs = recent_jobs(client_id, limit=1)
+    job = jobs[0] if jobs else None
+    if job and job["status"] in ("queued", "running", "done"):
+        progress = job_progress(job["id"])
+        st.caption(f"Scan job #{job['id']}: **{job['status']}** — {len(progress)} site(s) finished")
+        if progress:
+            df = results_table({site: p["result"] for site, p in progress.items()})
+            df.insert(0, "Status", [progress[s]["status"] for s in df.index])
+            df.insert(1, "Latency (s)", [progress[s]["latency_s"] for s in df.index])
+            st.dataframe(df, use_container_width=True)
+    elif job and job["status"] in ("failed", "interrupted"):
+        st.warning(f"Scan job #{job['id']} {job['status']}{': ' + job['error'] if job.get('error') else ''}")
+
+    if not job or job["status"] != "done":
+        stored = last_results(client_id)
+        if stored:
+            st.caption("Showing the last stored scan.")
+            st.dataframe(results_table(stored), use_container_width=True)
+        elif not job:
+            st.info("Click **Scan Now** to fetch live data and compare to SSOT.")
+
+    queue = recent_jobs(limit=50)
+    if has_active_jobs(queue):
+        active = [j for j in queue if j["status"] in ("queued", "running")]
+        st.caption(f"Queue: {sum(j['status'] == 'running' for j in active)} running, "
+                   f"{sum(j['status'] == 'queued' for j in active)} queued")
+
+    paused = {h: b for h, b in get_breaker().snapshot().items() if b["state"] == "open"}
+    if paused:
+        st.caption("Paused after repeated failures: " + ", ".join(f"{h} (retry in {b['retry_in']:.0f}s)" for h, b in paused.items()))
+
+scan_progress()
+
+with st.expander("⏱️ Performance"):
+    # Process-wide timings since start (or the last reset), across every scan run by this server
+    stages = pd.DataFrame(metrics.stage_summary())
+    if stages.empty:
+        st.caption("No timings yet — run a scan.")
+    else:
+        totals = stages.groupby("stage")[["count", "total_s"]].sum().sort_values("total_s", ascending=False)
+        st.bar_chart(totals["total_s"])
+        site_pick = st.selectbox("Site", ["(all)"] + sorted(s for s in stages["site"].unique() if s), key="perf_site")
+        view = stages if site_pick == "(all)" else stages[stages["site"] == site_pick]
+        st.dataframe(view, use_container_width=True, hide_index=True)
+
+        slow = metrics.slow_xpaths()
+        if slow:
+            st.warning(f"{len(slow)} XPath(s) average over {metrics.SLOW_XPATH_MS:g} ms per page")
+            st.dataframe(pd.DataFrame(slow)[["site", "field", "xpath", "count", "mean_ms", "max_ms"]],
+                         use_container_width=True, hide_index=True)
+        with st.popover("All XPath timings"):
+            st.dataframe(pd.DataFrame(metrics.summary("xpath_seconds")), use_container_width=True, hide_index=True)
+
+    pcols = st.columns(2)
+    pcols[0].download_button("Download metrics (Prometheus text)", metrics.render_prometheus(),
+                             file_name="metrics.prom", mime="text/plain")
+    if pcols[1].button("Reset timings"):
+        metrics.reset()
+        st.rerun()
+
+history = list_scans(client_id)
+if history:
+    st.subheader("Scan History")
+    hdf = pd.DataFrame(history)
+    hdf["Scanned"] = pd.to_datetime(hdf["started_at"], unit="s")
+    hdf["Match Rate"] = (hdf["matches"] / hdf["fields"].where(hdf["fields"] > 0)).fillna(0.0)
+    st.line_chart(hdf.set_index("Scanned")[["Match Rate"]])
+    st.dataframe(hdf[["id","Scanned","mode","fields","matches","Match Rate"]], use_container_width=True, hide_index=True)
@@ -1,16 +1,18 @@
+import io
+import pandas as pd
 import streamlit as st
-from src.storage import ensure_db, list_clients, upsert_client, get_client_by_id, delete_client
+from src.storage import ensure_db, count_clients, upsert_client, get_client_by_id, delete_client
 from src.utils import SITES
+from src.ui import client_picker, reload_button
+from src import bulk, report
 
 st.set_page_config(page_title="Client Manager", page_icon="👤", layout="wide")
 ensure_db()
 
 st.title("👤 Client Manager")
+reload_button()
 
-clients = list_clients()
-existing_map = {f"{c['name']} (ID {c['id']})": c['id'] for c in clients}
-
-mode = st.radio("Mode", ["Add", "Edit/Delete"], horizontal=True)
+mode = st.radio("Mode", ["Add", "Edit/Delete", "Bulk Import/Export"], horizontal=True)
 
 if mode == "Add":
     with st.form("add_client"):
@@ -44,15 +46,68 @@ if mode == "Add":
                 "url_yelp": url_yelp.strip(),
                 "url_yahoo": url_yahoo.strip(),
             })
+            report.rescore([cid])  # stored verdicts follow the edited SSOT
             st.success(f"Client saved (ID {cid}).")
 
+elif mode == "Bulk Import/Export":
+    st.subheader("Import")
+    st.caption(f"CSV or JSONL with any of: {', '.join(bulk.IMPORT_COLS)}. Rows whose `external_id` (or `id`) matches a "
+               "client update it (only the columns in the file); the rest are added. Phones and websites are normalized, "
+               "and rows that fail validation are listed below without stopping the import.")
+    upload = st.file_uploader("Clients file", type=["csv", "jsonl", "ndjson", "json"])
+    icols = st.columns(2)
+    dry_run = icols[0].checkbox("Validate only (write nothing)")
+    if icols[1].button("Import", type="primary", disabled=upload is None):
+        bar = st.progress(0.0, text="Importing…")
+        size = max(1, upload.size)
+
+        def progress(totals):
+            bar.progress(min(1.0, upload.tell() / size),
+                         text=f"{totals['rows']:,} rows read, {totals['inserted']:,} added, {totals['updated']:,} updated")
+
+        try:
+            res = bulk.import_clients(upload, chunk_size=bulk.IMPORT_CHUNK, dry_run=dry_run, on_chunk=progress)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            bar.progress(1.0, text="Done")
+            st.session_state["cm_import"] = res
+
+    res = st.session_state.get("cm_import")
+    if res:
+        rcols = st.columns(4)
+        rcols[0].metric("Rows", f"{res['rows']:,}")
+        rcols[1].metric("Added", f"{res['inserted']:,}")
+        rcols[2].metric("Updated", f"{res['updated']:,}")
+        rcols[3].metric("Rejected", f"{res['failed']:,}")
+        st.caption(f"Finished in {res['seconds']:.1f}s.")
+        if res["errors"]:
+            edf = pd.DataFrame(res["errors"])
+            st.dataframe(edf, use_container_width=True, hide_index=True)
+            if res["failed"] > len(edf):
+                st.caption(f"Showing the first {len(edf):,} of {res['failed']:,} rejected rows; "
+                           "`python -m src.cli import --errors` writes them all.")
+            st.download_button("Download rejected rows (CSV)", edf.to_csv(index=False).encode("utf-8"),
+                               file_name="import_errors.csv", mime="text/csv")
+
+    st.subheader("Export")
+    ecols = st.columns([1, 1, 2])
+    fmt = ecols[0].selectbox("Format", list(bulk.FORMATS))
+    if ecols[1].button("Prepare export"):
+        buf = io.StringIO()
+        n = bulk.export_clients(buf, fmt)
+        st.download_button(f"Download {n:,} clients ({fmt})", buf.getvalue().encode("utf-8"), file_name=f"clients.{fmt}",
+                           mime="text/csv" if fmt == "csv" else "application/x-ndjson")
+
 else:
-    if not clients:
+    if not count_clients():
         st.info("No clients yet.")
         st.stop()
 
-    choice = st.selectbox("Select Client", list(existing_map.keys()))
-    client = get_client_by_id(existing_map[choice])
+    client_id, _ = client_picker("Select Client", key="cm_client")
+    if client_id is None:
+        st.stop()
+    client = get_client_by_id(client_id)
 
     with st.form("edit_client"):
         st.subheader("Basic")
@@ -86,6 +141,7 @@ else:
                 "url_yelp": url_yelp.strip(),
                 "url_yahoo": url_yahoo.strip(),
             })
+            report.rescore([cid])  # stored verdicts follow the edited SSOT
             st.success(f"Client updated (ID {cid}).")
 
         if col2.form_submit_button("Delete Client", type="secondary"):
@@ -1,13 +1,16 @@
 import streamlit as st
 import pandas as pd
-from src.storage import ensure_db, list_xpaths, add_xpath, delete_xpath, load_yaml_defaults, get_all_xpaths_for_site
-from src.scraper import test_xpath_on_url
+from src.storage import ensure_db, list_xpaths, add_xpath, delete_xpath, load_yaml_defaults, get_all_xpaths_for_site, list_site_urls
+from src.scraper import test_xpath_on_url, bulk_test_xpaths, bulk_test_summary
+from src.xpath_cost import analyze_site, apply_order, can_apply, SAMPLE_PAGES
 from src.utils import SITES, FIELDS
+from src.ui import reload_button
 
 st.set_page_config(page_title="XPath Manager", page_icon="🧭", layout="wide")
 ensure_db()
 
 st.title("🧭 XPath Manager")
+reload_button()
 
 st.markdown("""
 Manage **multiple XPaths per site & field**. Higher **priority** runs first.
@@ -38,13 +41,14 @@ with st.form("add_xpath_form"):
     xpath = st.text_input("XPath", placeholder="//h1//text() or //a[contains(.,'Website')]")
     priority = st.number_input("Priority (lower runs first)", min_value=1, value=1, step=1)
     sample_url = st.text_input("Sample URL for Test", placeholder="https://...")
+    force_refresh = st.checkbox("Force refresh (bypass page cache)", value=False)
     col1, col2 = st.columns(2)
     tested = col1.form_submit_button("Test XPath")
     saved = col2.form_submit_button("Save XPath", type="primary")
 
     if tested and sample_url.strip() and xpath.strip():
         with st.spinner("Testing..."):
-            res = test_xpath_on_url(sample_url.strip(), xpath.strip(), field)
+            res = test_xpath_on_url(sample_url.strip(), xpath.strip(), field, force_refresh=force_refresh)
         st.write("**Result**")
         st.json(res)
 
@@ -52,6 +56,82 @@ with st.form("add_xpath_form"):
         add_xpath(site, field, priority, xpath.strip())
         st.success("XPath saved. Refresh to see it listed above.")
 
+st.divider()
+st.subheader("Bulk Test")
+st.caption("Run a candidate XPath (or a whole fallback list) against many listing URLs. Cached pages are reused; "
+           "other URLs are fetched with the usual per-host politeness.")
+with st.form("bulk_test_form"):
+    source = st.radio("URLs", [f"All stored {site} URLs", "Pasted list"], horizontal=True)
+    pasted = st.text_area("Pasted URLs (one per line)", height=100)
+    candidates = st.text_area("XPaths to test, in fallback order (one per line; empty = current fallback list)", height=100)
+    bcols = st.columns(3)
+    cached_only = bcols[0].checkbox("Cached pages only (no network)", value=False)
+    bulk_refresh = bcols[1].checkbox("Force refresh", value=False)
+    run_bulk = bcols[2].form_submit_button("Run bulk test", type="primary")
+
+if run_bulk:
+    items = list_site_urls(site) if source.startswith("All") else [u.strip() for u in pasted.splitlines() if u.strip()]
+    xps = [x.strip() for x in candidates.splitlines() if x.strip()] or None
+    if not items:
+        st.warning("No URLs to test.")
+    else:
+        bar = st.progress(0.0, text=f"0/{len(items)}")
+        rows = bulk_test_xpaths(site, field, items, xps, force_refresh=bulk_refresh, cached_only=cached_only,
+                                on_result=lambda done, total, _: bar.progress(done / total, text=f"{done}/{total}"))
+        st.session_state["bulk_test"] = {"site": site, "field": field, "rows": rows, "summary": bulk_test_summary(rows)}
+
+bulk = st.session_state.get("bulk_test")
+if bulk and bulk["site"] == site and bulk["field"] == field:
+    sm = bulk["summary"]
+    mcols = st.columns(4)
+    mcols[0].metric("Hit rate", f"{sm['hit_rate']:.0%}", help=f"{sm['hits']} of {sm['evaluated']} parsed page(s)")
+    mcols[1].metric("Failed / not cached", sm["failed"])
+    mcols[2].metric("From cache", f"{sm['from_cache']}/{sm['urls']}")
+    mcols[3].metric("Fetch p50 / p90 (ms)", f"{sm['fetch_ms_p50'] or 0:.0f} / {sm['fetch_ms_p90'] or 0:.0f}")
+    if sm["wins_by_step"]:
+        st.caption("Hits per fallback step: " + ", ".join(f"#{k}: {v}" for k, v in sm["wins_by_step"].items()))
+    if sm["top_values"]:
+        st.caption("Most common values: " + "; ".join(f"{v[:60]!r} ×{n}" for v, n in sm["top_values"][:5]))
+    bdf = pd.DataFrame(bulk["rows"])
+    st.dataframe(bdf[["name", "url", "hit", "value", "step", "error", "status", "from_cache", "fetch_ms", "eval_ms"]],
+                 use_container_width=True, hide_index=True)
+    st.download_button("Download results (CSV)", bdf.to_csv(index=False).encode("utf-8"),
+                       file_name=f"xpath_bulk_{site}_{field}.csv", mime="text/csv")
+
+st.divider()
+st.subheader("Fallback Cost Analyzer")
+st.caption("Replays this site's cached pages through every fallback chain: hit rate and evaluation time per XPath, "
+           "and a cheaper order that still returns the same value on every sampled page.")
+acols = st.columns([1, 1, 2])
+sample_n = acols[0].number_input("Cached pages to sample", min_value=1, max_value=500, value=SAMPLE_PAGES)
+only_field = acols[1].checkbox(f"Only '{field}'", value=False)
+if acols[2].button("Analyze cached pages"):
+    with st.spinner("Replaying cached pages..."):
+        st.session_state["xpath_cost"] = analyze_site(site, int(sample_n), fields=[field] if only_field else None)
+
+report = st.session_state.get("xpath_cost")
+if report and report["site"] == site:
+    if not report["pages"]:
+        st.info(f"No cached {site} pages yet — run a scan first.")
+    for i, chain in enumerate(c for c in report["chains"] if c["steps"] and report["pages"]):
+        label = f"{chain['field']}" + (f" · {chain['page_type']}" if chain["page_type"] else "")
+        summary = f"{chain['current_ms']:.3f} ms/page"
+        if chain["changed"]:
+            summary += f" → {chain['suggested_ms']:.3f} ms ({chain['saving_pct']:.0f}% less)"
+        with st.expander(f"{label} — {chain['pages']} page(s), {summary}", expanded=chain["changed"]):
+            cdf = pd.DataFrame(chain["steps"])
+            cdf["hints"] = cdf["hints"].map(lambda h: "; ".join(h))
+            st.dataframe(cdf[["position", "suggested_position", "priority", "xpath", "hit_rate", "wins", "mean_ms",
+                              "max_ms", "valid", "hints"]], use_container_width=True, hide_index=True)
+            if chain["changed"] and can_apply(chain):
+                target = "priorities of the XPaths above" if chain["source"] == "db" else "a DB override for this field"
+                if st.button(f"Apply suggested order ({target})", key=f"apply_order_{i}"):
+                    n = apply_order(chain)
+                    st.session_state.pop("xpath_cost", None)
+                    st.success(f"Reordered {n} XPath(s). Re-run the analyzer to see the new costs.")
+            elif chain["changed"]:
+                st.caption("Yelp page-type chains come from `data/default_xpaths.yaml`; reorder them there.")
+
 st.divider()
 st.subheader("YAML Defaults (read-only)")
 defaults = load_yaml_defaults()
@@ -0,0 +1,74 @@
+import time
+import streamlit as st
+from src.storage import ensure_db
+from src import report
+from src.ui import reload_button
+
+st.set_page_config(page_title="Portfolio Report", page_icon="📈", layout="wide")
+ensure_db()
+
+st.title("📈 Portfolio Report")
+st.caption("Every client's latest stored scan, across all sites and fields; changes are against the scan before it.")
+
+reload_button()
+
+t = time.perf_counter()
+df = report.load()
+if df.empty:
+    st.info("No stored scans yet. Run scans from the **Dashboard** or `python -m src.cli scan`.")
+    st.stop()
+rep = report.summarize(df)
+tot = rep["totals"]
+
+mcols = st.columns(5)
+mcols[0].metric("Clients scanned", f"{tot['clients']:,}")
+mcols[1].metric("Match rate", f"{tot['match_rate']:.1%}")
+mcols[2].metric("Mismatches", f"{tot['mismatches']:,}")
+mcols[3].metric("Regressed since last scan", f"{tot['regressed']:,}", delta=f"{tot['fixed']:,} fixed", delta_color="off")
+mcols[4].metric("Fully consistent clients", f"{tot['fully_consistent']:,}")
+
+st.subheader("Match rate by site and field")
+st.dataframe(rep["matrix"].style.format("{:.1%}", na_rep="—"), use_container_width=True)
+
+cols = st.columns(2)
+with cols[0]:
+    st.subheader("By site")
+    st.bar_chart(rep["by_site"]["match_rate"])
+    st.dataframe(rep["by_site"].style.format({"match_rate": "{:.1%}"}), use_container_width=True)
+with cols[1]:
+    st.subheader("By field")
+    st.bar_chart(rep["by_field"]["match_rate"])
+    st.dataframe(rep["by_field"].style.format({"match_rate": "{:.1%}"}), use_container_width=True)
+
+st.subheader(f"Worst offenders (top {report.WORST_N})")
+st.dataframe(rep["worst"].style.format({"match_rate": "{:.1%}"}), use_container_width=True, hide_index=True)
+st.caption(f"Report computed in {(time.perf_counter() - t) * 1000:.0f} ms over {tot['checks']:,} client × site × field checks.")
+
+if st.toggle("Show changes since the previous scan"):
+    ch = report.changes()
+    if ch.empty:
+        st.caption("No changes between each client's last two scans.")
+    else:
+        st.dataframe(ch, use_container_width=True, hide_index=True)
+        if len(ch) >= report.CHANGES_MAX:
+            st.caption(f"Showing the first {report.CHANGES_MAX:,}; export for the full list.")
+
+st.subheader("Export")
+ecols = st.columns([2, 1, 1])
+what = ecols[0].selectbox("Table", ["All result rows", "Changes", "Site × field", "Worst offenders"])
+fmt = ecols[1].selectbox("Format", ["csv", "parquet"])
+if ecols[2].button("Prepare export"):
+    tables = {
+        "All result rows": lambda: report.load(details=True),
+        "Changes": lambda: report.changes(limit=None),
+        "Site × field": lambda: rep["matrix"].reset_index(),
+        "Worst offenders": lambda: rep["worst"],
+    }
+    try:
+        data = report.export_bytes(tables[what](), fmt)
+    except RuntimeError as e:
+        st.error(str(e))
+    else:
+        name = what.lower().replace(" × ", "_").replace(" ", "_")
+        st.download_button(f"Download {what} ({fmt})", data, file_name=f"portfolio_{name}.{fmt}",
+                           mime="text/csv" if fmt == "csv" else "application/octet-stream")
@@ -0,0 +1,152 @@
+import io, os, re, csv, json, time
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Callable, Union, IO
+
+from src.storage import import_clients_chunk, iter_clients, CLIENT_COLS
+from src.matching import phone_key
+from src.utils import SITES, canonical_href, canonicalize_site_key
+
+# Bulk client import/export. Files are read row by row and written IMPORT_CHUNK rows per transaction, so memory
+# stays bounded by the chunk whatever the file size. Clients are matched on external_id (or id, for rows without
+# one); columns missing from the file are left untouched on existing clients. Bad rows are reported, not fatal.
+IMPORT_CHUNK = 1000
+ERRORS_MAX = 1000   # row errors kept in the result (all of them still reach on_error)
+IMPORT_COLS = ["id", *CLIENT_COLS]
+FORMATS = ("csv", "jsonl")
+
+Source = Union[str, IO]
+
+def infer_format(name: str, fmt: str = "") -> str:
+    fmt = (fmt or os.path.splitext(name or "")[1].lstrip(".") or "csv").lower()
+    fmt = "jsonl" if fmt in ("json", "ndjson") else fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format: {fmt}")
+    return fmt
+
+def _text(f: IO) -> IO:
+    # Uploaded files and `open(..., "rb")` are binary; csv/json want text
+    return f if isinstance(f, io.TextIOBase) else io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+
+def read_rows(f: IO, fmt: str) -> Iterable[Tuple[int, Any]]:
+    # -> (line number, raw dict) per record; a JSONL line that doesn't parse yields its error message instead
+    f = _text(f)
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        if reader.fieldnames:
+            reader.fieldnames = [(c or "").strip().lower() for c in reader.fieldnames]
+        for raw in reader:
+            yield reader.line_num, raw
+        return
+    for n, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield n, f"invalid JSON: {e}"
+            continue
+        yield n, raw if isinstance(raw, dict) else "expected a JSON object per line"
+
+_HTTP_URL = re.compile(r"https?://[^/?#\s]+", re.I)  # scheme + host; cheaper than urlparse per cell
+
+def clean_row(raw: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    # -> (row of IMPORT_COLS present in raw, errors); values are stripped, phone (E.164)/website normalized
+    row: Dict[str, Any] = {}
+    errors = []
+    for k, v in raw.items():
+        k = (k or "").strip().lower()
+        if k in IMPORT_COLS:
+            row[k] = "" if v is None else str(v).strip()
+    if row.get("id"):
+        try:
+            row["id"] = int(row["id"])
+        except ValueError:
+            errors.append(f"id: not an integer: {row['id']!r}")
+    else:
+        row.pop("id", None)
+    if "external_id" in row:
+        row["external_id"] = row["external_id"] or None  # NULL, so the unique index ignores it
+    if not (row.get("name") or row.get("external_id") or row.get("id")):
+        errors.append("needs a name, external_id or id")
+
+    phone = row.get("ssot_phone")
+    if phone:
+        # E.164 keeps the country code (a national format would re-parse as a US number); kept as given otherwise
+        key = phone_key(phone)
+        if len(re.sub(r"\D+", "", key)) < 10:
+            errors.append(f"ssot_phone: not a phone number: {phone!r}")
+        row["ssot_phone"] = key if key.startswith("+") else phone
+    site = row.get("ssot_website")
+    if site:
+        href = canonical_href(site if "://" in site else f"https://{site}")
+        if not _HTTP_URL.match(href):
+            errors.append(f"ssot_website: not a web address: {site!r}")
+        row["ssot_website"] = href
+    for s in SITES:
+        url = row.get(f"url_{s}")
+        if not url:
+            continue
+        if not _HTTP_URL.match(url):
+            errors.append(f"url_{s}: not an http(s) URL: {url!r}")
+        elif canonicalize_site_key(url) not in ("", s):
+            errors.append(f"url_{s}: this is a {canonicalize_site_key(url)} URL, not {s}")
+    return row, errors
+
+def import_clients(source: Source, fmt: str = "", chunk_size: int = IMPORT_CHUNK, dry_run: bool = False,
+                   on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   on_error: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    # source: path or (binary/text) file object. on_chunk gets the running totals after each chunk is written,
+    # on_error each {line, external_id, error}. dry_run validates without writing.
+    fmt = infer_format(source if isinstance(source, str) else getattr(source, "name", ""), fmt)
+    t = time.perf_counter()
+    out: Dict[str, Any] = {"rows": 0, "valid": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    chunk: List[Dict[str, Any]] = []
+
+    def flush():
+        if chunk and not dry_run:
+            res = import_clients_chunk(chunk)
+            out["inserted"] += res["inserted"]
+            out["updated"] += res["updated"]
+        chunk.clear()
+        if on_chunk:
+            on_chunk(out)
+
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        for line, raw in read_rows(f, fmt):
+            out["rows"] += 1
+            row, errors = clean_row(raw) if isinstance(raw, dict) else ({}, [raw])
+            if errors:
+                out["failed"] += 1
+                err = {"line": line, "external_id": row.get("external_id") or "", "error": "; ".join(errors)}
+                if len(out["errors"]) < ERRORS_MAX:
+                    out["errors"].append(err)
+                if on_error:
+                    on_error(err)
+                continue
+            out["valid"] += 1
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+    finally:
+        if isinstance(source, str):
+            f.close()
+    out["seconds"] = round(time.perf_counter() - t, 3)
+    return out
+
+def export_clients(dest: IO, fmt: str = "csv") -> int:
+    # Streams every client to a text file object in the import format (so an export re-imports as updates)
+    n = 0
+    if fmt == "csv":
+        w = csv.DictWriter(dest, fieldnames=IMPORT_COLS, extrasaction="ignore")
+        w.writeheader()
+        for c in iter_clients():
+            w.writerow({k: "" if c.get(k) is None else c[k] for k in IMPORT_COLS})
+            n += 1
+    elif fmt == "jsonl":
+        for c in iter_clients():
+            dest.write(json.dumps({k: c.get(k) for k in IMPORT_COLS}, ensure_ascii=False) + "\n")
+            n += 1
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+    return n
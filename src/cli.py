@@ -0,0 +1,279 @@
+import os, sys, csv, json, time, argparse, logging
+from typing import Dict, Any, List, Optional, Iterable
+
+from src.storage import ensure_db, list_clients
+from src.scraper import scan_clients, scan_rows
+from src import metrics, parse_pool, bulk
+
+# Headless batch scans, e.g. from cron:
+#   python -m src.cli scan --out results/nightly.jsonl --checkpoint results/nightly.ckpt --shard 0/4
+#   python -m src.cli report --out results/portfolio.parquet
+#   python -m src.cli import clients.csv --errors import_errors.csv
+log = logging.getLogger("listings.cli")
+
+OUTPUT_COLS = ["client_id", "client_name", "site", "field", "url", "value", "href", "match", "content_hash", "error", "scanned_at"]
+
+def parse_shard(spec: str):
+    # "i/n" with 0 <= i < n; clients are partitioned by id % n so every worker sees a stable, disjoint slice
+    try:
+        i, n = (int(x) for x in spec.split("/", 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {spec!r}, expected i/n")
+    if n < 1 or not (0 <= i < n):
+        raise argparse.ArgumentTypeError(f"invalid shard {spec!r}, need 0 <= i < n")
+    return i, n
+
+def select_clients(clients: List[Dict[str, Any]], ids: Optional[List[int]] = None, name_contains: str = "",
+                   shard=None) -> List[Dict[str, Any]]:
+    out = []
+    needle = (name_contains or "").lower()
+    for c in clients:
+        if ids and c["id"] not in ids:
+            continue
+        if needle and needle not in (c.get("name") or "").lower():
+            continue
+        if shard and c["id"] % shard[1] != shard[0]:
+            continue
+        out.append(c)
+    return sorted(out, key=lambda c: c["id"])
+
+def load_checkpoint(path: str) -> set:
+    done = set()
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    done.add(int(line))
+    return done
+
+def append_checkpoint(path: str, client_ids: Iterable[int]):
+    if not path:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        for cid in client_ids:
+            f.write(f"{cid}\n")
+
+class ResultWriter:
+    # Streams rows to .jsonl / .csv (appending, so resumed runs extend the same file) or .parquet (row group per batch)
+    def __init__(self, path: str, fmt: str = ""):
+        self.path = path
+        self.fmt = (fmt or os.path.splitext(path)[1].lstrip(".") or "jsonl").lower()
+        if self.fmt not in ("jsonl", "csv", "parquet"):
+            raise ValueError(f"unsupported output format: {self.fmt}")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._parquet = None
+        if self.fmt == "parquet" and os.path.exists(path):
+            # Parquet files can't be appended to; a resumed run writes a sibling part file
+            stem, ext = os.path.splitext(path)
+            k = 1
+            while os.path.exists(f"{stem}.part{k}{ext}"):
+                k += 1
+            self.path = f"{stem}.part{k}{ext}"
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if self.fmt == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as f:
+                for r in rows:
+                    f.write(json.dumps({c: r.get(c) for c in OUTPUT_COLS}, ensure_ascii=False) + "\n")
+        elif self.fmt == "csv":
+            new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "a", encoding="utf-8", newline="") as f:
+                w = csv.DictWriter(f, fieldnames=OUTPUT_COLS, extrasaction="ignore")
+                if new:
+                    w.writeheader()
+                w.writerows(rows)
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+            table = pa.Table.from_pylist([{c: r.get(c) for c in OUTPUT_COLS} for r in rows])
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+def output_rows(client: Dict[str, Any], result: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"client_id": client["id"], "client_name": client.get("name",""), **r} for r in scan_rows(result)]
+
+def run_scan(args) -> int:
+    ensure_db()
+    clients = select_clients(list_clients(), args.client_id, args.name_contains, args.shard)
+    done = load_checkpoint(args.checkpoint)
+    todo = [c for c in clients if c["id"] not in done]
+    log.info("%d clients selected, %d already done, %d to scan", len(clients), len(clients) - len(todo), len(todo))
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+        log.info("serving metrics on http://127.0.0.1:%d/metrics", args.metrics_port)
+    parse_pool.PARSE_WORKERS = args.parse_workers
+    writer = ResultWriter(args.out, args.format) if args.out else None
+    failed = 0
+    t0 = time.time()
+    try:
+        # Batches bound how many clients (and so fetches) are in flight; each batch is checkpointed once written
+        for start in range(0, len(todo), args.batch_size):
+            batch = todo[start:start + args.batch_size]
+            try:
+                results = scan_clients(batch, force_refresh=args.force_refresh, incremental=args.incremental,
+                                       record=not args.no_record)
+            except Exception:
+                log.exception("batch starting at client %s failed", batch[0]["id"])
+                failed += len(batch)
+                continue
+            if writer:
+                writer.write([row for c, res in zip(batch, results) for row in output_rows(c, res)])
+            append_checkpoint(args.checkpoint, [c["id"] for c in batch])
+            if args.metrics_file:
+                metrics.write_textfile(args.metrics_file)
+            log.info("scanned %d/%d clients (%.1fs)", min(start + len(batch), len(todo)), len(todo), time.time() - t0)
+    finally:
+        if writer:
+            writer.close()
+        parse_pool.shutdown_parse_pool()
+    for r in metrics.slow_xpaths():
+        log.warning("slow xpath (%s/%s, mean %.1f ms over %d pages): %s", r["site"], r["field"], r["mean_ms"], r["count"], r["xpath"])
+    return 1 if failed else 0
+
+REPORT_TABLES = ["rows", "changes", "site_field", "worst"]
+
+def run_report(args) -> int:
+    from src import report  # pandas is only needed for reports
+    ensure_db()
+    t0 = time.time()
+    df = report.load(details=args.table == "rows")
+    rep = report.summarize(df)
+    tot = rep["totals"]
+    log.info("%d clients, %d checks, match rate %.1f%%, %d regressed / %d fixed since previous scan (%.2fs)",
+             tot["clients"], tot["checks"], 100 * tot["match_rate"], tot["regressed"], tot["fixed"], time.time() - t0)
+    if not args.out:
+        print(rep["matrix"].to_string(float_format=lambda v: f"{v:.1%}"))
+        return 0
+    fmt = (args.format or os.path.splitext(args.out)[1].lstrip(".") or "csv").lower()
+    table = {
+        "rows": lambda: df,
+        "changes": lambda: report.changes(limit=None),
+        "site_field": lambda: rep["matrix"].reset_index(),
+        "worst": lambda: report.summarize(df, args.top)["worst"],
+    }[args.table]()
+    try:
+        data = report.export_bytes(table, fmt)
+    except (RuntimeError, ValueError) as e:
+        raise SystemExit(str(e))
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "wb") as f:
+        f.write(data)
+    log.info("wrote %d row(s) of %s to %s", len(table), args.table, args.out)
+    return 0
+
+def run_rescore(args) -> int:
+    from src import report
+    ensure_db()
+    t0 = time.time()
+    n = report.rescore(args.client_id)
+    log.info("re-scored stored results: %d verdict(s) changed (%.2fs)", n, time.time() - t0)
+    return 0
+
+def run_import(args) -> int:
+    ensure_db()
+    try:
+        fmt = bulk.infer_format(args.path, args.format)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    err_file = open(args.errors, "w", encoding="utf-8", newline="") if args.errors else None
+    err_writer = csv.DictWriter(err_file, fieldnames=["line", "external_id", "error"]) if err_file else None
+    if err_writer:
+        err_writer.writeheader()
+
+    def progress(totals):
+        log.info("%d rows read, %d inserted, %d updated, %d rejected", totals["rows"], totals["inserted"],
+                 totals["updated"], totals["failed"])
+
+    try:
+        res = bulk.import_clients(args.path, fmt, chunk_size=max(1, args.chunk_size), dry_run=args.dry_run,
+                                  on_chunk=progress, on_error=err_writer.writerow if err_writer else None)
+    finally:
+        if err_file:
+            err_file.close()
+    if not err_writer:
+        for e in res["errors"][:20]:
+            log.warning("line %d: %s", e["line"], e["error"])
+    log.info("%s %d rows in %.1fs: %d inserted, %d updated, %d rejected", "validated" if args.dry_run else "imported",
+             res["rows"], res["seconds"], res["inserted"], res["updated"], res["failed"])
+    return 1 if res["failed"] else 0
+
+def run_export(args) -> int:
+    ensure_db()
+    try:
+        fmt = bulk.infer_format(args.out, args.format)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8", newline="") as f:
+        n = bulk.export_clients(f, fmt)
+    log.info("wrote %d client(s) to %s", n, args.out)
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m src.cli", description="Listings Consistency Agent batch tools")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("scan", help="scan all clients (or a filtered subset) without the UI")
+    s.add_argument("--client-id", type=int, action="append", help="only this client id (repeatable)")
+    s.add_argument("--name-contains", default="", help="only clients whose name contains this text")
+    s.add_argument("--shard", type=parse_shard, help="i/n: only clients with id %% n == i")
+    s.add_argument("--batch-size", type=int, default=25, help="clients scanned concurrently per batch")
+    s.add_argument("--out", default="", help="output file (.jsonl, .csv or .parquet)")
+    s.add_argument("--format", default="", choices=["", "jsonl", "csv", "parquet"], help="override format inferred from --out")
+    s.add_argument("--checkpoint", default="", help="file of finished client ids; rerun with the same file to resume")
+    s.add_argument("--incremental", action="store_true", help="skip parsing pages unchanged since the last stored scan")
+    s.add_argument("--force-refresh", action="store_true", help="bypass the page cache")
+    s.add_argument("--no-record", action="store_true", help="don't store results in the scan history")
+    s.add_argument("--parse-workers", type=int, default=0,
+                   help="parse/extract on this many worker processes (-1 = one per core, 0 = in-process)")
+    s.add_argument("--metrics-file", default="", help="write Prometheus text metrics here after every batch")
+    s.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus metrics on this port while scanning")
+    s.set_defaults(func=run_scan)
+
+    r = sub.add_parser("report", help="portfolio match rates from stored scans, optionally exported")
+    r.add_argument("--table", default="rows", choices=REPORT_TABLES, help="what to export (default: every result row)")
+    r.add_argument("--out", default="", help="output file (.csv or .parquet); without it the site x field matrix is printed")
+    r.add_argument("--format", default="", choices=["", "csv", "parquet"], help="override format inferred from --out")
+    r.add_argument("--top", type=int, default=100, help="clients in the worst-offenders table")
+    r.set_defaults(func=run_report)
+
+    c = sub.add_parser("rescore", help="re-compare stored latest scans against the current SSOT (after SSOT/key changes)")
+    c.add_argument("--client-id", type=int, action="append", help="only this client id (repeatable)")
+    c.set_defaults(func=run_rescore)
+
+    i = sub.add_parser("import", help="add/update clients from a CSV or JSONL file, matched on external_id (or id)")
+    i.add_argument("path", help="file with columns " + ", ".join(bulk.IMPORT_COLS))
+    i.add_argument("--format", default="", choices=["", *bulk.FORMATS], help="override format inferred from the path")
+    i.add_argument("--chunk-size", type=int, default=bulk.IMPORT_CHUNK, help="rows written per transaction")
+    i.add_argument("--errors", default="", help="write rejected rows (line, external_id, error) to this CSV")
+    i.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    i.set_defaults(func=run_import)
+
+    e = sub.add_parser("export", help="write every client to a CSV or JSONL file in the import format")
+    e.add_argument("--out", required=True, help="output file (.csv or .jsonl)")
+    e.add_argument("--format", default="", choices=["", *bulk.FORMATS], help="override format inferred from --out")
+    e.set_defaults(func=run_export)
+    return p
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = build_parser().parse_args(argv)
+    if getattr(args, "batch_size", 1) < 1:
+        args.batch_size = 1
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import threading, time, random
+from concurrent.futures import ThreadPoolExecutor, Future
+from urllib.parse import urlparse
+from typing import Dict, Any, Callable, Optional
+
+from src import metrics
+from src.utils import canonicalize_site_key
+
+# Politeness per host: max in-flight requests and minimum spacing (seconds) between request starts.
+# Each host gets its own worker pool, so a slow or strict host never holds up the others.
+HOST_LIMITS: Dict[str, Dict[str, float]] = {
+    "google": {"concurrency": 2, "min_interval": 1.0},
+    "apple": {"concurrency": 2, "min_interval": 1.0},
+    "bing": {"concurrency": 2, "min_interval": 1.0},
+    "yelp": {"concurrency": 1, "min_interval": 1.5},
+    "yahoo": {"concurrency": 2, "min_interval": 1.0},
+}
+DEFAULT_HOST_LIMIT = {"concurrency": 1, "min_interval": 1.0}
+JITTER = 0.4  # extra random spacing added on top of min_interval
+
+# Circuit breaker per host: after BREAKER_FAILURES consecutive transient failures (timeouts, 5xx, 429, ...) the host
+# is skipped for BREAKER_COOLDOWN seconds, or for the server's Retry-After when it sends one. When the cool-down
+# ends a single trial request is let through; success closes the breaker, failure re-opens it.
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 60.0
+
+def host_key(url: str) -> str:
+    # The five listing sites share a key across their subdomains/ccTLDs; anything else is keyed by hostname
+    return canonicalize_site_key(url) or (urlparse(url or "").hostname or "")
+
+class HostScheduler:
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = limits if limits is not None else HOST_LIMITS
+        self._lock = threading.Lock()
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._next_start: Dict[str, float] = {}
+
+    def limit_for(self, host: str) -> Dict[str, float]:
+        return {**DEFAULT_HOST_LIMIT, **(self.limits.get(host) or {})}
+
+    def _pool(self, host: str) -> ThreadPoolExecutor:
+        with self._lock:
+            pool = self._pools.get(host)
+            if pool is None:
+                workers = max(1, int(self.limit_for(host)["concurrency"]))
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"scan-{host or 'other'}")
+                self._pools[host] = pool
+            return pool
+
+    def wait_turn(self, host: str) -> float:
+        # Reserve the next start slot for this host and sleep until it arrives; returns seconds waited
+        interval = float(self.limit_for(host)["min_interval"])
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + interval + random.uniform(0, JITTER)
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def defer(self, host: str, seconds: float):
+        # Push the host's next start slot at least `seconds` out (backoff after a 429/5xx applies to every request)
+        with self._lock:
+            self._next_start[host] = max(self._next_start.get(host, 0.0), time.monotonic() + seconds)
+
+    def submit(self, url: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        # Run fn(*args, **kwargs) on the host's pool once the host's politeness spacing allows it
+        host = host_key(url)
+        queued = time.perf_counter()
+
+        def run():
+            metrics.observe("queue_wait_seconds", time.perf_counter() - queued, site=host)
+            # A host whose breaker is open fails fast without taking a politeness slot
+            if not get_breaker().blocked_for(host):
+                metrics.observe("politeness_delay_seconds", self.wait_turn(host), site=host)
+            return fn(*args, **kwargs)
+
+        return self._pool(host).submit(run)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for p in pools:
+            p.shutdown(wait=wait)
+
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, float]] = {}  # host -> {"failures": n, "open_until": monotonic time}
+
+    def blocked_for(self, host: str) -> float:
+        # Seconds left before the host may be tried again; 0 when requests can go through
+        with self._lock:
+            s = self._state.get(host)
+            if not s or not s["open_until"]:
+                return 0.0
+            return max(0.0, s["open_until"] - time.monotonic())
+
+    def allow(self, host: str) -> bool:
+        # Like blocked_for, but an expired cool-down admits exactly one trial request (half-open)
+        with self._lock:
+            s = self._state.get(host)
+            if not s or not s["open_until"]:
+                return True
+            now = time.monotonic()
+            if now < s["open_until"]:
+                return False
+            s["open_until"] = now + self.cooldown  # keep everyone else out until the trial reports back
+            return True
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._state.pop(host, None)
+
+    def record_failure(self, host: str, retry_after: float = 0.0):
+        with self._lock:
+            s = self._state.setdefault(host, {"failures": 0, "open_until": 0.0})
+            s["failures"] += 1
+            if retry_after > 0:
+                # The server told us when to come back (429/503): open now, for exactly that long
+                s["open_until"] = time.monotonic() + retry_after
+            elif s["failures"] >= self.failures:
+                s["open_until"] = time.monotonic() + self.cooldown
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        # {host: {"state": "open" | "half-open" | "closed", "failures", "retry_in"}} for hosts with recent failures
+        now = time.monotonic()
+        with self._lock:
+            items = [(h, dict(s)) for h, s in self._state.items()]
+        out = {}
+        for host, s in items:
+            left = s["open_until"] - now if s["open_until"] else 0.0
+            state = "closed" if not s["open_until"] else ("open" if left > 0 else "half-open")
+            out[host] = {"state": state, "failures": int(s["failures"]), "retry_in": round(max(left, 0.0), 1)}
+        return out
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+def get_breaker() -> CircuitBreaker:
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
+
+_scheduler: Optional[HostScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> HostScheduler:
+    # Process-wide scheduler so concurrent scans (e.g. several Dashboard sessions) share host spacing
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = HostScheduler()
+        return _scheduler
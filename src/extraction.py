@@ -0,0 +1,244 @@
+import re, json, time, hashlib, threading
+from lxml import etree
+from typing import Dict, Any, List, Optional, Tuple
+
+from src import metrics
+from src.storage import load_yaml_defaults, get_all_xpaths_for_site, xpaths_version, yaml_defaults_mtime
+from src.utils import FIELDS, norm_ws, canonical_href
+from src.parsing import tags_referenced
+
+def compile_xpath(xpath: str) -> Optional[etree.XPath]:
+    # Invalid expressions compile to None and simply never match (same as a failing doc.xpath call)
+    try:
+        return etree.XPath(xpath)
+    except Exception:
+        return None
+
+# "<element path>//text()" is split into a shared element prefix plus a relative text tail, so fallbacks that
+# target the same elements (e.g. "//h1//text()" for name on several sites/types) select those nodes once per doc.
+# Only the descendant tail is split: with nested matches, "./text()" per element in prefix order can return a
+# later node than the full "/text()" expression does.
+_TEXT_TAIL = re.compile(r"(//text\(\))$")
+_TAILS = {"//text()": etree.XPath(".//text()")}
+
+def _split_prefix(xp: str) -> Optional[Tuple[str, Any]]:
+    m = _TEXT_TAIL.search(xp)
+    if not m or "|" in xp:
+        return None
+    prefix = xp[:m.start()]
+    if not prefix or prefix.count("(") != prefix.count(")") or prefix.count("[") != prefix.count("]"):
+        return None
+    compiled = compile_xpath(prefix)
+    return (prefix, compiled) if compiled is not None else None
+
+def _steps(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    steps = []
+    for it in sorted(items or [], key=lambda x: x.get("priority", 999999)):
+        xp = (it.get("xpath") or "").strip()
+        if not xp:
+            continue
+        step = {"priority": it.get("priority", 999999), "xpath": xp, "compiled": compile_xpath(xp)}
+        split = _split_prefix(xp) if step["compiled"] is not None else None
+        if split:
+            step["prefix"], step["prefix_compiled"] = split
+            step["tail"] = _TAILS[_TEXT_TAIL.search(xp).group(1)]
+        steps.append(step)
+    return steps
+
+def compile_steps(xpaths: List[str]) -> List[Dict[str, Any]]:
+    # Ad-hoc fallback list (e.g. a candidate under test), tried in the given order
+    return _steps([{"priority": i + 1, "xpath": xp} for i, xp in enumerate(xpaths)])
+
+class ExtractionPlan:
+    # Everything needed to extract one site's fields: DB overrides merged over YAML defaults, pre-compiled.
+    # For Yelp, per-page-type field lists plus the compiled detect expressions.
+    def __init__(self, site: str, db_map: Dict[str, List[Dict[str, Any]]], defaults: Dict[str, Any]):
+        self.site = site
+        # Changes whenever the effective XPath configuration changes; stored with scan results
+        self.fingerprint = hashlib.sha1(
+            json.dumps([db_map or {}, (defaults or {}).get(site)], sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        self.overrides = {f: _steps(items) for f, items in (db_map or {}).items()}
+        self.page_types: List[Dict[str, Any]] = []
+        self.fields: Dict[str, List[Dict[str, Any]]] = {}
+        site_d = (defaults or {}).get(site, {}) or {}
+        if site == "yelp":
+            for pt in site_d.get("page_types", []) or []:
+                det = pt.get("detect") or ""
+                self.page_types.append({
+                    "name": pt.get("name", ""),
+                    "detect_xpath": det,
+                    "detect": compile_xpath(det) if det else None,
+                    "fields": {f: _steps(items) for f, items in (pt.get("fields", {}) or {}).items()},
+                })
+        else:
+            self.fields = {f: _steps(items) for f, items in site_d.items() if isinstance(items, list)}
+        # Prunable tags (script/style/svg...) that this site's expressions read, so streaming parse keeps them
+        self.keep_tags = tags_referenced([s["xpath"] for s in self.all_steps()] + [pt["detect_xpath"] for pt in self.page_types])
+
+    def page_type(self, doc) -> Dict[str, Any]:
+        for pt in self.page_types:
+            if pt["detect"] is None:
+                continue
+            try:
+                if pt["detect"](doc):
+                    return pt
+            except Exception:
+                continue
+        # fallback to first
+        return self.page_types[0] if self.page_types else {}
+
+    def fallbacks(self, field: str, doc=None) -> List[Dict[str, Any]]:
+        if field in self.overrides:
+            return self.overrides[field]
+        if self.page_types:
+            return self.page_type(doc).get("fields", {}).get(field, []) if doc is not None else []
+        return self.fields.get(field, [])
+
+    def all_steps(self) -> List[Dict[str, Any]]:
+        steps = [s for items in self.overrides.values() for s in items]
+        steps += [s for items in self.fields.values() for s in items]
+        for pt in self.page_types:
+            steps += [s for items in pt["fields"].values() for s in items]
+        return steps
+
+_plans: Dict[str, Tuple[Tuple[int, float], ExtractionPlan]] = {}
+_plans_lock = threading.Lock()
+
+def get_plan(site: str) -> ExtractionPlan:
+    # Rebuilt only when add_xpath/delete_xpath changed the table or the YAML file's mtime moved
+    key = (xpaths_version(), yaml_defaults_mtime())
+    with _plans_lock:
+        cached = _plans.get(site)
+        if cached and cached[0] == key:
+            return cached[1]
+    plan = ExtractionPlan(site, get_all_xpaths_for_site(site), load_yaml_defaults())
+    with _plans_lock:
+        _plans[site] = (key, plan)
+    return plan
+
+def clear_plans():
+    with _plans_lock:
+        _plans.clear()
+
+def _eval(doc, xpath) -> list:
+    # Accepts a raw expression or a pre-compiled etree.XPath from an extraction plan
+    if xpath is None:
+        return []
+    return xpath(doc) if callable(xpath) else doc.xpath(xpath)
+
+def _first(nodes):
+    if isinstance(nodes, list):
+        return nodes[0] if nodes else None
+    # string()/count() style expressions return a scalar
+    return nodes if nodes not in ("", None) else None
+
+def node_text(n) -> str:
+    if n is None:
+        return ""
+    if isinstance(n, str):
+        return norm_ws(n)
+    try:
+        # element
+        return norm_ws(n.text_content() or "")
+    except Exception:
+        return ""
+
+def node_anchor(n) -> Dict[str, str]:
+    if n is None:
+        return {"anchor": "", "href": ""}
+    if isinstance(n, str):
+        # If xpath selects text node, jump to parent link if possible via second try
+        return {"anchor": norm_ws(n), "href": ""}
+    # assume element
+    try:
+        anchor_text = norm_ws(n.text_content() or "")
+    except Exception:
+        anchor_text = ""
+    try:
+        href = canonical_href(n.get("href",""))
+    except Exception:
+        href = ""
+    return {"anchor": anchor_text, "href": href}
+
+def extract_first(doc, xpath) -> str:
+    try:
+        return node_text(_first(_eval(doc, xpath)))
+    except Exception:
+        return ""
+
+def extract_anchor(doc, xpath) -> Dict[str, str]:
+    # Get both anchor text and href from a single XPath (that points to <a> or text under it)
+    try:
+        return node_anchor(_first(_eval(doc, xpath)))
+    except Exception:
+        return {"anchor": "", "href": ""}
+
+class DocEvaluator:
+    # Per-document memo of evaluated expressions/prefixes so shared node-sets are selected only once
+    def __init__(self, doc):
+        self.doc = doc
+        self.memo: Dict[str, Any] = {}
+
+    def select(self, key: str, compiled) -> Any:
+        if key not in self.memo:
+            try:
+                self.memo[key] = _eval(self.doc, compiled)
+            except Exception:
+                self.memo[key] = []
+        return self.memo[key]
+
+    def first(self, step: Dict[str, Any]):
+        if step.get("prefix"):
+            nodes = self.select(step["prefix"], step["prefix_compiled"])
+            if isinstance(nodes, list) and all(isinstance(n, etree._Element) for n in nodes):
+                # First text node of the first prefix element that has one == first node of the full expression:
+                # a later element's descendants are either inside an earlier one or after it in document order
+                for n in nodes:
+                    found = step["tail"](n)
+                    if found:
+                        return found[0]
+                return None
+        return _first(self.select(step["xpath"], step["compiled"]))
+
+def _timed_first(ev: DocEvaluator, step: Dict[str, Any], site: str, field: str):
+    t = time.perf_counter()
+    try:
+        return ev.first(step)
+    finally:
+        metrics.observe("xpath_seconds", time.perf_counter() - t, site=site, field=field, xpath=step["xpath"])
+
+def first_hit(ev: DocEvaluator, field: str, steps: List[Dict[str, Any]], site: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+    # Value of the first non-empty fallback and its index in steps (-1 when none hit).
+    # With a site, each evaluation is recorded in metrics; ad-hoc candidates (site=None) are not.
+    for i, step in enumerate(steps):
+        node = _timed_first(ev, step, site, field) if site is not None else ev.first(step)
+        if field == "website":
+            cand = node_anchor(node)
+            if cand["anchor"] or cand["href"]:
+                return cand, i
+        else:
+            val = node_text(node)
+            if val:
+                return {"value": val}, i
+    return ({"anchor": "", "href": ""} if field == "website" else {"value": ""}), -1
+
+def extract_all(site: str, doc, fields: Optional[List[str]] = None, plan: Optional[ExtractionPlan] = None) -> Dict[str, Dict[str, Any]]:
+    # One pass per page: Yelp page type detected once, first non-empty fallback wins per field
+    plan = plan or get_plan(site)
+    ev = DocEvaluator(doc)
+    pt = {}
+    if plan.page_types and any(f not in plan.overrides for f in (fields or FIELDS)):
+        t = time.perf_counter()
+        pt = plan.page_type(doc)
+        metrics.observe("xpath_seconds", time.perf_counter() - t, site=site, field="_page_type", xpath="detect")
+    out: Dict[str, Dict[str, Any]] = {}
+    for field in fields or FIELDS:
+        if field in plan.overrides:
+            steps = plan.overrides[field]
+        elif plan.page_types:
+            steps = pt.get("fields", {}).get(field, [])
+        else:
+            steps = plan.fields.get(field, [])
+        out[field] = first_hit(ev, field, steps, site)[0]
+    return out
@@ -0,0 +1,152 @@
+import re
+from functools import lru_cache
+from typing import Optional, List, Tuple
+
+# Freeform opening hours ("Mon–Fri 9am–5pm, Sat 10-2", "Monday 9 AM–5 PM Tuesday ...", "Open 24 hours") are
+# compiled into a weekly bitmap: 7 days x 96 quarter-hour slots, bit = day * 96 + slot, Monday = day 0.
+SLOTS_PER_DAY = 96
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+_DAY_NAMES = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tues": 1, "tue": 1,
+    "wednesday": 2, "weds": 2, "wed": 2,
+    "thursday": 3, "thurs": 3, "thur": 3, "thu": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+# Day abbreviations we don't map (OpenStreetMap "Mo-Fr", German, French, Spanish), recognized only where they're
+# followed by a range/list/time; hours naming such days can't be placed, so the text doesn't parse
+_FOREIGN_DAYS = ["mo", "tu", "we", "th", "fr", "sa", "su", "di", "mi", "do", "so", "lu", "ma", "me", "je", "ve",
+                 "ju", "vi", "lun", "mar", "mer", "jeu", "ven", "sam", "dim", "mié", "jue", "vie", "sáb", "dom"]
+_DAY_GROUPS = {
+    "daily": range(7), "everyday": range(7), "every day": range(7), "7 days a week": range(7), "7 days": range(7),
+    "weekdays": range(5), "m-f": range(5), "weekends": (5, 6), "weekend": (5, 6),
+}
+
+_TOKEN = re.compile(
+    r"(?P<h24>24\s*/\s*7|24\s*h(?:ou)?rs?|24\s*hours|open\s+24)"
+    r"|(?P<group>" + "|".join(sorted((re.escape(k) for k in _DAY_GROUPS), key=len, reverse=True)) + r")\b"
+    r"|(?P<day>" + "|".join(sorted(_DAY_NAMES, key=len, reverse=True)) + r")\b\.?"
+    r"|\b(?P<unknown_day>" + "|".join(sorted(_FOREIGN_DAYS, key=len, reverse=True)) + r")\b\.?(?=\s*(?:-|,|/|\d))"
+    r"|(?P<time>noon|midnight|\d{1,2}(?::\d{2}|\.\d{2})?\s*(?:a\.?\s?m\.?|p\.?\s?m\.?|a\b|p\b)?)"
+    r"|(?P<sep>-|\bto\b|\bthrough\b|\bthru\b|\buntil\b|\btil\b)"
+    r"|(?P<closed>closed)"
+)
+_TIME = re.compile(r"(\d{1,2})(?:[:.](\d{2}))?\s*([ap])?")
+
+def _normalize_text(text: str) -> str:
+    t = (text or "").lower()
+    return re.sub(r"[‒–—―−]", "-", t)
+
+def _tokens(text: str) -> List[Tuple[str, str]]:
+    return [(m.lastgroup, m.group(m.lastgroup)) for m in _TOKEN.finditer(_normalize_text(text))]
+
+def _clock(tok: str) -> Tuple[int, Optional[str]]:
+    # -> (minutes as written, "a"/"p" meridiem or None)
+    if tok == "noon":
+        return 12 * 60, "p"
+    if tok == "midnight":
+        return 0, "a"
+    m = _TIME.match(tok)
+    if not m:
+        return -1, None
+    return int(m.group(1)) * 60 + int(m.group(2) or 0), m.group(3)
+
+def _to_24h(mins: int, mer: Optional[str]) -> int:
+    h, m = divmod(mins, 60)
+    if mer == "a" and h == 12:
+        h = 0
+    elif mer == "p" and h < 12:
+        h += 12
+    return h * 60 + m
+
+def _resolve_range(a: str, b: str) -> Optional[Tuple[int, int]]:
+    (sa, ma), (sb, mb) = _clock(a), _clock(b)
+    if not (0 <= sa <= 24 * 60 and 0 <= sb <= 24 * 60):
+        return None
+    if ma is None and mb is not None:
+        # "9-5pm": start shares the end's meridiem unless that puts it after the end
+        ma = mb if _to_24h(sa, mb) < _to_24h(sb, mb) else ("a" if mb == "p" else "p")
+    start = _to_24h(sa, ma) if ma else sa
+    end = _to_24h(sb, mb) if mb else sb
+    if mb is None and sb < 13 * 60 and end <= start < end + 12 * 60:
+        # Bare closing hour on a 12h clock ("9-5", "9am-6", "12-8") closes in the afternoon/evening; when even
+        # that is before the start ("10pm-2") it's an overnight close
+        end += 12 * 60
+    return start, min(end, 24 * 60)
+
+def _set_range(bitmap: int, day: int, start: int, end: int) -> int:
+    s, e = start // 15, -(-end // 15)
+    if end <= start:
+        # Overnight (e.g. 6pm-2am) spills into the next day
+        bitmap = _set_range(bitmap, day, start, 24 * 60)
+        return _set_range(bitmap, (day + 1) % 7, 0, end) if end > 0 else bitmap
+    mask = ((1 << (e - s)) - 1) << s
+    return bitmap | (mask << (day * SLOTS_PER_DAY))
+
+@lru_cache(maxsize=65536)
+def parse_hours(text: str) -> Optional[int]:
+    # Weekly bitmap, or None when nothing in the text looks like hours
+    toks = _tokens(text)
+    bitmap = 0
+    days: List[int] = []
+    applied = False    # current day set has received times; the next day token starts a new set
+    parsed = False
+    i = 0
+    while i < len(toks):
+        kind, val = toks[i]
+        if kind in ("day", "group"):
+            if applied:
+                days, applied = [], False
+            if kind == "group":
+                days += list(_DAY_GROUPS[val])
+            elif i + 2 < len(toks) and toks[i + 1][0] == "sep" and toks[i + 2][0] == "day":
+                a, b = _DAY_NAMES[val.rstrip(".")], _DAY_NAMES[toks[i + 2][1].rstrip(".")]
+                days += [(a + k) % 7 for k in range((b - a) % 7 + 1)]
+                i += 2
+            else:
+                days.append(_DAY_NAMES[val.rstrip(".")])
+        elif kind == "time" and i + 2 < len(toks) and toks[i + 1][0] == "sep" and toks[i + 2][0] == "time":
+            rng = _resolve_range(val, toks[i + 2][1])
+            if rng:
+                for d in (days or range(7)):
+                    bitmap = _set_range(bitmap, d, *rng) if rng[0] != rng[1] else bitmap | (FULL_DAY << (d * SLOTS_PER_DAY))
+                applied = parsed = True
+            i += 2
+        elif kind == "h24":
+            for d in (days or range(7)):
+                bitmap |= FULL_DAY << (d * SLOTS_PER_DAY)
+            applied = parsed = True
+        elif kind == "closed":
+            applied = parsed = True
+        elif kind == "unknown_day":
+            return None
+        i += 1
+    return bitmap if parsed else None
+
+def hours_similarity(a: int, b: int) -> float:
+    # Jaccard over open quarter-hours
+    union = (a | b).bit_count()
+    return 1.0 if union == 0 else (a & b).bit_count() / union
+
+def format_hours(bitmap: int) -> str:
+    # Human-readable rendering, handy when reviewing mismatches
+    names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    out = []
+    for d in range(7):
+        day = (bitmap >> (d * SLOTS_PER_DAY)) & FULL_DAY
+        if not day:
+            out.append(f"{names[d]} closed")
+            continue
+        spans, s = [], None
+        for slot in range(SLOTS_PER_DAY + 1):
+            on = slot < SLOTS_PER_DAY and (day >> slot) & 1
+            if on and s is None:
+                s = slot
+            elif not on and s is not None:
+                spans.append(f"{s * 15 // 60:02d}:{s * 15 % 60:02d}-{slot * 15 // 60:02d}:{slot * 15 % 60:02d}")
+                s = None
+        out.append(f"{names[d]} {', '.join(spans)}")
+    return "; ".join(out)
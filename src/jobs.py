@@ -0,0 +1,93 @@
+import os, time, uuid, socket, threading, logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable
+
+from src.storage import (
+    get_client_by_id, create_jobs, update_job, save_job_site, list_jobs, get_job_sites, heartbeat_jobs,
+    interrupt_stale_jobs,
+)
+from src.scraper import scan_clients
+from src import metrics
+
+# Background scan queue: jobs live in the SQLite jobs table (so a browser reload can pick them back up) and run
+# on a process-wide thread pool. Each finished site is written to job_sites immediately for the UI to poll.
+# Every process with a pool heartbeats its active jobs; jobs whose heartbeat stops (their process died) are
+# marked interrupted by whichever process sweeps next, while jobs of other live processes are left alone.
+log = logging.getLogger("listings.jobs")
+
+MAX_CONCURRENT_JOBS = 4  # per-host politeness is still enforced by the scan scheduler underneath
+HEARTBEAT_SECONDS = 10.0
+JOB_STALE_SECONDS = 60.0  # heartbeat age after which a queued/running job counts as orphaned
+
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _heartbeat():
+    while True:
+        try:
+            heartbeat_jobs(_worker_id)
+            interrupt_stale_jobs(JOB_STALE_SECONDS)
+        except Exception:
+            log.exception("job heartbeat failed")
+        time.sleep(HEARTBEAT_SECONDS)
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="scan-job")
+            threading.Thread(target=_heartbeat, name="scan-job-heartbeat", daemon=True).start()
+        return _pool
+
+def _site_status(site_data: Dict[str, Any]) -> str:
+    meta = site_data.get("_meta", {})
+    if meta.get("reused"):
+        return "unchanged"
+    if meta.get("status") in (200, 304):
+        return "ok"
+    return f"failed ({meta['error']})" if meta.get("error") else "failed"
+
+def _run_job(job_id: int, client_id: int, options: Dict[str, Any]):
+    update_job(job_id, status="running", started_at=time.time())
+    try:
+        client = get_client_by_id(client_id)
+        if not client:
+            raise ValueError(f"client {client_id} not found")
+
+        def on_site(_, site, site_data):
+            meta = site_data.get("_meta", {})
+            result = {k: v for k, v in site_data.items() if k != "_meta"}
+            save_job_site(job_id, site, _site_status(site_data), meta.get("fetch_s", 0.0), meta.get("latency_s", 0.0), result)
+
+        scan_clients([client], force_refresh=bool(options.get("force_refresh")),
+                     incremental=bool(options.get("incremental")), record=True, on_site=on_site)
+        update_job(job_id, status="done", finished_at=time.time())
+    except Exception as e:
+        log.exception("scan job %s failed", job_id)
+        update_job(job_id, status="failed", error=str(e), finished_at=time.time())
+    try:
+        metrics.write_textfile()
+    except OSError:
+        log.warning("could not write %s", metrics.METRICS_FILE)
+
+def submit_scans(client_ids: Iterable[int], force_refresh: bool = False, incremental: bool = False) -> List[int]:
+    # Queue one job per client and return their ids immediately
+    pool = _get_pool()
+    client_ids = list(client_ids)
+    options = {"force_refresh": force_refresh, "incremental": incremental}
+    job_ids = create_jobs(client_ids, options, _worker_id, os.getpid(), socket.gethostname())
+    for job_id, cid in zip(job_ids, client_ids):
+        pool.submit(_run_job, job_id, cid, options)
+    return job_ids
+
+def job_progress(job_id: int) -> Dict[str, Any]:
+    # {site: {"status", "fetch_s", "latency_s", "result"}} for the sites finished so far
+    return {r["site"]: r for r in get_job_sites(job_id)}
+
+def recent_jobs(client_id=None, limit: int = 20) -> List[Dict[str, Any]]:
+    _get_pool()  # starts this process's heartbeat, which also retires jobs orphaned by dead processes
+    return list_jobs(client_id, limit)
+
+def has_active_jobs(jobs: List[Dict[str, Any]]) -> bool:
+    return any(j["status"] in ("queued", "running") for j in jobs)
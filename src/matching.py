@@ -0,0 +1,259 @@
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+
+import phonenumbers
+
+from src.utils import FIELDS, canonical_href
+from src.hours import parse_hours, hours_similarity
+
+try:  # optional C-accelerated similarity kernel
+    from rapidfuzz.fuzz import ratio as _rf_ratio
+except ImportError:
+    _rf_ratio = None
+
+# Normalized comparison keys. The SSOT side is computed once when a client is saved (see ssot_norms) and stored
+# in the clients table; bump NORM_VERSION whenever a key function changes so stored keys get recomputed.
+NORM_VERSION = 4
+
+# Minimum similarity (0..1) for a fuzzy match once exact key equality fails; hours compare open quarter-hours
+MATCH_THRESHOLDS = {"name": 0.88, "address": 0.90, "hours": 1.0}
+
+_STREET_SUFFIXES = {
+    "street": "st", "str": "st", "avenue": "ave", "av": "ave", "avn": "ave", "road": "rd", "boulevard": "blvd",
+    "drive": "dr", "drv": "dr", "lane": "ln", "court": "ct", "place": "pl", "parkway": "pkwy", "pky": "pkwy",
+    "highway": "hwy", "circle": "cir", "terrace": "ter", "square": "sq", "trail": "trl", "way": "way",
+    "expressway": "expy", "freeway": "fwy", "plaza": "plz", "center": "ctr", "centre": "ctr", "point": "pt",
+    "mount": "mt", "fort": "ft", "saint": "st", "crossing": "xing", "alley": "aly", "loop": "loop",
+}
+_DIRECTIONS = {
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+_UNIT_WORDS = {"suite", "ste", "unit", "apt", "apartment", "#", "room", "rm", "no", "bldg", "building"}
+_STATES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca", "colorado": "co",
+    "connecticut": "ct", "delaware": "de", "florida": "fl", "georgia": "ga", "hawaii": "hi", "idaho": "id",
+    "illinois": "il", "indiana": "in", "iowa": "ia", "kansas": "ks", "kentucky": "ky", "louisiana": "la",
+    "maine": "me", "maryland": "md", "massachusetts": "ma", "michigan": "mi", "minnesota": "mn",
+    "mississippi": "ms", "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny", "north carolina": "nc",
+    "north dakota": "nd", "ohio": "oh", "oklahoma": "ok", "oregon": "or", "pennsylvania": "pa",
+    "rhode island": "ri", "south carolina": "sc", "south dakota": "sd", "tennessee": "tn", "texas": "tx",
+    "utah": "ut", "vermont": "vt", "virginia": "va", "washington": "wa", "west virginia": "wv",
+    "wisconsin": "wi", "wyoming": "wy", "district of columbia": "dc",
+}
+_STATE_RE = re.compile(r"\b(" + "|".join(sorted(_STATES, key=len, reverse=True)) + r")\b")
+_COUNTRY_RE = re.compile(r"\b(united states of america|united states|usa|u\.s\.a\.?)\s*$")
+_NAME_STOPWORDS = {"the", "llc", "inc", "incorporated", "co", "corp", "corporation", "company", "ltd", "limited", "pllc"}
+
+PHONE_CACHE_MAX = 65536
+_phones: Dict[str, Tuple[str, str]] = {}
+
+def _phone_forms(s: str) -> Tuple[str, str]:
+    # (national format, E.164) for valid numbers, (digits, digits) otherwise. Parsing dominates the cost, so both
+    # forms come from one parse. The E.164 form is cached too, since that's what bulk import stores as the SSOT and
+    # later keys with phone_key (it parses back to the same number).
+    hit = _phones.get(s)
+    if hit:
+        return hit
+    forms = None
+    try:
+        p = phonenumbers.parse(s, "US")
+        if phonenumbers.is_valid_number(p):
+            forms = (phonenumbers.format_number(p, phonenumbers.PhoneNumberFormat.NATIONAL),
+                     phonenumbers.format_number(p, phonenumbers.PhoneNumberFormat.E164))
+    except Exception:
+        pass
+    if forms is None:
+        digits = re.sub(r"\D+", "", s)
+        forms = (digits, digits)
+    if len(_phones) >= PHONE_CACHE_MAX:
+        _phones.clear()
+    _phones[s] = forms
+    if forms[1].startswith("+"):
+        _phones[forms[1]] = forms
+    return forms
+
+def normalize_phone(s: str) -> str:
+    return _phone_forms((s or "").strip())[0]
+
+def phone_key(s: str) -> str:
+    # E.164 for valid numbers, bare digits otherwise
+    return _phone_forms((s or "").strip())[1]
+
+_SCHEME = re.compile(r"^[a-z][a-z0-9+.-]*://", re.I)
+
+def website_key(s: str) -> str:
+    # "HTTPS://www.Example.com/about/?utm=x" -> "example.com/about": scheme, "www.", host case, query and trailing
+    # slash don't tell websites apart
+    host, _, path = _SCHEME.sub("", canonical_href((s or "").strip())).partition("/")
+    host = host.lower()
+    host = host[4:] if host.startswith("www.") else host
+    path = path.rstrip("/")
+    return f"{host}/{path}" if path else host
+
+@lru_cache(maxsize=65536)
+def address_tokens(s: str) -> Tuple[str, ...]:
+    # "123 North Main Street, Suite 4B, Springfield, Illinois 62704-1234, USA" -> 123 n main st unit 4b springfield il 62704
+    t = (s or "").lower().strip()
+    t = _COUNTRY_RE.sub("", t)
+    t = _STATE_RE.sub(lambda m: _STATES[m.group(1)], t)
+    t = re.sub(r"#", " # ", t)
+    t = re.sub(r"[^\w#\s-]", " ", t)
+    out = []
+    for tok in t.split():
+        if re.fullmatch(r"\d{5}-\d{4}", tok):
+            tok = tok[:5]
+        tok = tok.strip("-")
+        if not tok:
+            continue
+        if tok in _UNIT_WORDS:
+            if out and out[-1] == "unit":
+                continue
+            out.append("unit")
+            continue
+        out.append(_STREET_SUFFIXES.get(tok) or _DIRECTIONS.get(tok) or tok)
+    return tuple(out)
+
+def address_key(s: str) -> str:
+    return " ".join(address_tokens(s))
+
+@lru_cache(maxsize=65536)
+def name_key(s: str) -> str:
+    t = (s or "").lower().replace("&", " and ")
+    t = re.sub(r"['’`]", "", t)
+    t = re.sub(r"[^\w\s]", " ", t)
+    return " ".join(tok for tok in t.split() if tok not in _NAME_STOPWORDS)
+
+def hours_key(s: str) -> str:
+    # "h:<hex weekly bitmap>" when the text parses as hours, else "t:<collapsed text>"; "" for empty
+    text = re.sub(r"\s+", " ", (s or "").lower().strip())
+    if not text:
+        return ""
+    bitmap = parse_hours(text)
+    return f"h:{bitmap:x}" if bitmap is not None else f"t:{text}"
+
+@lru_cache(maxsize=65536)
+def numeric_split(key: str) -> Tuple[Tuple[str, ...], str]:
+    # ("123", "4b", "62704"), "n main st unit springfield il" for an address key: tokens holding a digit, sorted,
+    # and the remaining words
+    nums, words = [], []
+    for tok in key.split():
+        (nums if any(c.isdigit() for c in tok) else words).append(tok)
+    return tuple(sorted(nums)), " ".join(words)
+
+@lru_cache(maxsize=262144)
+def similar(a: str, b: str, threshold: float) -> bool:
+    # Token-sorted similarity; difflib's cheap upper bounds reject most non-matches before the full ratio
+    a, b = " ".join(sorted(a.split())), " ".join(sorted(b.split()))
+    if a == b:
+        return True
+    if not a or not b:
+        return False
+    if _rf_ratio is not None:
+        return _rf_ratio(a, b) / 100.0 >= threshold
+    sm = SequenceMatcher(None, a, b, autojunk=False)
+    return sm.real_quick_ratio() >= threshold and sm.quick_ratio() >= threshold and sm.ratio() >= threshold
+
+KEY_FUNCS = {
+    "name": name_key,
+    "address": address_key,
+    "phone": phone_key,
+    "website": website_key,
+    "hours": hours_key,
+}
+
+def ssot_norms(ssot: Dict[str, str]) -> Dict[str, Any]:
+    # Stored alongside the client as norm_<field> columns plus norm_version
+    out: Dict[str, Any] = {f"norm_{f}": KEY_FUNCS[f](ssot.get(f, "") or "") for f in FIELDS}
+    out["norm_version"] = NORM_VERSION
+    return out
+
+def client_norms(client: Dict[str, Any]) -> Dict[str, str]:
+    # {field: key} from the stored columns when current, recomputed from ssot_* otherwise
+    if client.get("norm_version") == NORM_VERSION:
+        return {f: client.get(f"norm_{f}") or "" for f in FIELDS}
+    return {f: KEY_FUNCS[f](client.get(f"ssot_{f}", "") or "") for f in FIELDS}
+
+def extracted_key(field: str, extracted: Dict[str, Any]) -> str:
+    return KEY_FUNCS[field](extracted.get("href" if field == "website" else "value", "") or "")
+
+def keys_match(field: str, a: str, b: str, thresholds: Optional[Dict[str, float]] = None) -> bool:
+    th = (thresholds or MATCH_THRESHOLDS).get(field, 1.0)
+    if field == "hours":
+        if not (a or b):
+            return False
+        if a == b:
+            return True
+        if a.startswith("h:") and b.startswith("h:"):
+            return hours_similarity(int(a[2:], 16), int(b[2:], 16)) >= th
+        return False
+    if a == b:
+        return True
+    if field in ("name", "address") and th < 1.0:
+        # House/unit numbers and ZIPs must agree exactly; only the words are compared fuzzily
+        (na, wa), (nb, wb) = numeric_split(a), numeric_split(b)
+        return na == nb and similar(wa, wb, th)
+    return False
+
+def compare(field: str, extracted: Dict[str, Any], ssot: Dict[str, str], norms: Optional[Dict[str, str]] = None,
+            thresholds: Optional[Dict[str, float]] = None) -> bool:
+    # Exact comparison of normalized keys, then fuzzy similarity for name/address and interval overlap for hours
+    if field not in KEY_FUNCS:
+        return False
+    b = norms[field] if norms is not None else KEY_FUNCS[field](ssot.get(field, "") or "")
+    return keys_match(field, extracted_key(field, extracted), b, thresholds)
+
+# --- Batched comparison over pandas columns (e.g. every client x site for one field) ---
+
+def _map_unique(s, fn):
+    # Scalar key functions run once per distinct value; listings repeat heavily across a portfolio
+    uniq = s.unique()
+    return s.map(dict(zip(uniq, (fn(u) for u in uniq))))
+
+def normalize_column(field: str, s):
+    if field not in KEY_FUNCS:
+        raise ValueError(f"unknown field: {field}")
+    s = s.fillna("").astype(str)
+    # Cheap vectorized whitespace cleanup first so more values collapse onto the same distinct key
+    s = s.str.strip().str.replace(r"\s+", " ", regex=True)
+    return _map_unique(s, KEY_FUNCS[field])
+
+def compare_column(field: str, extracted, ssot_keys, thresholds: Optional[Dict[str, float]] = None):
+    # extracted: raw values (hrefs for website); ssot_keys: stored norm_<field> keys, aligned index -> bool Series
+    a = normalize_column(field, extracted)
+    b = ssot_keys.fillna("").astype(str)
+    eq = a == b
+    if field == "hours":
+        eq &= (a != "") | (b != "")
+    # Only the pairs that differ go through the fuzzy kernel, once per distinct pair
+    rest = ~eq & ((a != "") | (b != ""))
+    if rest.any() and field in ("name", "address", "hours"):
+        pairs = list(zip(a[rest], b[rest]))
+        verdict = {p: keys_match(field, p[0], p[1], thresholds) for p in set(pairs)}
+        eq.loc[rest] = [verdict[p] for p in pairs]
+    return eq
+
+def compare_frame(results, clients, thresholds: Optional[Dict[str, float]] = None):
+    # results: long rows with client_id, field, value, href; clients: rows with id + norm_<field> (+ ssot_* fallback).
+    # Returns a bool Series aligned to results.index.
+    import pandas as pd
+    clients = clients.copy()
+    stale = clients.get("norm_version", pd.Series(index=clients.index, dtype=float)) != NORM_VERSION
+    for f in FIELDS:
+        col = f"norm_{f}"
+        if col not in clients:
+            clients[col] = ""
+        if stale.any():
+            clients.loc[stale, col] = normalize_column(f, clients.loc[stale, f"ssot_{f}"])
+    keys = clients.set_index("id")
+    out = pd.Series(False, index=results.index)
+    for f, grp in results.groupby("field"):
+        if f not in KEY_FUNCS:
+            continue
+        raw = grp["href"] if f == "website" else grp["value"]
+        ssot = grp["client_id"].map(keys[f"norm_{f}"])
+        out.loc[grp.index] = compare_column(f, raw, ssot, thresholds).values
+    return out
@@ -0,0 +1,184 @@
+import os, time, threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+# In-process scan metrics: counters and latency histograms keyed by (name, labels), rendered in the Prometheus text
+# exposition format. Recording is a perf_counter pair plus one locked dict update, cheap enough for the hot path.
+METRICS_ENABLED = True
+METRICS_FILE = os.path.join("data", "metrics.prom")  # node_exporter textfile-collector style
+PREFIX = "listings_"
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SLOW_XPATH_MS = 25.0  # mean evaluation time above which a configured XPath is flagged
+
+HELP = {
+    "queue_wait_seconds": "Time a fetch waited for a worker of its host pool",
+    "politeness_delay_seconds": "Time a fetch slept for per-host request spacing",
+    "ttfb_seconds": "Request start to response headers (includes DNS, connect and TLS on new connections)",
+    "download_seconds": "Response headers to last body byte",
+    "fetch_total": "Fetch outcomes by site",
+    "fetch_bytes_total": "Response body bytes downloaded",
+    "parse_seconds": "HTML parse time",
+    "extract_cache_total": "Extracted-fields cache lookups (content hash + XPath plan)",
+    "xpath_seconds": "Per-expression XPath evaluation time",
+    "compare_seconds": "Extracted-vs-SSOT comparison time",
+    "fetch_seconds": "Whole fetch per page including retries and backoff (0 for page-cache hits)",
+    "scan_urls_total": "Client listing URLs per scan plan: fetched (one per unique page), shared (served by another "
+                       "client's page), wrong_site or invalid_url (rejected)",
+}
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_hists: Dict[Tuple[str, Tuple], List[float]] = {}  # [count, sum, max, bucket counts...]
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1.0, **labels):
+    if not METRICS_ENABLED:
+        return
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0.0) + value
+
+def observe(name: str, seconds: float, **labels):
+    if not METRICS_ENABLED:
+        return
+    k = _key(name, labels)
+    with _lock:
+        h = _hists.get(k)
+        if h is None:
+            h = _hists[k] = [0.0, 0.0, 0.0] + [0.0] * len(BUCKETS)
+        h[0] += 1
+        h[1] += seconds
+        h[2] = max(h[2], seconds)
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                h[3 + i] += 1
+                break
+
+@contextmanager
+def timer(name: str, **labels):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t, **labels)
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _hists.clear()
+
+def drain() -> Tuple[Dict, Dict]:
+    # Take and clear everything recorded so far, e.g. in a parse worker process, for merge() in the parent
+    with _lock:
+        out = (dict(_counters), {k: list(v) for k, v in _hists.items()})
+        _counters.clear()
+        _hists.clear()
+    return out
+
+def merge(snapshot: Tuple[Dict, Dict]):
+    counters, hists = snapshot
+    with _lock:
+        for k, v in counters.items():
+            _counters[k] = _counters.get(k, 0.0) + v
+        for k, src in hists.items():
+            h = _hists.get(k)
+            if h is None:
+                _hists[k] = list(src)
+                continue
+            h[0] += src[0]
+            h[1] += src[1]
+            h[2] = max(h[2], src[2])
+            for i in range(3, len(h)):
+                h[i] += src[i]
+
+def _fmt_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def render_prometheus() -> str:
+    with _lock:
+        counters = sorted(_counters.items())
+        hists = sorted((k, list(v)) for k, v in _hists.items())
+    lines: List[str] = []
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} counter"]
+        lines.append(f"{PREFIX}{name}{_fmt_labels(labels)} {value:g}")
+    for (name, labels), h in hists:
+        if name not in seen:
+            seen.add(name)
+            lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} histogram"]
+        cum = 0.0
+        for b, n in zip(BUCKETS, h[3:]):
+            cum += n
+            lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels, (('le', f'{b:g}'),))} {cum:g}")
+        lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {h[0]:g}")
+        lines.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {h[1]:.6f}")
+        lines.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {h[0]:g}")
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path: str = METRICS_FILE):
+    # Atomic replace so a scraper never reads a half-written file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    # GET /metrics on a daemon thread, for long-running batch scans
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def summary(name: str) -> List[Dict[str, Any]]:
+    # One row per label set of a histogram: labels + count, total_s, mean_ms, max_ms
+    with _lock:
+        items = [(labels, list(h)) for (n, labels), h in _hists.items() if n == name]
+    rows = []
+    for labels, h in items:
+        rows.append({**dict(labels), "count": int(h[0]), "total_s": round(h[1], 4),
+                     "mean_ms": round(1000 * h[1] / h[0], 3) if h[0] else 0.0, "max_ms": round(1000 * h[2], 3)})
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+def stage_summary() -> List[Dict[str, Any]]:
+    # Totals per stage and site, for the Dashboard Performance panel
+    with _lock:
+        items = [(n, dict(labels), list(h)) for (n, labels), h in _hists.items()]
+    agg: Dict[Tuple[str, str], List[float]] = {}
+    for name, labels, h in items:
+        a = agg.setdefault((name.replace("_seconds", ""), labels.get("site", "")), [0.0, 0.0, 0.0])
+        a[0] += h[0]
+        a[1] += h[1]
+        a[2] = max(a[2], h[2])
+    return [{"stage": stage, "site": site, "count": int(a[0]), "total_s": round(a[1], 4),
+             "mean_ms": round(1000 * a[1] / a[0], 3) if a[0] else 0.0, "max_ms": round(1000 * a[2], 3)}
+            for (stage, site), a in sorted(agg.items())]
+
+def slow_xpaths(threshold_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+    # Configured expressions whose mean evaluation time exceeds the threshold, slowest first
+    th = SLOW_XPATH_MS if threshold_ms is None else threshold_ms
+    return [r for r in summary("xpath_seconds") if r["mean_ms"] >= th]
@@ -0,0 +1,139 @@
+import os, gzip, uuid, atexit, hashlib, threading, time
+from typing import Dict, Any, Optional, Iterator
+
+from src.storage import (
+    get_cached_page, put_cached_page, revalidate_cached_page, touch_cached_pages, page_cache_total_size,
+    list_cached_pages, list_cached_pages_lru, delete_cached_page, clear_page_cache,
+)
+from src import storage
+from src.utils import canonical_url, canonicalize_site_key
+
+# Page bodies are stored gzip-compressed under data/page_cache/<hh>/<sha256>.gz, indexed by canonical URL
+CACHE_DIR = os.path.join("data", "page_cache")
+PAGE_CACHE_TTL = 6 * 3600                 # seconds a cached page is served without touching the network
+PAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # total compressed size before LRU eviction kicks in
+TOUCH_FLUSH_SECONDS = 30.0                # cache hits update LRU order in one write at most this often
+
+_touches: Dict[str, Dict[str, float]] = {}  # DB_PATH -> {canonical URL -> last read}, not yet written to the index
+_touch_lock = threading.Lock()
+_touched_at = time.monotonic()
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body or b"").hexdigest()
+
+def blob_path(h: str) -> str:
+    return os.path.join(CACHE_DIR, h[:2], f"{h}.gz")
+
+def read_blob_file(path: str) -> Optional[bytes]:
+    try:
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    except (OSError, EOFError):
+        return None
+
+def _read_blob(h: str) -> Optional[bytes]:
+    return read_blob_file(blob_path(h))
+
+def _write_blob(h: str, body: bytes) -> int:
+    path = blob_path(h)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"  # per call: threads may write the same hash at once
+        with open(tmp, "wb") as f:
+            f.write(gzip.compress(body, compresslevel=6))
+        os.replace(tmp, path)
+    return os.path.getsize(path)
+
+def _touch(key: str):
+    global _touched_at
+    with _touch_lock:
+        _touches.setdefault(storage.DB_PATH, {})[key] = time.time()
+        due = time.monotonic() - _touched_at >= TOUCH_FLUSH_SECONDS
+    if due:
+        flush_touches()
+
+def flush_touches():
+    # Writes the buffered read times (also before eviction and at exit)
+    global _touched_at
+    with _touch_lock:
+        pending = list(_touches.items())
+        _touches.clear()
+        _touched_at = time.monotonic()
+    for db_path, touches in pending:
+        touch_cached_pages(touches.items(), db_path)
+
+atexit.register(flush_touches)
+
+def get(url: str, ttl: Optional[float] = None) -> Dict[str, Any]:
+    # Returns the index entry plus "fresh" (within TTL); {} on miss. The blob is read separately by body(), when
+    # the page is served (fresh) or the server answers 304 (stale).
+    key = canonical_url(url)
+    entry = get_cached_page(key)
+    if not entry:
+        return {}
+    ttl = PAGE_CACHE_TTL if ttl is None else ttl
+    entry["fresh"] = (time.time() - (entry.get("fetched_at") or 0)) < ttl
+    _touch(key)
+    return entry
+
+def body(entry: Dict[str, Any]) -> Optional[bytes]:
+    # The entry's page body, read once and kept on the entry; None (and the entry dropped) when the blob is gone
+    if "body" not in entry:
+        entry["body"] = _read_blob(entry["content_hash"])
+        if entry["body"] is None:
+            delete_cached_page(entry["url"])
+    return entry["body"]
+
+def stored_pages(site: str = "", limit: int = 50) -> Iterator[Dict[str, Any]]:
+    # Cached bodies (newest first), optionally only one listing site's, without refreshing their LRU position
+    n = 0
+    for entry in list_cached_pages():
+        if n >= limit:
+            break
+        if site and canonicalize_site_key(entry["url"]) != site:
+            continue
+        body = _read_blob(entry["content_hash"])
+        if body:
+            n += 1
+            yield {**entry, "body": body}
+
+def put(url: str, body: bytes, encoding: str = "", etag: str = "", last_modified: str = "") -> str:
+    h = content_hash(body)
+    size = _write_blob(h, body)
+    put_cached_page(canonical_url(url), h, size, encoding, etag, last_modified)
+    evict()
+    return h
+
+def revalidated(url: str):
+    # A 304 restarts the TTL clock without rewriting the blob
+    revalidate_cached_page(canonical_url(url))
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    # Drop least-recently-used entries until the blob store fits; returns bytes freed
+    max_bytes = PAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    flush_touches()
+    total = page_cache_total_size()
+    if total <= max_bytes:
+        return 0
+    freed = 0
+    for row in list_cached_pages_lru():
+        if total - freed <= max_bytes:
+            break
+        if delete_cached_page(row["url"]):
+            try:
+                os.remove(blob_path(row["content_hash"]))
+            except OSError:
+                pass
+            freed += row["size"] or 0
+    return freed
+
+def clear():
+    with _touch_lock:
+        _touches.pop(storage.DB_PATH, None)
+    clear_page_cache()
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            try:
+                os.remove(os.path.join(root, name))
+            except OSError:
+                pass
@@ -0,0 +1,96 @@
+import os, time, threading, multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from src import storage, page_cache, metrics
+from src.extraction import get_plan, clear_plans, extract_all
+from src.parsing import parse_bytes
+from src.utils import SITES
+
+# Parse + extract on a process pool so scans use every core: fetch threads stay I/O-bound and hand pages over by
+# page-cache blob path (the body is already on disk, gzip-compressed) instead of pickling the bytes. Each worker
+# compiles the extraction plans once and only rebuilds a site's plan when the parent's fingerprint moves on.
+# 0 = parse in-process on the scanning thread (the default for the Streamlit app).
+PARSE_WORKERS = 0
+INLINE_MAX_BYTES = 64 * 1024  # pages without a cache blob are shipped inline up to this size, else parsed locally
+
+_plans: Dict[str, Any] = {}
+
+def _init_worker(db_path: str, cache_dir: str, defaults_yaml: str, metrics_enabled: bool):
+    # Runs once per worker process (spawned, so module-level overrides from the parent are passed explicitly)
+    storage.DB_PATH, page_cache.CACHE_DIR, storage.DEFAULTS_YAML = db_path, cache_dir, defaults_yaml
+    metrics.METRICS_ENABLED = metrics_enabled
+    for site in SITES:
+        _plans[site] = get_plan(site)
+
+def _worker_plan(site: str, fingerprint: str):
+    plan = _plans.get(site)
+    if plan is None or plan.fingerprint != fingerprint:
+        clear_plans()  # the fingerprint says the parent's config changed (e.g. YAML edited since this plan was built)
+        plan = _plans[site] = get_plan(site)
+    return plan
+
+def _extract(site: str, fingerprint: str, path: str, content: Optional[bytes], encoding: str) -> Dict[str, Any]:
+    # -> {"fields": extract_all output or None, "missing": blob gone, "metrics": this task's observations}
+    plan = _worker_plan(site, fingerprint)
+    body = content if content is not None else page_cache.read_blob_file(path)
+    out: Dict[str, Any] = {"fields": None, "missing": body is None, "plan_hash": plan.fingerprint}
+    if body is not None:
+        t = time.perf_counter()
+        doc = parse_bytes(body, encoding, plan.keep_tags)
+        metrics.observe("parse_seconds", time.perf_counter() - t, site=site)
+        if doc is not None:
+            out["fields"] = extract_all(site, doc, plan=plan)
+    out["metrics"] = metrics.drain()
+    return out
+
+class ParsePool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+            initargs=(storage.DB_PATH, page_cache.CACHE_DIR, storage.DEFAULTS_YAML, metrics.METRICS_ENABLED),
+        )
+
+    def submit(self, site: str, res: Dict[str, Any]) -> Optional[Future]:
+        # None when the page can't be handed over cheaply (no cache blob and large); the caller parses it itself
+        path = page_cache.blob_path(res["content_hash"]) if res.get("content_hash") else ""
+        content = None
+        if not (path and os.path.exists(path)):
+            if len(res["content"]) > INLINE_MAX_BYTES:
+                return None
+            path, content = "", res["content"]
+        fut = self._pool.submit(_extract, site, get_plan(site).fingerprint, path, content, res.get("encoding", ""))
+        fut.add_done_callback(lambda f: f.exception() is None and metrics.merge(f.result()["metrics"]))
+        return fut
+
+    def warm_up(self):
+        # Spawn every worker (and its plans) now rather than on the first pages of a scan
+        for f in [self._pool.submit(os.getpid) for _ in range(self.workers * 2)]:
+            f.result()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+_pool: Optional[ParsePool] = None
+_pool_lock = threading.Lock()
+
+def get_parse_pool() -> Optional[ParsePool]:
+    # Process-wide pool sized by PARSE_WORKERS (-1 = one per core); None when parsing stays in-process
+    global _pool
+    workers = (os.cpu_count() or 1) if PARSE_WORKERS < 0 else PARSE_WORKERS
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool.workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ParsePool(workers)
+        return _pool
+
+def shutdown_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,70 @@
+import re
+from lxml import etree, html
+from typing import Optional, Iterable
+
+# Pages are parsed straight from bytes with an incremental parser: no decoded str copy, heavy subtrees pruned
+MAX_PAGE_BYTES = 5 * 1024 * 1024   # per-page ceiling for both download and parse
+FEED_CHUNK = 64 * 1024
+PRUNE_TAGS = frozenset(["script", "style", "svg", "noscript", "template"])
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_\-:.]+)""", re.I)
+
+def charset_from_content_type(content_type: str) -> str:
+    m = re.search(r"charset\s*=\s*[\"']?([^\s;\"']+)", content_type or "", re.I)
+    return m.group(1).strip().lower() if m else ""
+
+def sniff_encoding(content: bytes, declared: str = "") -> str:
+    # HTTP charset wins, then a <meta charset> in the first few KB, else UTF-8
+    if declared:
+        return declared
+    m = _META_CHARSET.search(content[:4096] or b"")
+    return m.group(1).decode("ascii", "ignore").lower() if m else "utf-8"
+
+def tags_referenced(expressions: Iterable[str]) -> frozenset:
+    # Prunable tags that some configured XPath mentions must survive parsing
+    keep = set()
+    for xp in expressions:
+        for tag in PRUNE_TAGS:
+            if re.search(rf"\b{tag}\b", xp or "", re.I):
+                keep.add(tag)
+    return frozenset(keep)
+
+def _drop(el):
+    if el.getparent() is not None:
+        el.drop_tree()  # keeps the element's tail text
+
+def _parser(prune, encoding: str, strip: bool):
+    # Pull parser only when something has to be pruned; otherwise a plain feed parser with no event queue
+    if prune:
+        return etree.HTMLPullParser(events=("end",), encoding=encoding, remove_comments=strip, remove_pis=strip)
+    return etree.HTMLParser(encoding=encoding, remove_comments=strip, remove_pis=strip)
+
+def parse_bytes(content: bytes, encoding: str = "", keep_tags: Optional[frozenset] = None,
+                max_bytes: int = MAX_PAGE_BYTES):
+    # keep_tags=None keeps everything (e.g. ad-hoc Test XPath); otherwise PRUNE_TAGS minus keep_tags are dropped
+    if not content:
+        return None
+    prune = None if keep_tags is None else (PRUNE_TAGS - keep_tags)
+    enc = sniff_encoding(content, encoding)
+    strip = prune is not None
+    try:
+        parser = _parser(prune, enc, strip)
+    except LookupError:
+        parser = _parser(prune, "utf-8", strip)
+    parser.set_element_class_lookup(html.HtmlElementClassLookup())
+    view = memoryview(content)[:max_bytes]
+    try:
+        for i in range(0, len(view), FEED_CHUNK):
+            parser.feed(bytes(view[i:i + FEED_CHUNK]))
+            if prune:
+                for _, el in parser.read_events():
+                    if isinstance(el.tag, str) and el.tag in prune:
+                        _drop(el)
+        root = parser.close()
+        if prune:
+            for _, el in parser.read_events():
+                if isinstance(el.tag, str) and el.tag in prune:
+                    _drop(el)
+    except Exception:
+        return None
+    return root
@@ -0,0 +1,143 @@
+import io, threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Tuple, Optional, List
+
+from src import storage
+from src.storage import (portfolio_results, client_names, scans_version, clients_version, last_scan_id,
+                         clients_scanned_since, latest_result_rows, client_ssot_rows, set_result_matches)
+from src.matching import compare_frame
+from src.utils import SITES, FIELDS
+
+# Portfolio consistency report over every client's latest stored scan (plus the scan before it, for changes).
+# Results are loaded column-wise into one DataFrame with categorical site/field and aggregated with group-bys;
+# the frame is kept until a scan is saved or a client changes, so reruns only pay for the aggregation. New scans
+# refresh it incrementally (only the rescanned clients' rows are fetched); a client change rebuilds it.
+WORST_N = 25
+CHANGES_MAX = 1000   # change rows shown in the UI (exports carry all of them)
+
+_frames: Dict[Tuple, Tuple[Tuple, int, pd.DataFrame]] = {}  # key -> (versions, last scan id loaded, frame)
+_frames_lock = threading.Lock()
+
+_NUMERIC = {"client_id": "int64", "scan_id": "int64", "match": "float32", "prev_match": "float32", "changed": "float32"}
+
+def _frame(data: Dict[str, list]) -> pd.DataFrame:
+    # Columns are typed before the frame is built; pandas' inference over 250k-item lists costs more than the query
+    cols: Dict[str, Any] = {}
+    for col, values in data.items():
+        names = {"site": SITES, "field": FIELDS}.get(col)
+        if names is not None and values and isinstance(values[0], int):  # lean rows carry indexes into SITES/FIELDS
+            cols[col] = pd.Categorical.from_codes(np.array(values, dtype="int8"), categories=names)
+        elif names is not None:
+            cols[col] = pd.Categorical(values, categories=names)
+        else:
+            cols[col] = np.array(values, dtype=_NUMERIC[col]) if col in _NUMERIC else values
+    df = pd.DataFrame(cols)
+    df["match"] = df["match"].fillna(0).astype("int8")
+    # prev_match stays float: NaN means no earlier scan of this site/field
+    df["changed"] = df["changed"].fillna(0).astype(bool)
+    return df
+
+def load(details: bool = False, changed_only: bool = False, limit: Optional[int] = None) -> pd.DataFrame:
+    # details/changed_only/limit as in storage.portfolio_results
+    key = (storage.DB_PATH, details, changed_only, limit)
+    version = (scans_version(), clients_version())
+    with _frames_lock:
+        hit = _frames.get(key)
+        if hit and hit[0] == version:
+            return hit[2]
+    last = last_scan_id()  # read first: a scan saved meanwhile is fetched again next time, never missed
+    if hit and hit[0][1] == version[1] and not limit:
+        # Only scans were saved: swap in the rows of the clients scanned since the frame was loaded
+        _, since, old = hit
+        rescanned = clients_scanned_since(since)
+        new = _frame(portfolio_results(details, changed_only, since))
+        df = pd.concat([old[~old["client_id"].isin(rescanned)], new], ignore_index=True)
+    else:
+        df = _frame(portfolio_results(details, changed_only, limit=limit))
+    with _frames_lock:
+        _frames[key] = (version, last, df)
+    return df
+
+def clear():
+    # Frames follow the persisted data versions; this is for an explicit reload
+    with _frames_lock:
+        _frames.clear()
+
+def summarize(df: pd.DataFrame, worst_n: int = WORST_N) -> Dict[str, Any]:
+    # -> totals, match-rate matrix (site x field), per-site and per-client aggregates, change counts
+    had_prev = df["prev_match"].notna()
+    regressed = had_prev & (df["prev_match"] == 1) & (df["match"] == 0)
+    fixed = had_prev & (df["prev_match"] == 0) & (df["match"] == 1)
+    flags = df[["site", "field", "client_id", "match"]].assign(
+        mismatch=1 - df["match"], regressed=regressed, fixed=fixed, changed=df["changed"])
+
+    matrix = flags.pivot_table(index="site", columns="field", values="match", aggfunc="mean", observed=False)
+    by_site = flags.groupby("site", observed=False).agg(
+        match_rate=("match", "mean"), checks=("match", "size"), mismatches=("mismatch", "sum"),
+        regressed=("regressed", "sum"), fixed=("fixed", "sum"), changed=("changed", "sum"))
+    by_field = flags.groupby("field", observed=False).agg(
+        match_rate=("match", "mean"), mismatches=("mismatch", "sum"), regressed=("regressed", "sum"),
+        fixed=("fixed", "sum"))
+
+    per_client = flags.groupby("client_id").agg(
+        checks=("match", "size"), mismatches=("mismatch", "sum"), match_rate=("match", "mean"),
+        regressed=("regressed", "sum"))
+    worst = per_client.sort_values(["mismatches", "regressed", "match_rate"], ascending=[False, False, True]).head(worst_n)
+    names = client_names(worst.index.tolist())
+    worst = worst.reset_index()
+    worst.insert(1, "client_name", worst["client_id"].map(names))
+
+    return {
+        "totals": {
+            "clients": int(per_client.shape[0]),
+            "checks": int(len(df)),
+            "match_rate": float(df["match"].mean()) if len(df) else 0.0,
+            "mismatches": int(flags["mismatch"].sum()),
+            "regressed": int(regressed.sum()),
+            "fixed": int(fixed.sum()),
+            "changed": int(df["changed"].sum()),
+            "fully_consistent": int((per_client["mismatches"] == 0).sum()),
+        },
+        "matrix": matrix,
+        "by_site": by_site,
+        "by_field": by_field,
+        "worst": worst,
+    }
+
+def changes(limit: Optional[int] = CHANGES_MAX) -> pd.DataFrame:
+    # Rows whose match flipped or whose value moved since the client's previous scan, regressions first
+    # With a limit only the top rows are read (the order below is also applied in SQL)
+    df = load(details=True, changed_only=True, limit=limit)
+    kind = pd.Series("changed", index=df.index)
+    kind[df["prev_match"].isna()] = "new"
+    kind[(df["prev_match"] == 0) & (df["match"] == 1)] = "fixed"
+    kind[(df["prev_match"] == 1) & (df["match"] == 0)] = "regressed"
+    order = kind.map({"regressed": 0, "fixed": 1, "changed": 2, "new": 3})
+    out = df.assign(change=kind, _o=order).sort_values(["_o", "client_id", "site", "field"]).drop(columns="_o")
+    cols = ["change", "client_id", "client_name", "site", "field", "prev_value", "value", "prev_match", "match", "url"]
+    out = out[cols]
+    return out.head(limit) if limit else out
+
+def rescore(client_ids: Optional[List[int]] = None) -> int:
+    # Re-compare the stored latest scans of these (or all) clients against their current SSOT, e.g. after an SSOT
+    # edit or a NORM_VERSION bump; only verdicts that flip are written. Returns how many flipped.
+    rows = pd.DataFrame(latest_result_rows(client_ids))
+    if rows.empty:
+        return 0
+    new = compare_frame(rows, pd.DataFrame(client_ssot_rows(client_ids))).astype("int8")
+    flipped = new != rows["match"].fillna(0).astype("int8")
+    return set_result_matches(zip(new[flipped].tolist(), rows.loc[flipped, "id"].tolist()))
+
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    # CSV, or Parquet (needs pyarrow) with categorical site/field kept as dictionary-encoded columns
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    if fmt == "parquet":
+        buf = io.BytesIO()
+        try:
+            df.to_parquet(buf, index=False)
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        return buf.getvalue()
+    raise ValueError(f"unsupported export format: {fmt}")
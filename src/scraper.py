@@ -1,26 +1,25 @@
-import re, time, random
-import requests
+import re, json, time, hashlib
+import queue, threading
+from collections import OrderedDict
 from lxml import html
-import phonenumbers
-from urllib.parse import urlparse, urlunparse
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
-from src.storage import load_yaml_defaults, get_all_xpaths_for_site
-from src.utils import SITES
+from src.storage import save_scans, last_scan_results
+from src.extraction import get_plan, extract_all, extract_first, extract_anchor, compile_steps, first_hit, DocEvaluator
+from src.utils import SITES, FIELDS, norm_ws, canonical_href, canonical_url, canonicalize_site_key
+from src.matching import compare, client_norms, NORM_VERSION
+from src.engine import HostScheduler, get_scheduler
+from src.transport import HEADERS, fetch_page, cached_page, cache_hit, decode, failure
+from src import page_cache
+from src.parsing import parse_bytes, tags_referenced
+from src.parse_pool import ParsePool, get_parse_pool
+from src import metrics
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-    "Accept-Language": "en-US,en;q=0.9",
-}
-
-def fetch(url: str) -> Optional[str]:
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=20)
-        if resp.status_code == 200 and resp.text:
-            return resp.text
-    except Exception:
-        return None
-    return None
+def fetch(url: str, force_refresh: bool = False) -> Optional[str]:
+    # Legacy text helper; use fetch_page for the structured failure reason
+    res = fetch_page(url, force_refresh=force_refresh)
+    return decode(res) if res["ok"] else None
 
 def to_doc(html_text: str):
     try:
@@ -28,72 +27,6 @@ def to_doc(html_text: str):
     except Exception:
         return None
 
-def norm_ws(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "").strip())
-
-def normalize_phone(s: str) -> str:
-    s = (s or "").strip()
-    try:
-        p = phonenumbers.parse(s, "US")
-        if phonenumbers.is_valid_number(p):
-            return phonenumbers.format_number(p, phonenumbers.PhoneNumberFormat.NATIONAL)
-    except Exception:
-        pass
-    digits = re.sub(r"\D+", "", s)
-    return digits
-
-def canonical_href(h: str) -> str:
-    if not h:
-        return ""
-    try:
-        u = urlparse(h.strip())
-        # Strip tracking params; keep scheme/host/path
-        return urlunparse((u.scheme, u.netloc, u.path, "", "", ""))
-    except Exception:
-        return h.strip()
-
-def extract_first(doc, xpath: str) -> str:
-    try:
-        nodes = doc.xpath(xpath)
-    except Exception:
-        return ""
-    if not nodes:
-        return ""
-    n = nodes[0]
-    if isinstance(n, str):
-        return norm_ws(n)
-    try:
-        # element
-        t = n.text_content() or ""
-        return norm_ws(t)
-    except Exception:
-        return ""
-
-def extract_anchor(doc, xpath: str) -> Dict[str, str]:
-    # Get both anchor text and href from a single XPath (that points to <a> or text under it)
-    try:
-        nodes = doc.xpath(xpath)
-    except Exception:
-        return {"anchor": "", "href": ""}
-    if not nodes:
-        return {"anchor": "", "href": ""}
-    n = nodes[0]
-    if isinstance(n, str):
-        # If xpath selects text node, jump to parent link if possible via second try
-        anchor_text = norm_ws(n)
-        href = ""
-        return {"anchor": anchor_text, "href": href}
-    # assume element
-    try:
-        anchor_text = norm_ws(n.text_content() or "")
-    except Exception:
-        anchor_text = ""
-    try:
-        href = canonical_href(n.get("href",""))
-    except Exception:
-        href = ""
-    return {"anchor": anchor_text, "href": href}
-
 def choose_yelp_page_type(doc, yelp_defaults: Dict[str, Any]) -> Dict[str, Any]:
     page_types = yelp_defaults.get("page_types", [])
     for pt in page_types:
@@ -110,106 +43,413 @@ def choose_yelp_page_type(doc, yelp_defaults: Dict[str, Any]) -> Dict[str, Any]:
     return page_types[0] if page_types else {}
 
 def select_xpath_list(site: str, field: str, doc) -> List[Dict[str, Any]]:
-    # 1) custom DB overrides
-    db_map = get_all_xpaths_for_site(site)  # field -> [{priority,xpath}]
-    if field in (db_map or {}):
-        return sorted(db_map[field], key=lambda x: x.get("priority", 999999))
-
-    # 2) YAML defaults
-    d = load_yaml_defaults() or {}
-    if site == "yelp":
-        yelp_d = d.get("yelp", {})
-        pt = choose_yelp_page_type(doc, yelp_d)
-        fields = pt.get("fields", {})
-        return fields.get(field, [])
-    else:
-        site_d = (d.get(site, {}) or {})
-        return site_d.get(field, [])
+    # DB overrides first, then YAML defaults (Yelp: by detected page type); served from the cached plan
+    return get_plan(site).fallbacks(field, doc)
 
 def extract_field(site: str, field: str, doc) -> Dict[str, Any]:
-    items = select_xpath_list(site, field, doc)
-    if field == "website":
-        for it in items:
-            res = extract_anchor(doc, it.get("xpath",""))
-            if res.get("anchor") or res.get("href"):
-                return res
-        return {"anchor": "", "href": ""}
-    else:
-        for it in items:
-            val = extract_first(doc, it.get("xpath",""))
-            if val:
-                return {"value": val}
-        return {"value": ""}
-
-def compare(field: str, extracted: Dict[str, Any], ssot: Dict[str, str]) -> bool:
-    # naive normalization; can be expanded with fuzzy ratios if needed
-    if field == "phone":
-        return normalize_phone(extracted.get("value","")) == normalize_phone(ssot.get("phone",""))
-    if field == "website":
-        return canonical_href(extracted.get("href","")) == canonical_href(ssot.get("website",""))
-    if field == "address":
-        a = re.sub(r"[,\n]", " ", extracted.get("value","")).lower().strip()
-        b = re.sub(r"[,\n]", " ", ssot.get("address","")).lower().strip()
-        return re.sub(r"\s+", " ", a) == re.sub(r"\s+", " ", b)
-    if field == "name":
-        return extracted.get("value","").strip().lower() == (ssot.get("name","").strip().lower())
-    if field == "hours":
-        A = re.sub(r"\s+", " ", extracted.get("value","").lower().strip())
-        B = re.sub(r"\s+", " ", (ssot.get("hours","") or "").lower().strip())
-        return (A == B) if (A or B) else False
-    return False
-
-def scrape_url(url: str) -> Any:
-    html_text = fetch(url)
-    if not html_text:
+    return extract_all(site, doc, [field])[field]
+
+# Extracted fields of recently seen pages keyed by (content hash, encoding, plan fingerprint), so cache hits and
+# 304s skip parsing and extraction. An entry is a few hundred bytes; parsed trees ran to megabytes each.
+EXTRACTED_CACHE_SIZE = 4096
+_extracted: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_extracted_lock = threading.Lock()
+
+def doc_for_result(res: Dict[str, Any], site: str = "", extra_tags: frozenset = frozenset()):
+    # Streaming parse from bytes; with a site, subtrees none of its XPaths (nor extra_tags) read are dropped
+    if not res.get("ok"):
         return None
-    return to_doc(html_text)
+    keep_tags = (get_plan(site).keep_tags | extra_tags) if site else None
+    with metrics.timer("parse_seconds", site=site):
+        return parse_bytes(res["content"], res.get("encoding",""), keep_tags)
+
+def _extracted_key(res: Dict[str, Any], plan_hash: str) -> tuple:
+    return res.get("content_hash",""), res.get("encoding",""), plan_hash
 
-def scan_client(client: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
-    # Build SSOT dict
-    ssot = {
+def _remember_extracted(key: tuple, fields: Dict[str, Any]):
+    if not (key[0] and fields):
+        return
+    with _extracted_lock:
+        _extracted[key] = fields
+        _extracted.move_to_end(key)
+        while len(_extracted) > EXTRACTED_CACHE_SIZE:
+            _extracted.popitem(last=False)
+
+def _lookup_extracted(key: tuple) -> Optional[Dict[str, Any]]:
+    with _extracted_lock:
+        fields = _extracted.get(key)
+        if fields is not None:
+            _extracted.move_to_end(key)
+    return fields
+
+def extracted_for_result(res: Dict[str, Any], site: str) -> Dict[str, Any]:
+    # -> a fresh copy of the site's fields for a fetched page ({} when it doesn't parse)
+    plan = get_plan(site)
+    key = _extracted_key(res, plan.fingerprint)
+    fields = None
+    if key[0]:
+        fields = _lookup_extracted(key)
+        metrics.inc("extract_cache_total", site=site, result="miss" if fields is None else "hit")
+    if fields is None:
+        doc = doc_for_result(res, site)
+        fields = extract_all(site, doc, plan=plan) if doc is not None else {}
+        _remember_extracted(key, fields)
+    return {f: dict(v) for f, v in fields.items()}
+
+def scrape_url(url: str, force_refresh: bool = False) -> Any:
+    return doc_for_result(fetch_page(url, force_refresh=force_refresh))
+
+def client_ssot(client: Dict[str, Any]) -> Dict[str, str]:
+    return {
         "name": client.get("ssot_name",""),
         "address": client.get("ssot_address",""),
         "phone": client.get("ssot_phone",""),
         "website": client.get("ssot_website",""),
         "hours": client.get("ssot_hours",""),
     }
-    site_urls = {
-        "google": client.get("url_google",""),
-        "apple": client.get("url_apple",""),
-        "bing": client.get("url_bing",""),
-        "yelp": client.get("url_yelp",""),
-        "yahoo": client.get("url_yahoo",""),
-    }
 
-    out: Dict[str, Dict[str, Any]] = {}
-    for site, url in site_urls.items():
-        site_data = { "name": {}, "address": {}, "phone": {}, "website": {}, "hours": {} }
-        if not url:
-            out[site] = site_data
-            continue
-        time.sleep(random.uniform(0.8, 1.8))  # be polite
-        doc = scrape_url(url)
-        if doc is None:
-            out[site] = site_data
+def client_site_urls(client: Dict[str, Any]) -> Dict[str, str]:
+    return {site: (client.get(f"url_{site}","") or "").strip() for site in SITES}
+
+def empty_site_data() -> Dict[str, Any]:
+    return {field: {} for field in FIELDS}
+
+def ssot_hash(ssot: Dict[str, str]) -> str:
+    # NORM_VERSION is part of it, so results reused from an unchanged page are re-compared when key functions change
+    return hashlib.sha1(json.dumps([NORM_VERSION, ssot], sort_keys=True).encode("utf-8")).hexdigest()
+
+def _compare_all(site_data: Dict[str, Any], ssot: Dict[str, str], norms: Optional[Dict[str, str]] = None,
+                 site: str = "") -> Dict[str, Any]:
+    # norms: the client's precomputed SSOT keys, so the SSOT isn't re-normalized per site
+    for field in FIELDS:
+        t = time.perf_counter()
+        try:
+            site_data[field]["match"] = compare(field, site_data[field], ssot, norms)
+        except Exception:
+            site_data[field]["match"] = False
+        metrics.observe("compare_seconds", time.perf_counter() - t, site=site, field=field)
+    return site_data
+
+def _previous_sites(client_id) -> Dict[str, Any]:
+    # Last stored scan regrouped per site: content/plan hashes, ssot hash and the extracted fields
+    last = last_scan_results(client_id) if client_id else {}
+    sites: Dict[str, Any] = {}
+    for r in (last or {}).get("rows", []):
+        p = sites.setdefault(r["site"], {"content_hash": r["content_hash"], "plan_hash": r["plan_hash"],
+                                         "ssot_hash": last["scan"]["ssot_hash"], "fields": {}})
+        if r["field"] == "website":
+            p["fields"][r["field"]] = {"anchor": r["value"] or "", "href": r["href"] or "", "match": bool(r["match"])}
+        else:
+            p["fields"][r["field"]] = {"value": r["value"] or "", "match": bool(r["match"])}
+    return sites
+
+def last_results(client_id) -> Dict[str, Dict[str, Any]]:
+    # Most recent stored scan in the same shape scan_client returns, for display without rescanning
+    prev = _previous_sites(client_id)
+    return {site: {f: dict(prev[site]["fields"].get(f, {})) for f in FIELDS} for site in SITES if site in prev}
+
+def _site_meta(site: str, res: Dict[str, Any]) -> Dict[str, Any]:
+    return {"url": res.get("url",""), "status": res.get("status", 0), "content_hash": res.get("content_hash",""),
+            "plan_hash": get_plan(site).fingerprint, "reused": False,
+            "error": res.get("error",""), "detail": res.get("detail",""), "attempts": res.get("attempts", 0)}
+
+def _unchanged(prev: Dict[str, Any], meta: Dict[str, Any]) -> bool:
+    return bool(prev) and prev["content_hash"] == meta["content_hash"] and prev["plan_hash"] == meta["plan_hash"] \
+        and all(f in prev["fields"] for f in FIELDS)
+
+def _needs_parse(site: str, res: Dict[str, Any], prev: Dict[str, Any]) -> bool:
+    return bool(res.get("ok")) and not _unchanged(prev, _site_meta(site, res))
+
+def _site_result(site: str, res: Dict[str, Any], ssot: Dict[str, str], prev: Dict[str, Any],
+                 norms: Optional[Dict[str, str]] = None, extracted: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # prev is the last stored result for this client/site when running incrementally: if neither the page
+    # content nor the site's XPaths changed, its values are reused without parsing (re-compared only if SSOT moved).
+    # extracted: the page's fields when already pulled out, by a parse worker or once for every client sharing
+    # the page ({} when its parse failed).
+    meta = _site_meta(site, res)
+    site_data = empty_site_data()
+    if res.get("ok"):
+        if _unchanged(prev, meta):
+            site_data = {f: dict(prev["fields"][f]) for f in FIELDS}
+            if prev["ssot_hash"] != ssot_hash(ssot):
+                _compare_all(site_data, ssot, norms, site)
+            meta["reused"] = True
+        elif extracted is not None:
+            if extracted:
+                site_data = _compare_all(extracted, ssot, norms, site)
+        else:
+            extracted = extracted_for_result(res, site)
+            if extracted:
+                site_data = _compare_all(extracted, ssot, norms, site)
+    site_data["_meta"] = meta
+    return site_data
+
+def scan_rows(site_results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Flatten {site: site_data} into client x site x field rows for scan_results
+    rows = []
+    now = time.time()
+    for site, data in site_results.items():
+        meta = data.get("_meta")
+        if not meta:
             continue
-        for field in ["name","address","phone","website","hours"]:
-            extracted = extract_field(site, field, doc)
-            site_data[field] = extracted
+        for field in FIELDS:
+            val = data.get(field, {}) or {}
+            rows.append({
+                "site": site, "field": field, "url": meta["url"],
+                "value": val.get("anchor","") if field == "website" else val.get("value",""),
+                "href": val.get("href","") if field == "website" else "",
+                "match": 1 if val.get("match") else 0,
+                "content_hash": meta["content_hash"], "plan_hash": meta["plan_hash"], "scanned_at": now,
+                "error": meta.get("error",""),
+            })
+    return rows
+
+def _timed_fetch(url: str, force_refresh: bool = False, scheduler: Optional[HostScheduler] = None,
+                 cached: Optional[Dict[str, Any]] = None):
+    t = time.monotonic()
+    res = fetch_page(url, force_refresh=force_refresh, scheduler=scheduler, cached=cached)
+    return res, time.monotonic() - t
+
+def plan_scan(clients: List[Dict[str, Any]]) -> Tuple[Dict[Tuple[str, str], List[int]], Dict[Tuple[int, str], Dict[str, Any]]]:
+    # Listing URLs of every client grouped into unique pages: {(site, page url): [client indexes]}. Page URLs are
+    # canonical with tracking params dropped, so clients sharing a listing (chains, multi-location brands) share one
+    # fetch and one parse. URLs filed under another site's column, or that don't parse, come back as failures:
+    # {(client index, site): res}.
+    pages: Dict[Tuple[str, str], List[int]] = {}
+    rejected: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    for i, client in enumerate(clients):
+        for site, url in client_site_urls(client).items():
+            if not url:
+                continue
+            owner = canonicalize_site_key(url)
+            if owner and owner != site:
+                rejected[(i, site)] = failure(url, "wrong_site", f"a {owner} URL in the {site} column")
+                continue
             try:
-                site_data[field]["match"] = compare(field, extracted, ssot)
-            except Exception:
-                site_data[field]["match"] = False
-        out[site] = site_data
-    return out
-
-def test_xpath_on_url(url: str, xpath: str, field: str):
-    doc = scrape_url(url)
+                key = canonical_url(url, drop_tracking=True, strict=True)
+            except ValueError as e:
+                rejected[(i, site)] = failure(url, "invalid_url", str(e))
+                continue
+            refs = pages.setdefault((site, key), [])
+            if i not in refs:
+                refs.append(i)
+    return pages, rejected
+
+def scan_clients(clients: List[Dict[str, Any]], scheduler: Optional[HostScheduler] = None,
+                 force_refresh: bool = False, incremental: bool = False, record: bool = False,
+                 on_site: Optional[Callable[[int, str, Dict[str, Any]], None]] = None,
+                 parse_pool: Optional[ParsePool] = None) -> List[Dict[str, Dict[str, Any]]]:
+    # Fetch every unique listing page (see plan_scan) concurrently; politeness is enforced per host by the scheduler.
+    # Every fetch is queued first; fresh page-cache hits are then served on this thread while they run, and never
+    # wait for a politeness slot.
+    # Each page is parsed/extracted once, on the parse pool when one is configured (PARSE_WORKERS), else on this
+    # thread, and its fields are compared against the SSOT of every client that references it.
+    # incremental: skip parse/compare for pages whose content hash matches the last stored scan.
+    # record: persist one scans row + result rows per client (clients need an "id").
+    # on_site(client_index, site, site_data) is called as each site finishes, in completion order.
+    scheduler = scheduler or get_scheduler()
+    parse_pool = parse_pool or get_parse_pool()
+    started_at = time.time()
+    t0 = time.monotonic()
+    ssots = [client_ssot(c) for c in clients]
+    norms = [client_norms(c) for c in clients]
+    prevs = [_previous_sites(c.get("id")) if incremental else {} for c in clients]
+    outs: List[Dict[str, Dict[str, Any]]] = [{site: empty_site_data() for site in SITES} for _ in clients]
+    pages, rejected = plan_scan(clients)
+    pending = {}  # future -> ("fetch", page) or ("parse", page, res, fetch_s)
+    done_q: "queue.SimpleQueue[Future]" = queue.SimpleQueue()  # futures as they complete, O(1) per completion
+
+    def track(fut: Future, job: tuple):
+        pending[fut] = job
+        fut.add_done_callback(done_q.put)
+
+    def fetch(page: Tuple[str, str], entry: Dict[str, Any]):
+        url = page[1]
+        track(scheduler.submit(url, _timed_fetch, url, force_refresh=force_refresh, scheduler=scheduler, cached=entry),
+              ("fetch", page))
+
+    def complete(i: int, site: str, site_data: Dict[str, Any], fetch_s: float):
+        site_data["_meta"]["fetch_s"] = round(fetch_s, 3)
+        site_data["_meta"]["latency_s"] = round(time.monotonic() - t0, 3)
+        outs[i][site] = site_data
+        if on_site:
+            on_site(i, site, site_data)
+
+    def fan_out(page: Tuple[str, str], res: Dict[str, Any], fetch_s: float, extracted: Optional[Dict[str, Any]] = None):
+        # Each referencing client compares its own SSOT against a copy of the page's fields
+        site = page[0]
+        if extracted is None and any(_needs_parse(site, res, prevs[i].get(site)) for i in pages[page]):
+            extracted = extracted_for_result(res, site)
+        for i in pages[page]:
+            fields = {f: dict(v) for f, v in extracted.items()} if extracted is not None else None
+            complete(i, site, _site_result(site, res, ssots[i], prevs[i].get(site), norms[i], fields), fetch_s)
+
+    def finish(page: Tuple[str, str], res: Dict[str, Any], fetch_s: float):
+        site = page[0]
+        metrics.observe("fetch_seconds", fetch_s, site=site)
+        fut = None
+        if parse_pool and any(_needs_parse(site, res, prevs[i].get(site)) for i in pages[page]) \
+                and _lookup_extracted(_extracted_key(res, get_plan(site).fingerprint)) is None:
+            fut = parse_pool.submit(site, res)
+        if fut is not None:
+            track(fut, ("parse", page, res, fetch_s))
+        else:
+            fan_out(page, res, fetch_s)
+
+    for (i, site), res in rejected.items():
+        complete(i, site, _site_result(site, res, ssots[i], {}, norms[i]), 0.0)
+    for outcome in ("wrong_site", "invalid_url"):
+        metrics.inc("scan_urls_total", sum(r["error"] == outcome for r in rejected.values()), outcome=outcome)
+    metrics.inc("scan_urls_total", len(pages), outcome="fetched")
+    metrics.inc("scan_urls_total", sum(len(refs) - 1 for refs in pages.values()), outcome="shared")
+
+    fresh = []  # (page, cache entry); bodies are read when each is served, not held while fetches are queued
+    for page in pages:
+        entry = {} if force_refresh else page_cache.get(page[1])
+        if entry.get("fresh"):
+            fresh.append((page, entry))
+        else:
+            fetch(page, entry)
+    for page, entry in fresh:
+        hit = cache_hit(page[1], entry)
+        if hit:
+            finish(page, hit, 0.0)
+        else:
+            fetch(page, {})  # blob gone since the lookup
+
+    while pending:
+        fut = done_q.get()
+        kind, page, *rest = pending.pop(fut)
+        if kind == "fetch":
+            try:
+                res, fetch_s = fut.result()
+            except Exception as e:
+                res, fetch_s = failure(page[1], "error", f"{type(e).__name__}: {e}"), 0.0
+            finish(page, res, fetch_s)
+            continue
+        res, fetch_s = rest
+        try:
+            out = fut.result()
+        except Exception:
+            out = {"missing": True}  # e.g. a worker died: parse this page here instead
+        if not out["missing"]:
+            _remember_extracted(_extracted_key(res, out["plan_hash"]), out["fields"] or {})
+        fan_out(page, res, fetch_s, None if out["missing"] else (out["fields"] or {}))
+
+    if record:
+        mode = "incremental" if incremental else "full"
+        save_scans(
+            {"client_id": client["id"], "mode": mode, "ssot_hash": ssot_hash(ssot), "started_at": started_at, "rows": scan_rows(out)}
+            for client, ssot, out in zip(clients, ssots, outs) if client.get("id")
+        )
+    return outs
+
+def scan_client(client: Dict[str, Any], force_refresh: bool = False, incremental: bool = False,
+                record: bool = False) -> Dict[str, Dict[str, Any]]:
+    return scan_clients([client], force_refresh=force_refresh, incremental=incremental, record=record)[0]
+
+def fetch_error_message(res: Dict[str, Any]) -> str:
+    reason = res.get("error") or "error"
+    status = f" HTTP {res['status']}" if res.get("status") else ""
+    detail = f": {res['detail']}" if res.get("detail") else ""
+    return f"Failed to fetch ({reason}{status}{detail})"
+
+def test_xpath_on_url(url: str, xpath: str, field: str, force_refresh: bool = False):
+    res = fetch_page(url, force_refresh=force_refresh)
+    if not res["ok"]:
+        return {"ok": False, "error": fetch_error_message(res)}
+    doc = doc_for_result(res)
     if doc is None:
-        return {"ok": False, "error": "Failed to fetch or parse HTML"}
+        return {"ok": False, "error": "Failed to parse HTML"}
     if field == "website":
         res = extract_anchor(doc, xpath)
         return {"ok": True, "result": res}
     else:
         val = extract_first(doc, xpath)
         return {"ok": True, "result": {"value": val}}
+
+# --- Bulk XPath testing: one candidate (or fallback list) against many listing URLs ---
+
+BULK_TEST_WORKERS = 8  # threads evaluating cached pages; uncached URLs are fetched through the host scheduler
+
+def bulk_test_xpaths(site: str, field: str, items: List[Any], xpaths: Optional[List[str]] = None,
+                     force_refresh: bool = False, cached_only: bool = False,
+                     scheduler: Optional[HostScheduler] = None,
+                     on_result: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    # items: URLs or {"url", "client_id", "name"} dicts. xpaths=None tests the site's configured fallback chain.
+    # Page-cache hits are parsed/evaluated on a small thread pool; the rest are fetched with
+    # the usual per-host politeness unless cached_only. on_result(done, total, row) fires as each URL finishes.
+    scheduler = scheduler or get_scheduler()
+    plan = get_plan(site)
+    steps = compile_steps(xpaths) if xpaths else None
+    extra = tags_referenced(xpaths) if xpaths else frozenset()
+    items = [it if isinstance(it, dict) else {"url": it} for it in items]
+    items = [it for it in items if (it.get("url") or "").strip()]
+
+    def evaluate(item: Dict[str, Any], res: Dict[str, Any], fetch_s: float) -> Dict[str, Any]:
+        row = {"client_id": item.get("client_id"), "name": item.get("name", ""), "url": item["url"].strip(),
+               "status": res.get("status", 0), "error": res.get("error", ""), "from_cache": bool(res.get("from_cache")),
+               "hit": False, "value": "", "href": "", "step": None, "xpath": "",
+               "fetch_ms": round(fetch_s * 1000, 1), "eval_ms": None}
+        t = time.perf_counter()
+        doc = doc_for_result(res, site, extra)
+        if doc is None:
+            row["error"] = row["error"] or ("parse" if res.get("ok") else "fetch")
+            return row
+        chain = steps if steps is not None else plan.fallbacks(field, doc)
+        val, idx = first_hit(DocEvaluator(doc), field, chain)
+        row["eval_ms"] = round((time.perf_counter() - t) * 1000, 2)
+        if idx >= 0:
+            row.update(hit=True, step=idx + 1, xpath=chain[idx]["xpath"],
+                       value=val.get("anchor", "") if field == "website" else val["value"], href=val.get("href", ""))
+        return row
+
+    def fetch_and_evaluate(item: Dict[str, Any], cached: Dict[str, Any]) -> Dict[str, Any]:
+        res, fetch_s = _timed_fetch(item["url"].strip(), force_refresh=force_refresh, scheduler=scheduler, cached=cached)
+        return evaluate(item, res, fetch_s)
+
+    rows: List[Dict[str, Any]] = []
+    total = len(items)
+
+    def done(row: Dict[str, Any]):
+        rows.append(row)
+        if on_result:
+            on_result(len(rows), total, row)
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=BULK_TEST_WORKERS) as pool:
+        for item in items:
+            url = item["url"].strip()
+            hit, entry = (None, {}) if force_refresh else cached_page(url)
+            if hit:
+                futures.append(pool.submit(evaluate, item, hit, 0.0))
+            elif cached_only:
+                done(evaluate(item, failure(url, "not_cached", "not in the page cache"), 0.0))
+            else:
+                futures.append(scheduler.submit(url, fetch_and_evaluate, item, entry))
+        for fut in as_completed(futures):
+            done(fut.result())
+    return rows
+
+def bulk_test_summary(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Hit rate over pages that were fetched and parsed, wins per fallback step, most common values, latencies
+    evaluated = [r for r in rows if r["eval_ms"] is not None]
+    hits = [r for r in evaluated if r["hit"]]
+    values: Dict[str, int] = {}
+    for r in hits:
+        values[r["value"]] = values.get(r["value"], 0) + 1
+    pct = lambda xs, p: sorted(xs)[min(len(xs) - 1, int(p * len(xs)))] if xs else None
+    fetch_ms = [r["fetch_ms"] for r in rows if not r["from_cache"] and r["status"]]
+    return {
+        "urls": len(rows),
+        "evaluated": len(evaluated),
+        "failed": len(rows) - len(evaluated),
+        "hits": len(hits),
+        "hit_rate": round(len(hits) / len(evaluated), 3) if evaluated else 0.0,
+        "from_cache": sum(r["from_cache"] for r in rows),
+        "wins_by_step": {s: sum(1 for r in hits if r["step"] == s) for s in sorted({r["step"] for r in hits})},
+        "top_values": sorted(values.items(), key=lambda kv: -kv[1])[:10],
+        "eval_ms_p50": pct([r["eval_ms"] for r in evaluated], 0.5),
+        "fetch_ms_p50": pct(fetch_ms, 0.5),
+        "fetch_ms_p90": pct(fetch_ms, 0.9),
+    }
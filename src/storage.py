@@ -1,101 +1,746 @@
-import os, sqlite3, json, yaml
-from typing import List, Dict, Any
+import os, sqlite3, json, yaml, time, threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from src.matching import ssot_norms, NORM_VERSION
+from src.utils import FIELDS, SITES
 
 DB_PATH = os.path.join("data", "app.db")
 DEFAULTS_YAML = os.path.join("data", "default_xpaths.yaml")
 
-def ensure_db():
-    os.makedirs("data", exist_ok=True)
-    with sqlite3.connect(DB_PATH) as con:
-        cur = con.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                ssot_name TEXT,
-                ssot_address TEXT,
-                ssot_phone TEXT,
-                ssot_website TEXT,
-                ssot_hours TEXT,
-                url_google TEXT,
-                url_apple TEXT,
-                url_bing TEXT,
-                url_yelp TEXT,
-                url_yahoo TEXT
-            )
-            """
+# Cached reads (UI picker pages, client detail, xpath lists, extraction plans, report frames) are keyed on the
+# data_versions row of their table. The row is bumped inside every write transaction, so writes from any process
+# (CLI import, a second app server) invalidate them too.
+VERSIONED_TABLES = ("clients", "xpaths", "scans")
+_reads: Dict[Tuple, Tuple[Tuple, Any]] = {}
+_reads_lock = threading.Lock()
+READ_CACHE_MAX = 512
+CLIENT_PAGE_SIZE = 50
+
+# One connection per thread (sqlite3 connections must not be shared across threads), reused for the
+# life of the thread; WAL lets scanner threads read while one writer commits.
+_local = threading.local()
+_migrated = set()
+_migrate_lock = threading.Lock()
+BUSY_TIMEOUT_MS = 30000
+
+# Schema migrations, applied in order once per database and tracked in PRAGMA user_version.
+# Version 1 is the historical schema (IF NOT EXISTS so databases created before versioning upgrade cleanly).
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            ssot_name TEXT,
+            ssot_address TEXT,
+            ssot_phone TEXT,
+            ssot_website TEXT,
+            ssot_hours TEXT,
+            url_google TEXT,
+            url_apple TEXT,
+            url_bing TEXT,
+            url_yelp TEXT,
+            url_yahoo TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS xpaths (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site TEXT,
+            field TEXT,
+            priority INTEGER,
+            xpath TEXT
         )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS xpaths (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                site TEXT,
-                field TEXT,
-                priority INTEGER,
-                xpath TEXT
-            )
-            """
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS page_cache (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT,
+            size INTEGER,
+            encoding TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL,
+            accessed_at REAL
         )
-        con.commit()
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER,
+            mode TEXT,
+            ssot_hash TEXT,
+            started_at REAL,
+            finished_at REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS scan_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER,
+            client_id INTEGER,
+            site TEXT,
+            field TEXT,
+            url TEXT,
+            value TEXT,
+            href TEXT,
+            match INTEGER,
+            content_hash TEXT,
+            plan_hash TEXT,
+            scanned_at REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_scans_client ON scans (client_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_scan_results_scan ON scan_results (scan_id)",
+        "CREATE INDEX IF NOT EXISTS idx_scan_results_client ON scan_results (client_id, site, field, scan_id)",
+    ]),
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_xpaths_site_field ON xpaths (site, field, priority)",
+        "CREATE INDEX IF NOT EXISTS idx_clients_name ON clients (name)",
+        "CREATE INDEX IF NOT EXISTS idx_page_cache_lru ON page_cache (accessed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_page_cache_hash ON page_cache (content_hash)",
+    ]),
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER,
+            status TEXT,
+            options TEXT,
+            worker TEXT,
+            error TEXT,
+            submitted_at REAL,
+            started_at REAL,
+            finished_at REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS job_sites (
+            job_id INTEGER,
+            site TEXT,
+            status TEXT,
+            fetch_s REAL,
+            latency_s REAL,
+            result TEXT,
+            finished_at REAL,
+            PRIMARY KEY (job_id, site)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_client ON jobs (client_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)",
+    ]),
+    (4, [
+        "ALTER TABLE clients ADD COLUMN norm_name TEXT",
+        "ALTER TABLE clients ADD COLUMN norm_address TEXT",
+        "ALTER TABLE clients ADD COLUMN norm_phone TEXT",
+        "ALTER TABLE clients ADD COLUMN norm_website TEXT",
+        "ALTER TABLE clients ADD COLUMN norm_hours TEXT",
+        "ALTER TABLE clients ADD COLUMN norm_version INTEGER",
+        lambda con: _backfill_ssot_norms(con),
+    ]),
+    # NORM_VERSION 2: token-normalized address/name keys and parsed weekly-hours bitmaps
+    (5, [lambda con: _backfill_ssot_norms(con)]),
+    # Caller-supplied client key for bulk import/export (upserts match on it)
+    (6, [
+        "ALTER TABLE clients ADD COLUMN external_id TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_external_id ON clients (external_id) WHERE external_id IS NOT NULL",
+    ]),
+    # Persisted change counters for read caches (see VERSIONED_TABLES)
+    (7, [
+        "CREATE TABLE IF NOT EXISTS data_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO data_versions (name, version) VALUES " + ",".join(f"('{t}', 0)" for t in VERSIONED_TABLES),
+    ]),
+    # Each scan links to the client's previous one and each result row carries that scan's verdict for the same
+    # site/field, so reports read "latest vs previous" without joining scan_results to itself
+    (8, [
+        "ALTER TABLE scans ADD COLUMN prev_scan_id INTEGER",
+        "ALTER TABLE scan_results ADD COLUMN prev_match INTEGER",
+        "ALTER TABLE scan_results ADD COLUMN changed INTEGER",
+        lambda con: _backfill_scan_links(con),
+    ]),
+    # NORM_VERSION 3: website keys ignore scheme, "www." and the trailing slash
+    (9, [lambda con: _backfill_ssot_norms(con), lambda con: _bump_version(con, "clients")]),
+    # Scan jobs record the process running them and a heartbeat it refreshes while alive
+    (10, [
+        "ALTER TABLE jobs ADD COLUMN pid INTEGER",
+        "ALTER TABLE jobs ADD COLUMN host TEXT",
+        "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL",
+    ]),
+    # NORM_VERSION 4: overnight bare closing hours ("10pm-2") and unmapped day names in hours keys
+    (11, [lambda con: _backfill_ssot_norms(con), lambda con: _bump_version(con, "clients")]),
+]
+
+def _backfill_scan_links(con: sqlite3.Connection):
+    con.execute(
+        """
+        UPDATE scans SET prev_scan_id = w.prev_id
+        FROM (SELECT id, LAG(id) OVER (PARTITION BY client_id ORDER BY id) AS prev_id FROM scans) w
+        WHERE scans.id = w.id AND w.prev_id IS NOT NULL
+        """
+    )
+    con.execute(
+        """
+        UPDATE scan_results SET prev_match = p.match,
+               changed = (p.value IS NOT scan_results.value OR p.href IS NOT scan_results.href)
+        FROM scans s JOIN scan_results p ON p.scan_id = s.prev_scan_id
+        WHERE s.id = scan_results.scan_id AND p.site = scan_results.site AND p.field = scan_results.field
+        """
+    )
+
+def _open(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=256)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return con
+
+def _migrate(con: sqlite3.Connection):
+    # Each step runs in its own BEGIN IMMEDIATE transaction together with its user_version bump, so a failed step
+    # leaves no half-applied DDL behind, and a second process starting at the same time waits for the write lock
+    # and then sees the bumped version instead of re-running the step.
+    for version, statements in MIGRATIONS:
+        if version <= con.execute("PRAGMA user_version").fetchone()[0]:
+            continue
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            if con.execute("PRAGMA user_version").fetchone()[0] < version:
+                for step in statements:
+                    # Data migrations are callables taking the connection
+                    step(con) if callable(step) else con.execute(step)
+                con.execute(f"PRAGMA user_version={version}")
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+
+def get_conn() -> sqlite3.Connection:
+    # Thread-local pooled connection for the current DB_PATH; migrations run once per process per database
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    con = conns.get(DB_PATH)
+    if con is None:
+        os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+        con = conns[DB_PATH] = _open(DB_PATH)
+    if DB_PATH not in _migrated:
+        with _migrate_lock:
+            if DB_PATH not in _migrated:
+                _migrate(con)
+                _migrated.add(DB_PATH)
+    return con
+
+@contextmanager
+def transaction():
+    # Commit on success, roll back on error; nested use joins the outer transaction
+    con = get_conn()
+    if con.in_transaction:
+        yield con
+        return
+    with con:
+        yield con
+
+def ensure_db():
+    get_conn()
+
+def _cached_read(key: Tuple, version: Tuple, load):
+    # Read-through cache for hot UI reads; an entry is stale once its table's version (or DB_PATH) moved on
+    key = (DB_PATH, *key)
+    with _reads_lock:
+        hit = _reads.get(key)
+        if hit and hit[0] == version:
+            return hit[1]
+    value = load()
+    with _reads_lock:
+        if len(_reads) >= READ_CACHE_MAX:
+            _reads.clear()
+        _reads[key] = (version, value)
+    return value
+
+def clear_read_cache():
+    with _reads_lock:
+        _reads.clear()
+
+def data_version(name: str) -> int:
+    row = get_conn().execute("SELECT version FROM data_versions WHERE name=?", (name,)).fetchone()
+    return row[0] if row else 0
+
+def _bump_version(con: sqlite3.Connection, name: str):
+    # Call inside the write's transaction so the change and the bump commit together
+    con.execute("UPDATE data_versions SET version = version + 1 WHERE name=?", (name,))
+
+def scans_version() -> int:
+    return data_version("scans")
+
+def clients_version() -> int:
+    return data_version("clients")
 
 def list_clients() -> List[Dict[str, Any]]:
-    with sqlite3.connect(DB_PATH) as con:
-        con.row_factory = sqlite3.Row
-        rows = con.execute("SELECT * FROM clients ORDER BY id DESC").fetchall()
-        return [dict(r) for r in rows]
+    rows = get_conn().execute("SELECT * FROM clients ORDER BY id DESC").fetchall()
+    return [dict(r) for r in rows]
+
+def _client_filter(search: str) -> Tuple[str, list]:
+    search = (search or "").strip()
+    if not search:
+        return "", []
+    if search.isdigit():
+        return " WHERE name LIKE ? OR id = ?", [f"%{search}%", int(search)]
+    return " WHERE name LIKE ?", [f"%{search}%"]
+
+def count_clients(search: str = "") -> int:
+    where, args = _client_filter(search)
+    return _cached_read(("count_clients", search), (clients_version(),),
+                        lambda: get_conn().execute(f"SELECT COUNT(*) FROM clients{where}", args).fetchone()[0])
+
+def client_page(search: str = "", page: int = 0, page_size: int = CLIENT_PAGE_SIZE) -> List[Tuple[int, str]]:
+    # (id, name) for one page of clients, newest first, optionally filtered by name (or exact id)
+    where, args = _client_filter(search)
+    load = lambda: [(r["id"], r["name"] or "") for r in get_conn().execute(
+        f"SELECT id, name FROM clients{where} ORDER BY id DESC LIMIT ? OFFSET ?", [*args, page_size, page * page_size])]
+    return _cached_read(("client_page", search, page, page_size), (clients_version(),), load)
 
 def get_client_by_id(cid: int) -> Dict[str, Any]:
-    with sqlite3.connect(DB_PATH) as con:
-        con.row_factory = sqlite3.Row
-        row = con.execute("SELECT * FROM clients WHERE id=?", (cid,)).fetchone()
+    def load():
+        row = get_conn().execute("SELECT * FROM clients WHERE id=?", (cid,)).fetchone()
         return dict(row) if row else {}
+    return dict(_cached_read(("client", cid), (clients_version(),), load))
+
+def list_site_urls(site: str) -> List[Dict[str, Any]]:
+    # [{client_id, name, url}] for every client with a listing URL on this site
+    if site not in SITES:
+        raise ValueError(f"unknown site: {site}")
+    rows = get_conn().execute(
+        f"SELECT id AS client_id, name, url_{site} AS url FROM clients WHERE COALESCE(TRIM(url_{site}), '') != '' ORDER BY id"
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+SSOT_COLS = ["ssot_name", "ssot_address", "ssot_phone", "ssot_website", "ssot_hours"]
+
+def _with_norms(con: sqlite3.Connection, cid, data: Dict[str, Any]) -> Dict[str, Any]:
+    # Normalized SSOT keys are computed at save time so scans and reports never re-normalize the SSOT
+    if not any(k in data for k in SSOT_COLS):
+        return data
+    current = {}
+    if cid:
+        row = con.execute(f"SELECT {','.join(SSOT_COLS)} FROM clients WHERE id=?", (cid,)).fetchone()
+        current = dict(row) if row else {}
+    merged = {**current, **data}
+    return {**data, **ssot_norms({c[len("ssot_"):]: merged.get(c) or "" for c in SSOT_COLS})}
+
+def _backfill_ssot_norms(con: sqlite3.Connection):
+    rows = con.execute(f"SELECT id, {','.join(SSOT_COLS)} FROM clients WHERE norm_version IS NOT ?", (NORM_VERSION,)).fetchall()
+    updates = []
+    for r in rows:
+        n = ssot_norms({c[len("ssot_"):]: r[c] or "" for c in SSOT_COLS})
+        updates.append([n[f"norm_{f}"] for f in FIELDS] + [n["norm_version"], r["id"]])
+    con.executemany(
+        f"UPDATE clients SET {','.join(f'norm_{f}=?' for f in FIELDS)}, norm_version=? WHERE id=?", updates
+    )
 
 def upsert_client(cid, data: Dict[str, Any]) -> int:
-    with sqlite3.connect(DB_PATH) as con:
-        cur = con.cursor()
+    with transaction() as con:
+        data = _with_norms(con, cid, data)
         if cid:
             cols = ",".join([f"{k}=?" for k in data.keys()])
-            cur.execute(f"UPDATE clients SET {cols} WHERE id=?", [*data.values(), cid])
-            con.commit()
-            return cid
+            con.execute(f"UPDATE clients SET {cols} WHERE id=?", [*data.values(), cid])
         else:
             keys = ",".join(data.keys())
             qs = ",".join(["?"]*len(data))
-            cur.execute(f"INSERT INTO clients ({keys}) VALUES ({qs})", list(data.values()))
-            con.commit()
-            return cur.lastrowid
+            cur = con.execute(f"INSERT INTO clients ({keys}) VALUES ({qs})", list(data.values()))
+            cid = cur.lastrowid
+        _bump_version(con, "clients")
+    return cid
+
+CLIENT_COLS = ["external_id", "name", *SSOT_COLS, *[f"url_{s}" for s in SITES]]
+IN_CHUNK = 500  # bound parameters per IN (...) list
+
+def _existing_clients(con: sqlite3.Connection, key: str, values: List[Any]) -> Dict[Any, Dict[str, Any]]:
+    out = {}
+    for i in range(0, len(values), IN_CHUNK):
+        chunk = values[i:i + IN_CHUNK]
+        q = f"SELECT id, external_id, {','.join(SSOT_COLS)} FROM clients WHERE {key} IN ({','.join(['?'] * len(chunk))})"
+        out.update((r[key], dict(r)) for r in con.execute(q, chunk))
+    return out
+
+def _by_columns(items, data=lambda d: d):
+    groups: Dict[Tuple[str, ...], list] = {}
+    for item in items:
+        groups.setdefault(tuple(data(item)), []).append(item)
+    return groups.items()
+
+def import_clients_chunk(rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    # Upsert one chunk in one transaction. Rows hold any subset of CLIENT_COLS (plus optional "id"); a row whose
+    # external_id (or, without one, id) matches a client updates just the columns it carries, the rest are inserted.
+    # Norms are computed from the merged SSOT; repeated keys within the chunk collapse into one write.
+    with transaction() as con:
+        by_ext = _existing_clients(con, "external_id", list({r["external_id"] for r in rows if r.get("external_id")}))
+        by_id = _existing_clients(con, "id", list({r["id"] for r in rows if r.get("id") and not r.get("external_id")}))
+        inserts: Dict[Any, Dict[str, Any]] = {}
+        updates: Dict[int, Dict[str, Any]] = {}
+        for i, r in enumerate(rows):
+            data = {k: v for k, v in r.items() if k in CLIENT_COLS}
+            cur = by_ext.get(data.get("external_id")) if data.get("external_id") else by_id.get(r.get("id"))
+            if cur:
+                target = updates.setdefault(cur["id"], {})
+            else:
+                target = inserts.setdefault(data.get("external_id") or ("row", i), {})
+            target.update(data)
+            if any(c in data for c in SSOT_COLS):
+                merged = {**(cur or {}), **target}
+                target.update(ssot_norms({c[len("ssot_"):]: merged.get(c) or "" for c in SSOT_COLS}))
+        # Rows from one file share their columns, so these are a handful of executemany calls per chunk
+        for cols, group in _by_columns(inserts.values()):
+            con.executemany(f"INSERT INTO clients ({','.join(cols)}) VALUES ({','.join(['?'] * len(cols))})",
+                            [list(d.values()) for d in group])
+        for cols, group in _by_columns(updates.items(), lambda item: item[1]):
+            con.executemany(f"UPDATE clients SET {','.join(f'{k}=?' for k in cols)} WHERE id=?",
+                            [[*d.values(), cid] for cid, d in group])
+        _bump_version(con, "clients")
+    return {"inserted": len(inserts), "updated": len(updates)}
+
+def iter_clients(batch_size: int = 1000) -> Iterable[Dict[str, Any]]:
+    # Streams id + CLIENT_COLS for every client in id order without materializing the table
+    cur = get_conn().execute(f"SELECT id, {','.join(CLIENT_COLS)} FROM clients ORDER BY id")
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            return
+        for r in batch:
+            yield dict(r)
 
 def delete_client(cid: int):
-    with sqlite3.connect(DB_PATH) as con:
+    with transaction() as con:
         con.execute("DELETE FROM clients WHERE id=?", (cid,))
-        con.commit()
+        _bump_version(con, "clients")
 
 def list_xpaths(site: str, field: str):
-    with sqlite3.connect(DB_PATH) as con:
-        con.row_factory = sqlite3.Row
-        rows = con.execute("SELECT * FROM xpaths WHERE site=? AND field=?", (site, field)).fetchall()
-        return [dict(r) for r in rows]
+    load = lambda: [dict(r) for r in get_conn().execute("SELECT * FROM xpaths WHERE site=? AND field=?", (site, field))]
+    return [dict(r) for r in _cached_read(("xpaths", site, field), (xpaths_version(),), load)]
 
 def get_all_xpaths_for_site(site: str):
     # returns dict[field] -> list of {priority, xpath}
-    with sqlite3.connect(DB_PATH) as con:
-        con.row_factory = sqlite3.Row
-        rows = con.execute("SELECT * FROM xpaths WHERE site=? ORDER BY priority ASC", (site,)).fetchall()
-        data = {}
-        for r in rows:
-            data.setdefault(r["field"], []).append({"priority": r["priority"], "xpath": r["xpath"]})
-        return data
+    rows = get_conn().execute("SELECT * FROM xpaths WHERE site=? ORDER BY priority ASC", (site,)).fetchall()
+    data = {}
+    for r in rows:
+        data.setdefault(r["field"], []).append({"priority": r["priority"], "xpath": r["xpath"]})
+    return data
+
+def xpaths_version() -> int:
+    return data_version("xpaths")
 
 def add_xpath(site: str, field: str, priority: int, xpath: str):
-    with sqlite3.connect(DB_PATH) as con:
+    with transaction() as con:
         con.execute("INSERT INTO xpaths (site, field, priority, xpath) VALUES (?,?,?,?)", (site, field, priority, xpath))
-        con.commit()
+        _bump_version(con, "xpaths")
+
+def bulk_add_xpaths(items: Iterable[Dict[str, Any]]):
+    # items: {site, field, priority, xpath}
+    with transaction() as con:
+        con.executemany(
+            "INSERT INTO xpaths (site, field, priority, xpath) VALUES (?,?,?,?)",
+            [(it["site"], it["field"], it.get("priority", 1), it["xpath"]) for it in items],
+        )
+        _bump_version(con, "xpaths")
+
+def set_xpath_priorities(items: Iterable[Tuple[int, int]]):
+    # items: (xpath id, new priority)
+    with transaction() as con:
+        con.executemany("UPDATE xpaths SET priority=? WHERE id=?", [(p, xid) for xid, p in items])
+        _bump_version(con, "xpaths")
 
 def delete_xpath(xid: int):
-    with sqlite3.connect(DB_PATH) as con:
+    with transaction() as con:
         con.execute("DELETE FROM xpaths WHERE id=?", (xid,))
-        con.commit()
+        _bump_version(con, "xpaths")
+
+def get_cached_page(url: str) -> Dict[str, Any]:
+    row = get_conn().execute("SELECT * FROM page_cache WHERE url=?", (url,)).fetchone()
+    return dict(row) if row else {}
+
+def put_cached_page(url: str, content_hash: str, size: int, encoding: str, etag: str, last_modified: str):
+    now = time.time()
+    with transaction() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO page_cache (url, content_hash, size, encoding, etag, last_modified, fetched_at, accessed_at) VALUES (?,?,?,?,?,?,?,?)",
+            (url, content_hash, size, encoding or "", etag or "", last_modified or "", now, now),
+        )
+
+def revalidate_cached_page(url: str):
+    now = time.time()
+    with transaction() as con:
+        con.execute("UPDATE page_cache SET accessed_at=?, fetched_at=? WHERE url=?", (now, now, url))
+
+def touch_cached_pages(touches: Iterable[Tuple[str, float]], db_path: Optional[str] = None):
+    # Batched LRU updates: (url, accessed_at) pairs in one transaction; never moves an entry back in time.
+    # db_path: the database the reads were made against, when DB_PATH may have moved on since (gone: dropped).
+    sql = "UPDATE page_cache SET accessed_at=MAX(COALESCE(accessed_at, 0), ?) WHERE url=?"
+    args = [(at, url) for url, at in touches]
+    if db_path is None or db_path == DB_PATH:
+        with transaction() as con:
+            con.executemany(sql, args)
+        return
+    if not os.path.exists(db_path):
+        return
+    con = _open(db_path)
+    try:
+        with con:
+            con.executemany(sql, args)
+    finally:
+        con.close()
+
+def page_cache_total_size() -> int:
+    # Blobs are content-addressed, so count each hash once
+    row = get_conn().execute(
+        "SELECT COALESCE(SUM(size), 0) FROM (SELECT content_hash, MAX(size) AS size FROM page_cache GROUP BY content_hash)"
+    ).fetchone()
+    return int(row[0] or 0)
+
+def list_cached_pages(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Newest first; read-only listing (doesn't touch accessed_at)
+    sql = "SELECT url, content_hash, size, encoding, fetched_at FROM page_cache ORDER BY fetched_at DESC"
+    rows = get_conn().execute(sql + (" LIMIT ?" if limit else ""), ((limit,) if limit else ())).fetchall()
+    return [dict(r) for r in rows]
+
+def list_cached_pages_lru() -> List[Dict[str, Any]]:
+    rows = get_conn().execute("SELECT url, content_hash, size FROM page_cache ORDER BY accessed_at ASC").fetchall()
+    return [dict(r) for r in rows]
+
+def delete_cached_page(url: str) -> bool:
+    # Returns True when no other URL still references the deleted entry's blob
+    with transaction() as con:
+        row = con.execute("SELECT content_hash FROM page_cache WHERE url=?", (url,)).fetchone()
+        if not row:
+            return False
+        con.execute("DELETE FROM page_cache WHERE url=?", (url,))
+        left = con.execute("SELECT COUNT(*) FROM page_cache WHERE content_hash=?", (row[0],)).fetchone()[0]
+        return left == 0
+
+def clear_page_cache():
+    with transaction() as con:
+        con.execute("DELETE FROM page_cache")
+
+SCAN_RESULT_COLS = ["scan_id", "client_id", "site", "field", "url", "value", "href", "match", "content_hash", "plan_hash",
+                    "scanned_at", "prev_match", "changed"]
+
+def insert_scan_results(rows: Iterable[Dict[str, Any]]):
+    # Bulk insert of prepared result rows (each carrying scan_id and client_id)
+    with transaction() as con:
+        con.executemany(
+            f"INSERT INTO scan_results ({','.join(SCAN_RESULT_COLS)}) VALUES ({','.join(['?']*len(SCAN_RESULT_COLS))})",
+            ([r.get(c) for c in SCAN_RESULT_COLS] for r in rows),
+        )
+
+def _linked_rows(con: sqlite3.Connection, prev_id: Optional[int], rows: Iterable[Dict[str, Any]]):
+    # Stamp each row with the previous scan's match for its site/field and whether value/href moved since
+    before = {(p["site"], p["field"]): p for p in con.execute(
+        "SELECT site, field, match, value, href FROM scan_results WHERE scan_id=?", (prev_id,))} if prev_id else {}
+    for r in rows:
+        p = before.get((r["site"], r["field"]))
+        yield {**r, "prev_match": p["match"] if p else None,
+               "changed": int(bool(p) and (p["value"] != r.get("value") or p["href"] != r.get("href")))}
+
+def save_scans(scans: Iterable[Dict[str, Any]]) -> List[int]:
+    # Many scans in one transaction; each item: {client_id, mode, ssot_hash, started_at, rows}
+    ids = []
+    now = time.time()
+    with transaction() as con:
+        for s in scans:
+            prev_id = con.execute("SELECT MAX(id) FROM scans WHERE client_id=?", (s["client_id"],)).fetchone()[0]
+            scan_id = con.execute(
+                "INSERT INTO scans (client_id, mode, ssot_hash, started_at, finished_at, prev_scan_id) VALUES (?,?,?,?,?,?)",
+                (s["client_id"], s["mode"], s["ssot_hash"], s["started_at"], now, prev_id),
+            ).lastrowid
+            insert_scan_results({**r, "scan_id": scan_id, "client_id": s["client_id"]}
+                                for r in _linked_rows(con, prev_id, s["rows"]))
+            ids.append(scan_id)
+        _bump_version(con, "scans")
+    return ids
+
+def last_scan_results(client_id: int) -> Dict[str, Any]:
+    # Latest scan of a client: {"scan": {...}, "rows": [...]}; empty dict when never scanned
+    con = get_conn()
+    scan = con.execute("SELECT * FROM scans WHERE client_id=? ORDER BY id DESC LIMIT 1", (client_id,)).fetchone()
+    if not scan:
+        return {}
+    rows = con.execute("SELECT * FROM scan_results WHERE scan_id=?", (scan["id"],)).fetchall()
+    return {"scan": dict(scan), "rows": [dict(r) for r in rows]}
+
+def list_scans(client_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+    rows = get_conn().execute(
+        """
+        SELECT s.id, s.mode, s.started_at, s.finished_at,
+               COUNT(r.id) AS fields, COALESCE(SUM(r.match), 0) AS matches
+        FROM scans s LEFT JOIN scan_results r ON r.scan_id = s.id
+        WHERE s.client_id=? GROUP BY s.id ORDER BY s.id DESC LIMIT ?
+        """,
+        (client_id, limit),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+def portfolio_results(details: bool = False, changed_only: bool = False, since_scan_id: int = 0,
+                      limit: Optional[int] = None) -> Dict[str, list]:
+    # Every client's latest scan result rows with the previous scan's verdict (stamped at save time), returned
+    # column-wise (one list per column) so reports build a DataFrame without per-row dicts. The default is the lean
+    # numeric set for aggregation, with site/field as indexes into SITES/FIELDS (no per-row strings); details returns
+    # them as text and adds names, URLs, values and the previous values; changed_only keeps rows whose match or value
+    # moved; since_scan_id only returns clients whose latest scan is newer than that (incremental refresh); limit
+    # returns the first rows by change (regressed, fixed, changed, new), then client, site, field.
+    code = lambda col, names: f"CASE {col} " + " ".join(f"WHEN '{n}' THEN {i}" for i, n in enumerate(names)) + " END"
+    keys = "r.site, r.field" if details else f"{code('r.site', SITES)} AS site, {code('r.field', FIELDS)} AS field"
+    extra = """, c.name AS client_name, r.url, r.value, r.href, p.value AS prev_value, p.href AS prev_href,
+               r.scanned_at""" if details else ""
+    joins = """LEFT JOIN clients c ON c.id = r.client_id
+        JOIN scans s ON s.id = k.scan_id
+        LEFT JOIN scan_results p
+            ON p.client_id = r.client_id AND p.site = r.site AND p.field = r.field AND p.scan_id = s.prev_scan_id""" if details else ""
+    rows_from = "latest k JOIN scan_results r ON r.scan_id = k.scan_id"
+    where = "WHERE r.changed OR r.prev_match IS NOT r.match" if changed_only else ""
+    if limit:
+        # Pick the rows first, so names and previous values are only joined for the ones returned
+        order = """CASE WHEN r.prev_match = 1 AND r.match = 0 THEN 0 WHEN r.prev_match = 0 AND r.match = 1 THEN 1
+                        WHEN r.prev_match IS NULL THEN 3 ELSE 2 END"""
+        rows_from = f"""(SELECT r.id, k.scan_id FROM {rows_from} {where}
+                          ORDER BY {order}, r.client_id, {code('r.site', SITES)}, {code('r.field', FIELDS)}
+                          LIMIT {int(limit)}) k
+                        JOIN scan_results r ON r.id = k.id"""
+        where = ""
+    cur = get_conn().cursor()
+    cur.row_factory = None
+    cur.execute(
+        f"""
+        WITH latest AS (
+            SELECT client_id, MAX(id) AS scan_id FROM scans WHERE client_id IN (SELECT id FROM clients)
+            GROUP BY client_id HAVING MAX(id) > ?
+        )
+        SELECT r.client_id, k.scan_id, {keys}, r.match, r.prev_match, COALESCE(r.changed, 0) AS changed{extra}
+        FROM {rows_from}
+        {joins}
+        {where}
+        """,
+        (since_scan_id,),
+    )
+    cols = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    return {c: list(v) for c, v in zip(cols, zip(*rows))} if rows else {c: [] for c in cols}
+
+def _columns(sql: str, ids: Optional[List[int]], key: str = "client_id") -> Dict[str, list]:
+    # Column-wise result of sql; "{ids}" marks where the optional "AND <key> IN (...)" filter goes (run in id chunks)
+    cur = get_conn().cursor()
+    cur.row_factory = None
+    rows: list = []
+    for i in range(0, len(ids), IN_CHUNK) if ids is not None else [None]:
+        chunk = ids[i:i + IN_CHUNK] if i is not None else []
+        filt = f"AND {key} IN ({','.join(['?'] * len(chunk))})" if i is not None else ""
+        rows += cur.execute(sql.format(ids=filt), chunk).fetchall()
+    cols = [d[0] for d in cur.description] if cur.description else []
+    return {c: list(v) for c, v in zip(cols, zip(*rows))} if rows else {c: [] for c in cols}
+
+def latest_result_rows(client_ids: Optional[List[int]] = None) -> Dict[str, list]:
+    # Result rows of every (or these) client's latest scan, for re-scoring against the current SSOT
+    return _columns(
+        """
+        WITH latest AS (SELECT client_id, MAX(id) AS scan_id FROM scans WHERE 1 {ids} GROUP BY client_id)
+        SELECT r.id, r.client_id, r.field, r.value, r.href, r.match
+        FROM latest k JOIN scan_results r ON r.scan_id = k.scan_id
+        """,
+        client_ids,
+    )
+
+def client_ssot_rows(client_ids: Optional[List[int]] = None) -> Dict[str, list]:
+    # id, SSOT columns and their stored norm_<field> keys for every (or these) client
+    cols = ",".join(["id", "norm_version", *SSOT_COLS, *(f"norm_{f}" for f in FIELDS)])
+    return _columns(f"SELECT {cols} FROM clients WHERE 1 {{ids}}", client_ids, key="id")
+
+def set_result_matches(updates: Iterable[Tuple[int, int]]) -> int:
+    # (match, scan_results id) pairs, e.g. from re-scoring; one transaction
+    updates = list(updates)
+    if updates:
+        with transaction() as con:
+            con.executemany("UPDATE scan_results SET match=? WHERE id=?", updates)
+            _bump_version(con, "scans")
+            # Rows of clients not rescanned changed too: report frames must rebuild, not refresh incrementally
+            _bump_version(con, "clients")
+    return len(updates)
+
+def last_scan_id() -> int:
+    return get_conn().execute("SELECT COALESCE(MAX(id), 0) FROM scans").fetchone()[0]
+
+def clients_scanned_since(scan_id: int) -> List[int]:
+    return [r[0] for r in get_conn().execute("SELECT DISTINCT client_id FROM scans WHERE id > ?", (scan_id,))]
+
+def client_names(ids: Iterable[int]) -> Dict[int, str]:
+    ids = list(ids)
+    out: Dict[int, str] = {}
+    for i in range(0, len(ids), 500):  # stay under SQLite's bound-parameter limit
+        chunk = ids[i:i + 500]
+        q = f"SELECT id, name FROM clients WHERE id IN ({','.join(['?'] * len(chunk))})"
+        out.update((r["id"], r["name"] or "") for r in get_conn().execute(q, chunk))
+    return out
+
+def create_jobs(client_ids: Iterable[int], options: Dict[str, Any], worker: str, pid: int, host: str) -> List[int]:
+    now = time.time()
+    opts = json.dumps(options or {})
+    with transaction() as con:
+        return [
+            con.execute(
+                "INSERT INTO jobs (client_id, status, options, worker, pid, host, submitted_at, heartbeat_at) "
+                "VALUES (?,?,?,?,?,?,?,?)",
+                (cid, "queued", opts, worker, pid, host, now, now),
+            ).lastrowid
+            for cid in client_ids
+        ]
+
+def update_job(job_id: int, **fields):
+    cols = ",".join([f"{k}=?" for k in fields.keys()])
+    with transaction() as con:
+        con.execute(f"UPDATE jobs SET {cols} WHERE id=?", [*fields.values(), job_id])
+
+def save_job_site(job_id: int, site: str, status: str, fetch_s: float, latency_s: float, result: Dict[str, Any]):
+    with transaction() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO job_sites (job_id, site, status, fetch_s, latency_s, result, finished_at) VALUES (?,?,?,?,?,?,?)",
+            (job_id, site, status, fetch_s, latency_s, json.dumps(result), time.time()),
+        )
+
+def list_jobs(client_id=None, limit: int = 20) -> List[Dict[str, Any]]:
+    if client_id:
+        rows = get_conn().execute("SELECT * FROM jobs WHERE client_id=? ORDER BY id DESC LIMIT ?", (client_id, limit)).fetchall()
+    else:
+        rows = get_conn().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(r) for r in rows]
+
+def get_job_sites(job_id: int) -> List[Dict[str, Any]]:
+    rows = get_conn().execute("SELECT * FROM job_sites WHERE job_id=? ORDER BY finished_at", (job_id,)).fetchall()
+    out = []
+    for r in rows:
+        d = dict(r)
+        d["result"] = json.loads(d["result"] or "{}")
+        out.append(d)
+    return out
+
+def heartbeat_jobs(worker: str) -> int:
+    with transaction() as con:
+        return con.execute(
+            "UPDATE jobs SET heartbeat_at=? WHERE status IN ('queued','running') AND worker=?", (time.time(), worker),
+        ).rowcount
+
+def interrupt_stale_jobs(max_age: float) -> int:
+    # Jobs queued/running whose process stopped heartbeating (max_age seconds) will never finish; mark them so the
+    # UI stops waiting. Rows from before heartbeats fall back to their start/submit time.
+    now = time.time()
+    with transaction() as con:
+        return con.execute(
+            "UPDATE jobs SET status='interrupted', finished_at=? WHERE status IN ('queued','running') "
+            "AND COALESCE(heartbeat_at, started_at, submitted_at, 0) < ?",
+            (now, now - max_age),
+        ).rowcount
+
+def yaml_defaults_mtime() -> float:
+    try:
+        return os.path.getmtime(DEFAULTS_YAML)
+    except OSError:
+        return 0.0
 
 def load_yaml_defaults():
     if not os.path.exists(DEFAULTS_YAML):
@@ -0,0 +1,219 @@
+import time, random, threading
+import requests
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from typing import Dict, Any, Optional, Tuple
+
+from src import page_cache, metrics
+from src.engine import host_key, get_breaker, get_scheduler, HostScheduler
+from src.parsing import MAX_PAGE_BYTES, charset_from_content_type, sniff_encoding
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    # urllib3 advertises "br" only when a brotli decoder is installed, so we never request what we can't decode
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+CONNECT_TIMEOUT = 5.0   # TCP/TLS handshake
+READ_TIMEOUT = 15.0     # max silence between bytes of the response
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+FETCH_DEADLINE = 40.0   # wall-clock budget per URL, including retries and backoff sleeps
+
+# Transient failures are retried with exponential backoff + full jitter; Retry-After (429/503) overrides the backoff,
+# and anything longer than MAX_RETRY_WAIT is left to the host's circuit breaker instead of sleeping on it.
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+MAX_RETRY_WAIT = 10.0
+# Failure kinds that are retried and count against the host's breaker; 403 ("blocked") from a listing site is
+# usually bot blocking rather than a missing page. 404s and the like mean the host is healthy.
+TRANSIENT_ERRORS = {"timeout", "connection", "rate_limited", "server_error", "blocked"}
+RETRY_ERRORS = TRANSIENT_ERRORS - {"blocked"}
+CHUNK_SIZE = 64 * 1024
+POOL_HOSTS = 32     # distinct hosts kept in the pool manager
+POOL_PER_HOST = 8   # keep-alive connections per host
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    # One process-wide Session: keep-alive connections are reused across fetches, one pool per host
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers.update(HEADERS)
+            _session = s
+        return _session
+
+def _result(url: str, status: int, content: bytes = b"", encoding: str = "", content_hash: str = "",
+            not_modified: bool = False, from_cache: bool = False, truncated: bool = False,
+            error: str = "", detail: str = "", retry_after: float = 0.0) -> Dict[str, Any]:
+    # error is "" on success, else one of: timeout, connection, rate_limited, server_error, blocked, http_error,
+    # empty, circuit_open, invalid_url, error
+    return {
+        "url": url,
+        "ok": bool(content),
+        "status": status,
+        "content": content,
+        "encoding": encoding,
+        "content_hash": content_hash,
+        "not_modified": not_modified,
+        "from_cache": from_cache,
+        "truncated": truncated,
+        "error": error,
+        "detail": detail,
+        "retry_after": retry_after,
+        "attempts": 0,
+    }
+
+def failure(url: str, error: str, detail: str = "", status: int = 0, retry_after: float = 0.0) -> Dict[str, Any]:
+    return _result(url, status, error=error, detail=detail, retry_after=retry_after)
+
+def _status_error(status: int) -> str:
+    if status == 429:
+        return "rate_limited"
+    if status >= 500:
+        return "server_error"
+    if status == 403:
+        return "blocked"
+    return "http_error"
+
+def parse_retry_after(value: str) -> float:
+    # Retry-After is either delta-seconds or an HTTP date
+    value = (value or "").strip()
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return 0.0
+
+def backoff_delay(attempt: int, retry_after: float = 0.0) -> float:
+    # Full jitter: uniform in [0, base * 2^(attempt-1)], capped; the server's Retry-After wins when it is longer
+    return max(retry_after, random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))))
+
+def _read_capped(resp, max_bytes: int, deadline: Optional[float] = None):
+    # Stream the body into one buffer, stopping at the per-page ceiling. READ_TIMEOUT only bounds the gap between
+    # chunks, so a server trickling bytes is cut off at the fetch deadline instead.
+    buf = bytearray()
+    for chunk in resp.iter_content(CHUNK_SIZE):
+        buf += chunk
+        if len(buf) >= max_bytes:
+            return bytes(buf[:max_bytes]), True
+        if deadline is not None and time.monotonic() > deadline:
+            raise requests.exceptions.ReadTimeout(f"body not received within {FETCH_DEADLINE:.0f}s")
+    return bytes(buf), False
+
+def cache_hit(url: str, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # A fresh page-cache entry as a fetch result; None when it's stale or its blob is gone
+    if not entry.get("fresh") or page_cache.body(entry) is None:
+        return None
+    metrics.inc("fetch_total", site=host_key(url), outcome="cache")
+    return _result(url, 200, entry["body"], entry.get("encoding",""), entry["content_hash"], from_cache=True)
+
+def cached_page(url: str, ttl: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    # -> (fresh page-cache hit as a fetch result or None, the cache entry to hand to fetch_page for revalidation)
+    entry = page_cache.get(url, ttl)
+    return cache_hit(url, entry), entry
+
+def _get(url: str, cached: Dict[str, Any], deadline: float, site: str = "") -> Dict[str, Any]:
+    # One network attempt -> result dict; exceptions become structured failures.
+    # requests exposes no DNS/connect split, so TTFB covers both on a new connection (and neither on a reused one).
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        t = time.perf_counter()
+        with get_session().get(url, headers=headers, timeout=TIMEOUT, stream=True) as resp:
+            metrics.observe("ttfb_seconds", time.perf_counter() - t, site=site)
+            status = resp.status_code
+            if status == 304 and cached:
+                body = page_cache.body(cached)
+                if body is None:  # the blob went away since the lookup: ask for the page itself
+                    return _get(url, {}, deadline, site)
+                page_cache.revalidated(url)
+                return _result(url, 304, body, cached.get("encoding",""), cached["content_hash"], not_modified=True)
+            if status != 200:
+                return failure(url, _status_error(status), resp.reason or "", status,
+                               parse_retry_after(resp.headers.get("Retry-After", "")))
+            t = time.perf_counter()
+            content, truncated = _read_capped(resp, MAX_PAGE_BYTES, deadline)
+            metrics.observe("download_seconds", time.perf_counter() - t, site=site)
+            metrics.inc("fetch_bytes_total", len(content), site=site)
+            resp_headers = resp.headers
+    except requests.exceptions.Timeout as e:
+        return failure(url, "timeout", str(e))
+    except requests.exceptions.ConnectionError as e:
+        return failure(url, "connection", str(e))
+    except (requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema, requests.exceptions.InvalidURL) as e:
+        return failure(url, "invalid_url", str(e))
+    except Exception as e:
+        return failure(url, "error", f"{type(e).__name__}: {e}")
+    if not content:
+        return failure(url, "empty", "empty response body", status)
+
+    encoding = sniff_encoding(content, charset_from_content_type(resp_headers.get("Content-Type", "")))
+    try:
+        h = page_cache.put(url, content, encoding, resp_headers.get("ETag", ""), resp_headers.get("Last-Modified", ""))
+    except Exception:
+        h = page_cache.content_hash(content)
+    return _result(url, 200, content, encoding, h, truncated=truncated)
+
+def fetch_page(url: str, force_refresh: bool = False, ttl: Optional[float] = None,
+               max_retries: int = MAX_RETRIES, scheduler: Optional[HostScheduler] = None,
+               cached: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Read through the page cache: fresh hit -> no request; stale hit -> conditional GET; force_refresh -> plain GET.
+    # Network attempts go through the host's circuit breaker and are retried on transient failures until
+    # FETCH_DEADLINE; the result always carries "error"/"detail" (empty on success) and "attempts".
+    # Retries wait for a politeness slot on the host's scheduler, backing off by at least its min_interval.
+    # cached: the entry from an earlier cached_page() lookup, so the index and blob aren't read again.
+    host = host_key(url)
+    cached = {} if force_refresh else (page_cache.get(url, ttl) if cached is None else cached)
+    if cached.get("fresh"):
+        hit = cache_hit(url, cached)
+        if hit:
+            return hit
+        cached = {}  # blob gone: fetch the page again
+
+    breaker = get_breaker()
+    scheduler = scheduler or get_scheduler()
+    deadline = time.monotonic() + FETCH_DEADLINE
+    attempt = 0
+    while True:
+        if not breaker.allow(host):
+            wait = breaker.blocked_for(host)
+            res = failure(url, "circuit_open", f"{host or url} paused for {wait:.0f}s after repeated failures",
+                          retry_after=wait)
+            break
+        attempt += 1
+        res = _get(url, cached, deadline, host)
+        if res["error"] not in TRANSIENT_ERRORS:
+            breaker.record_success(host)  # includes 404s etc.: the host itself answered fine
+            break
+        breaker.record_failure(host, res["retry_after"] if res["status"] in (429, 503) else 0.0)
+        delay = max(float(scheduler.limit_for(host)["min_interval"]), backoff_delay(attempt, res["retry_after"]))
+        if res["error"] not in RETRY_ERRORS or attempt > max_retries or res["retry_after"] > MAX_RETRY_WAIT \
+                or time.monotonic() + delay >= deadline:
+            break
+        scheduler.defer(host, delay)
+        metrics.observe("politeness_delay_seconds", scheduler.wait_turn(host), site=host)
+    res["attempts"] = attempt
+    metrics.inc("fetch_total", site=host, outcome=res["error"] or ("not_modified" if res["not_modified"] else "ok"))
+    return res
+
+def decode(res: Dict[str, Any]) -> str:
+    try:
+        return res["content"].decode(res.get("encoding") or "utf-8", errors="replace")
+    except LookupError:
+        return res["content"].decode("utf-8", errors="replace")
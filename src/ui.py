@@ -0,0 +1,34 @@
+import math
+import streamlit as st
+from typing import Dict, Optional, Tuple
+
+from src.storage import count_clients, client_page, clear_read_cache, CLIENT_PAGE_SIZE
+from src.extraction import clear_plans
+
+# Shared Streamlit widgets. The client picker reads one page of (id, name) at a time through the storage read
+# cache, so reruns stay cheap however many clients there are; callers load the selected client's row themselves.
+
+def reload_button(key: str = "reload"):
+    # Cached reads already follow writes from other processes (see storage.VERSIONED_TABLES); this drops them all
+    # anyway, e.g. after editing the database by hand
+    if st.button("🔄 Reload", key=key, help="Re-read clients, XPaths and scans from the database"):
+        from src import report  # pandas-backed; only loaded when reloading
+        clear_read_cache()
+        clear_plans()
+        report.clear()
+
+def client_picker(label: str, key: str, page_size: int = CLIENT_PAGE_SIZE) -> Tuple[Optional[int], Dict[str, int]]:
+    # -> (selected client id or None, {label: id} for the page shown)
+    cols = st.columns([3, 1])
+    search = cols[0].text_input("Search clients", key=f"{key}_search", placeholder="name or ID")
+    total = count_clients(search)
+    pages = max(1, math.ceil(total / page_size))
+    page = cols[1].number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                                key=f"{key}_page_{search}") if pages > 1 else 1
+    options = {f"{name} (ID {cid})": cid for cid, name in client_page(search, int(page) - 1, page_size)}
+    if not options:
+        st.caption("No clients match.")
+        return None, options
+    st.caption(f"{total} client(s)" + (f", showing {len(options)} on page {page}" if pages > 1 else ""))
+    choice = st.selectbox(label, list(options.keys()), key=f"{key}_choice_{search}_{page}")
+    return options.get(choice), options
@@ -1,16 +1,55 @@
+import re
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
 SITES = ["google", "apple", "bing", "yelp", "yahoo"]
 FIELDS = ["name", "address", "phone", "website", "hours"]
 
 def canonicalize_site_key(url: str) -> str:
-    url = (url or "").lower()
-    if "yelp." in url:
-        return "yelp"
-    if "google." in url:
-        return "google"
-    if "apple." in url:
-        return "apple"
-    if "bing." in url:
-        return "bing"
-    if "yahoo." in url:
-        return "yahoo"
-    return ""
+    # Listing site owning the URL's host ("www.yelp.com", "maps.apple.com", "google.co.uk"), or "". Only the host
+    # counts: a query or path naming another site ("?q=yelp.com") must not reclassify the URL.
+    url = (url or "").strip().lower()
+    try:
+        host = urlparse(url if "//" in url else "//" + url).hostname or ""
+    except ValueError:
+        return ""
+    labels = host.split(".")[:-1]
+    return next((site for site in SITES if site in labels), "")
+
+# Query params that only attribute a visit; dropped when listing URLs are grouped into pages
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|gclsrc|dclid|fbclid|msclkid|yclid|mc_cid|mc_eid|_ga|_gl|igshid)$", re.I)
+
+def canonical_url(url: str, drop_tracking: bool = False, strict: bool = False) -> str:
+    # Stable cache/dedup key: lowercase scheme+host, no default port or fragment, sorted query params.
+    # A URL that doesn't parse (e.g. http://host:abc/) comes back as given, or raises ValueError when strict.
+    url = (url or "").strip()
+    if not url:
+        return ""
+    try:
+        u = urlparse(url)
+        port = u.port  # parsed lazily: a bad port only raises here
+    except ValueError:
+        if strict:
+            raise
+        return url
+    scheme = (u.scheme or "https").lower()
+    host = (u.hostname or "").lower()
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    params = parse_qsl(u.query, keep_blank_values=True)
+    if drop_tracking:
+        params = [(k, v) for k, v in params if not TRACKING_PARAMS.match(k)]
+    query = urlencode(sorted(params))
+    return urlunparse((scheme, host, u.path or "/", u.params, query, ""))
+
+def norm_ws(s: str) -> str:
+    return re.sub(r"\s+", " ", (s or "").strip())
+
+def canonical_href(h: str) -> str:
+    if not h:
+        return ""
+    try:
+        u = urlparse(h.strip())
+        # Strip tracking params; keep scheme/host/path
+        return urlunparse((u.scheme, u.netloc, u.path, "", "", ""))
+    except Exception:
+        return h.strip()
@@ -0,0 +1,174 @@
+import re, time
+from itertools import permutations
+from typing import Dict, Any, List, Optional, Tuple
+
+from src import page_cache
+from src.extraction import get_plan, DocEvaluator, ExtractionPlan, node_text, node_anchor
+from src.parsing import parse_bytes
+from src.storage import list_xpaths, set_xpath_priorities, bulk_add_xpaths
+from src.utils import FIELDS
+
+# Fallback-chain cost analysis: replay cached pages through each site/field chain, measure every expression on
+# every page, then search for the order with the lowest expected cost that still yields the same value per page.
+SAMPLE_PAGES = 50
+REPEATS = 3             # evaluations per expression and page; the fastest one counts
+EXACT_SEARCH_MAX = 7    # chains up to this length are searched exhaustively, longer ones greedily
+MIN_SAVING = 0.05       # suggest a reorder only when it cuts expected cost by at least this fraction (noise floor)
+
+_HINTS = [
+    (re.compile(r"//\*\[[^\]]*contains\(\s*\.\s*,"), "string value of every element is scanned"),
+    (re.compile(r"(following|preceding)(-sibling)?::"), "document-order axis walks the rest of the page"),
+    (re.compile(r"^//\*"), "starts from all elements"),
+    (re.compile(r"\btext\(\)\s*\)"), "text() inside a predicate"),
+]
+
+def cost_hints(xpath: str) -> List[str]:
+    # Static red flags, shown next to the measured numbers
+    return [msg for rx, msg in _HINTS if rx.search(xpath or "")]
+
+def _chains(plan: ExtractionPlan, field: str) -> List[Tuple[str, str, List[Dict[str, Any]]]]:
+    # (page type, source, steps) as extract_all would pick them
+    if field in plan.overrides:
+        return [("", "db", plan.overrides[field])]
+    if plan.page_types:
+        return [(pt["name"], "yaml", pt["fields"].get(field, [])) for pt in plan.page_types]
+    return [("", "yaml", plan.fields.get(field, []))]
+
+def _value(field: str, node):
+    if field == "website":
+        a = node_anchor(node)
+        return (a["anchor"], a["href"]) if (a["anchor"] or a["href"]) else None
+    return node_text(node) or None
+
+def _measure(doc, field: str, steps: List[Dict[str, Any]], repeats: int):
+    values, costs = [], []
+    for step in steps:
+        best, val = float("inf"), None
+        for _ in range(max(1, repeats)):
+            ev = DocEvaluator(doc)  # fresh memo: each expression pays its own way
+            t = time.perf_counter()
+            node = ev.first(step)
+            best = min(best, time.perf_counter() - t)
+            val = _value(field, node)
+        values.append(val)
+        costs.append(best)
+    return values, costs
+
+def expected_cost(order: List[int], values: List[List[Any]], costs: List[List[float]]) -> float:
+    # Mean over pages of the time spent until the first hit (all steps when nothing hits)
+    if not values:
+        return 0.0
+    total = 0.0
+    for vals, cs in zip(values, costs):
+        for i in order:
+            total += cs[i]
+            if vals[i] is not None:
+                break
+    return total / len(values)
+
+def _winners(order: List[int], values: List[List[Any]]) -> List[Any]:
+    return [next((vals[i] for i in order if vals[i] is not None), None) for vals in values]
+
+def _must_precede(values: List[List[Any]], n: int) -> Dict[int, set]:
+    # i must stay ahead of j (i < j) when some page has both hitting with different values
+    before: Dict[int, set] = {j: set() for j in range(n)}
+    for i in range(n):
+        for j in range(i + 1, n):
+            if any(v[i] is not None and v[j] is not None and v[i] != v[j] for v in values):
+                before[j].add(i)
+    return before
+
+def best_order(values: List[List[Any]], costs: List[List[float]]) -> List[int]:
+    n = len(values[0]) if values else 0
+    current = list(range(n))
+    if n < 2:
+        return current
+    before = _must_precede(values, n)
+    valid = lambda order: all(before[j] <= set(order[:k]) for k, j in enumerate(order))
+    if n <= EXACT_SEARCH_MAX:
+        best, best_cost = current, expected_cost(current, values, costs)
+        for order in permutations(range(n)):
+            order = list(order)
+            if valid(order):
+                c = expected_cost(order, values, costs)
+                if c < best_cost - 1e-9:
+                    best, best_cost = order, c
+        return best
+    # Greedy: cheapest cost per hit first, among steps whose required predecessors are placed
+    mean_cost = [sum(cs[i] for cs in costs) / len(costs) for i in range(n)]
+    hit_rate = [sum(v[i] is not None for v in values) / len(values) for i in range(n)]
+    order: List[int] = []
+    while len(order) < n:
+        ready = [i for i in range(n) if i not in order and before[i] <= set(order)]
+        order.append(min(ready, key=lambda i: (mean_cost[i] / max(hit_rate[i], 1e-6), i)))
+    return order if expected_cost(order, values, costs) < expected_cost(current, values, costs) else current
+
+def analyze_site(site: str, limit: int = SAMPLE_PAGES, repeats: int = REPEATS,
+                 fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    # -> {"site", "pages", "chains": [...]}; one chain per field (per Yelp page type when the YAML applies)
+    plan = get_plan(site)
+    docs = []
+    for p in page_cache.stored_pages(site, limit):
+        doc = parse_bytes(p["body"], p.get("encoding", ""), plan.keep_tags)
+        if doc is not None:
+            pt = plan.page_type(doc).get("name", "") if plan.page_types else ""
+            docs.append((pt, doc))
+
+    chains = []
+    for field in fields or FIELDS:
+        for pt, source, steps in _chains(plan, field):
+            sample = [d for t, d in docs if not pt or t == pt] if source == "yaml" else [d for _, d in docs]
+            values, costs = [], []
+            for doc in sample:
+                v, c = _measure(doc, field, steps, repeats)
+                values.append(v)
+                costs.append(c)
+            current = list(range(len(steps)))
+            order = best_order(values, costs) if sample else current
+            cur_ms, new_ms = 1000 * expected_cost(current, values, costs), 1000 * expected_cost(order, values, costs)
+            if new_ms > cur_ms * (1 - MIN_SAVING):
+                order, new_ms = current, cur_ms
+            wins = _winners(current, values)
+            rows = []
+            for i, step in enumerate(steps):
+                hits = sum(v[i] is not None for v in values)
+                won = sum(1 for v in values if v[i] is not None and all(v[k] is None for k in range(i)))
+                rows.append({
+                    "position": i + 1, "priority": step["priority"], "xpath": step["xpath"],
+                    "valid": step["compiled"] is not None,
+                    "hit_rate": round(hits / len(sample), 3) if sample else None,
+                    "wins": won,
+                    "mean_ms": round(1000 * sum(c[i] for c in costs) / len(costs), 4) if costs else None,
+                    "max_ms": round(1000 * max(c[i] for c in costs), 4) if costs else None,
+                    "suggested_position": order.index(i) + 1,
+                    "hints": cost_hints(step["xpath"]),
+                })
+            chains.append({
+                "site": site, "field": field, "page_type": pt, "source": source, "pages": len(sample),
+                "steps": rows, "order": order, "current_ms": round(cur_ms, 4), "suggested_ms": round(new_ms, 4),
+                "saving_pct": round(100 * (cur_ms - new_ms) / cur_ms, 1) if cur_ms else 0.0,
+                "preserves_results": _winners(order, values) == wins,
+                "changed": order != current,
+            })
+    return {"site": site, "pages": len(docs), "chains": chains}
+
+def can_apply(chain: Dict[str, Any]) -> bool:
+    # Yelp page-type chains live in default_xpaths.yaml; a DB override would replace the field for every page type
+    return chain["changed"] and chain["preserves_results"] and not chain["page_type"]
+
+def apply_order(chain: Dict[str, Any]) -> int:
+    # DB chains get new priorities; YAML chains are copied into the xpaths table in the suggested order (DB rows
+    # override the YAML for that site/field). Returns the number of rows written.
+    if not can_apply(chain):
+        raise ValueError("this chain has no applicable reordering")
+    site, field, order = chain["site"], chain["field"], chain["order"]
+    if chain["source"] == "db":
+        rows = sorted((r for r in list_xpaths(site, field) if (r.get("xpath") or "").strip()),
+                      key=lambda r: (r["priority"], r["id"]))
+        if [r["xpath"].strip() for r in rows] != [s["xpath"] for s in chain["steps"]]:
+            raise ValueError("XPaths changed since the analysis; re-run it")
+        set_xpath_priorities((rows[i]["id"], pos + 1) for pos, i in enumerate(order))
+        return len(rows)
+    bulk_add_xpaths({"site": site, "field": field, "priority": pos + 1, "xpath": chain["steps"][i]["xpath"]}
+                    for pos, i in enumerate(order))
+    return len(order)
@@ -0,0 +1,11 @@
+import pytest
+
+from src import storage, page_cache
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # Fresh SQLite database and page cache per test
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setattr(page_cache, "CACHE_DIR", str(tmp_path / "page_cache"))
+    yield storage
+    page_cache.flush_touches()  # into this test's database, not whichever DB_PATH is current at exit
@@ -0,0 +1,56 @@
+import io, json
+
+from src import bulk
+from src.matching import compare
+
+CSV = """external_id,name,ssot_phone,ssot_website,url_yelp
+a1,Acme,+44 20 7946 0958,www.acme.co.uk/,https://www.yelp.com/biz/acme
+a2,Bee,(415) 555-0100,,
+a3,Cee,123,,https://www.google.com/maps/place/cee
+,,,,
+a4,Dee,,,
+"""
+
+def _import(db, text, **kw):
+    return bulk.import_clients(io.BytesIO(text.encode("utf-8")), "csv", **kw)
+
+def test_import_validates_rows_and_writes_in_chunks(db):
+    chunks = []
+    out = _import(db, CSV, chunk_size=2, on_chunk=lambda o: chunks.append(o["inserted"]))
+    assert (out["rows"], out["valid"], out["inserted"], out["failed"]) == (5, 3, 3, 2)
+    assert chunks == [2, 3]  # one full chunk, then the final flush
+    errors = {e["line"]: e["error"] for e in out["errors"]}
+    assert "ssot_phone" in errors[4] and "this is a google URL, not yelp" in errors[4]
+    assert errors[5] == "needs a name, external_id or id"
+    assert db.count_clients() == 3
+
+def test_import_keeps_country_code(db):
+    _import(db, CSV)
+    acme = next(c for c in db.iter_clients() if c["external_id"] == "a1")
+    assert acme["ssot_phone"] == "+442079460958"
+    assert acme["ssot_website"] == "https://www.acme.co.uk/"
+    assert compare("phone", {"value": "+44 20 7946 0958"}, {"phone": acme["ssot_phone"]})
+
+def test_upsert_by_external_id_leaves_missing_columns(db):
+    _import(db, CSV)
+    out = _import(db, "external_id,name\na1,Acme Ltd\na9,New\n")
+    assert (out["inserted"], out["updated"]) == (1, 1)
+    acme = next(c for c in db.iter_clients() if c["external_id"] == "a1")
+    assert acme["name"] == "Acme Ltd" and acme["ssot_phone"] == "+442079460958"
+
+def test_dry_run_writes_nothing(db):
+    out = _import(db, CSV, dry_run=True)
+    assert out["valid"] == 3 and db.count_clients() == 0
+
+def test_export_reimports_as_updates(db):
+    _import(db, CSV)
+    before = sorted((c["external_id"], c["name"], c["ssot_phone"], c["url_yelp"]) for c in db.iter_clients())
+    for fmt in bulk.FORMATS:
+        buf = io.StringIO()
+        assert bulk.export_clients(buf, fmt) == 3
+        if fmt == "jsonl":
+            assert {json.loads(line)["external_id"] for line in buf.getvalue().splitlines()} == {"a1", "a2", "a4"}
+        out = bulk.import_clients(io.BytesIO(buf.getvalue().encode("utf-8")), fmt)
+        assert (out["inserted"], out["updated"], out["failed"]) == (0, 3, 0)
+    after = sorted((c["external_id"], c["name"], c["ssot_phone"], c["url_yelp"]) for c in db.iter_clients())
+    assert after == before
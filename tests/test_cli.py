@@ -0,0 +1,26 @@
+import argparse
+
+import pytest
+
+from src.cli import parse_shard, select_clients, build_parser
+
+CLIENTS = [{"id": i, "name": f"Client {i}"} for i in (7, 1, 12, 3, 40, 41, 5, 100, 2)]
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 7])
+def test_shards_are_disjoint_and_complete(n):
+    shards = [select_clients(CLIENTS, shard=parse_shard(f"{i}/{n}")) for i in range(n)]
+    ids = [c["id"] for shard in shards for c in shard]
+    assert sorted(ids) == sorted(c["id"] for c in CLIENTS) and len(ids) == len(set(ids))
+    assert all([c["id"] for c in shard] == sorted(c["id"] for c in shard) for shard in shards)
+
+def test_shard_combines_with_other_filters():
+    shard = parse_shard("1/2")
+    assert [c["id"] for c in select_clients(CLIENTS, ids=[1, 2, 3, 41], shard=shard)] == [1, 3, 41]
+    assert [c["id"] for c in select_clients(CLIENTS, name_contains="client 4", shard=shard)] == [41]
+
+@pytest.mark.parametrize("spec", ["2/2", "-1/3", "0/0", "1", "a/b"])
+def test_invalid_shard_specs(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_shard(spec)
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["scan", "--shard", spec])
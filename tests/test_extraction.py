@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from lxml import html
+
+from src.extraction import DocEvaluator, compile_steps, get_plan, clear_plans
+
+NESTED = html.fromstring(
+    "<html><body><div><div>inner</div>outer</div><p><span> </span><span>a<b>b</b></span>tail</p>"
+    "<ul><li><ul><li>deep</li></ul>shallow</li><li>next</li></ul></body></html>"
+)
+
+@pytest.mark.parametrize("xpath", [
+    "//div/text()", "//div//text()", "//span/text()", "//span//text()", "//p//text()",
+    "//li/text()", "//li//text()", "//ul//li//text()", "(//li)[2]//text()", "//section//text()",
+])
+def test_shared_prefix_matches_full_expression(xpath):
+    # Evaluate a related expression first so any shared prefix is served from the memo
+    ev = DocEvaluator(NESTED)
+    ev.first(compile_steps(["//div//text()", "//li//text()"])[0])
+    expected = NESTED.xpath(xpath)
+    assert ev.first(compile_steps([xpath])[0]) == (expected[0] if expected else None)
+
+def test_plan_is_rebuilt_on_xpath_change_and_yaml_mtime(db, tmp_path, monkeypatch):
+    yml = tmp_path / "defaults.yaml"
+    yml.write_text("google:\n  name:\n    - {priority: 1, xpath: '//h1/text()'}\n")
+    monkeypatch.setattr(db, "DEFAULTS_YAML", str(yml))
+    db.ensure_db()
+    clear_plans()
+    plan = get_plan("google")
+    assert get_plan("google") is plan
+    assert [s["xpath"] for s in plan.fallbacks("name")] == ["//h1/text()"]
+
+    db.add_xpath("google", "name", 1, "//h2/text()")
+    overridden = get_plan("google")
+    assert overridden is not plan and overridden.fingerprint != plan.fingerprint
+    assert [s["xpath"] for s in overridden.fallbacks("name")] == ["//h2/text()"]
+    assert get_plan("google") is overridden
+
+    yml.write_text("google:\n  phone:\n    - {priority: 1, xpath: '//a[@class=\"tel\"]/text()'}\n")
+    mtime = os.path.getmtime(yml) + 10
+    os.utime(yml, (mtime, mtime))  # same-second writes wouldn't move the mtime on coarse filesystems
+    edited = get_plan("google")
+    assert edited is not overridden
+    assert [s["xpath"] for s in edited.fallbacks("phone")] == ['//a[@class="tel"]/text()']
+    clear_plans()
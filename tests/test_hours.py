@@ -0,0 +1,40 @@
+import pytest
+
+from src.hours import parse_hours, hours_similarity, format_hours
+from src.matching import compare
+
+def days(text: str):
+    return format_hours(parse_hours(text)).split("; ")
+
+def test_day_ranges_and_lists():
+    assert days("Mon–Fri 9am–5pm, Sat 10-2") == [
+        "Mon 09:00-17:00", "Tue 09:00-17:00", "Wed 09:00-17:00", "Thu 09:00-17:00", "Fri 09:00-17:00",
+        "Sat 10:00-14:00", "Sun closed"]
+    assert days("Weekends 10am-4pm")[5:] == ["Sat 10:00-16:00", "Sun 10:00-16:00"]
+
+@pytest.mark.parametrize("text, monday", [
+    ("Daily 9-5", "Mon 09:00-17:00"),
+    ("Daily 9-5pm", "Mon 09:00-17:00"),
+    ("Daily 11:30 a.m. to 9:30 p.m.", "Mon 11:30-21:30"),
+    ("Daily noon to midnight", "Mon 12:00-24:00"),
+    ("Open 24 hours", "Mon 00:00-24:00"),
+])
+def test_time_grammar(text, monday):
+    assert days(text)[0] == monday
+
+def test_overnight_spills_into_next_day():
+    assert days("Fri 6pm-2am")[4:6] == ["Fri 18:00-24:00", "Sat 00:00-02:00"]
+    assert days("Fri 10pm-2")[4:6] == ["Fri 22:00-24:00", "Sat 00:00-02:00"]
+
+def test_closed_and_unparseable():
+    assert parse_hours("Sun closed") == 0
+    assert parse_hours("call for appointment") is None
+
+@pytest.mark.parametrize("text", ["Mo-Fr 09:00-17:00", "Lun-Ven 9-17", "Sa, Su 10-14"])
+def test_unrecognized_days_dont_default_to_every_day(text):
+    assert parse_hours(text) is None
+
+def test_hours_compare():
+    assert compare("hours", {"value": "Monday-Friday 9:00 AM - 5:00 PM"}, {"hours": "Mon–Fri 9am–5pm"})
+    assert not compare("hours", {"value": "Mon-Fri 9am-5pm"}, {"hours": "Mon-Fri 10am-6pm"})
+    assert hours_similarity(parse_hours("Mon 9-5"), parse_hours("Mon 9-5")) == 1.0
@@ -0,0 +1,59 @@
+import pytest
+
+import pandas as pd
+
+from src.matching import (compare, keys_match, address_key, numeric_split, normalize_phone, phone_key,
+                          website_key, compare_column, KEY_FUNCS)
+
+@pytest.mark.parametrize("extracted, ssot", [
+    ("123 Main St", "125 Main St"),
+    ("123 Main St Apt 4", "123 Main St Apt 5"),
+    ("123 Main St, Springfield, IL 62704", "123 Main St, Springfield, IL 62705"),
+    ("12 Main St", "123 Main St"),
+])
+def test_address_numbers_must_match_exactly(extracted, ssot):
+    assert not compare("address", {"value": extracted}, {"address": ssot})
+
+@pytest.mark.parametrize("extracted, ssot", [
+    ("123 North Main Street, Suite 4B, Springfield, Illinois 62704-1234, USA", "123 N Main St #4B, Springfield IL 62704"),
+    ("123 Main St, Springfeld, IL 62704", "123 Main Street, Springfield, Illinois 62704"),
+])
+def test_address_fuzzy_on_words(extracted, ssot):
+    assert compare("address", {"value": extracted}, {"address": ssot})
+
+def test_numeric_split():
+    assert numeric_split(address_key("123 Main St Apt 4B, Springfield IL 62704")) == \
+        (("123", "4b", "62704"), "main st unit springfield il")
+
+def test_name_numbers_must_match():
+    assert compare("name", {"value": "Acme Dental"}, {"name": "Acme Dentl"})
+    assert not compare("name", {"value": "Acme Dental 12"}, {"name": "Acme Dental 13"})
+
+def test_exact_threshold_disables_fuzzy():
+    assert not keys_match("address", "123 main st", "123 main str", {"address": 1.0})
+
+def test_phone_forms():
+    assert normalize_phone("415.555.0100") == "(415) 555-0100"
+    assert phone_key("(415) 555-0100") == phone_key("+1 415 555 0100") == "+14155550100"
+    assert phone_key("123") == "123"
+    assert compare("phone", {"value": "415-555-0100"}, {"phone": "(415) 555 0100"})
+
+def test_website_key_ignores_scheme_www_and_trailing_slash():
+    assert website_key("HTTPS://www.Example.com/") == website_key("http://example.com") == "example.com"
+    assert website_key("https://example.com/about/?utm_source=x") == "example.com/about"
+    assert keys_match("website", website_key("example.com/about"), website_key("http://www.example.com/about/"))
+    assert website_key("https://example.com/a") != website_key("https://example.com/b")
+    assert website_key("https://shop.example.com") != website_key("https://example.com")
+
+@pytest.mark.parametrize("field, pairs", [
+    ("name", [("Acme Coffee", "ACME  coffee"), ("Acme Coffee Co", "Acme Coffee"), ("Acme 2", "Acme 3"), ("", "")]),
+    ("address", [("123 Main St", "123 Main Street"), ("123 Main St", "125 Main St"), ("", "1 A St")]),
+    ("phone", [("(212) 555-0100", "+1 212 555 0100"), ("212-555-0100", "212-555-0101"), ("", "")]),
+    ("website", [("https://www.acme.com/", "acme.com"), ("https://acme.com/a", "acme.com/b")]),
+    ("hours", [("Mon-Fri 9am-5pm", "Monday-Friday 09:00-17:00"), ("Mon 9-5", "Tue 9-5"), ("", "")]),
+])
+def test_compare_column_agrees_with_compare(field, pairs):
+    raw = pd.Series([a for a, _ in pairs])
+    ssot = pd.Series([KEY_FUNCS[field](b) for _, b in pairs])
+    scalar = [compare(field, {"value": a, "href": a}, {field: b}) for a, b in pairs]
+    assert compare_column(field, raw, ssot).tolist() == scalar
@@ -0,0 +1,95 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import page_cache
+from src.engine import HostScheduler, host_key
+from src.transport import cached_page, fetch_page
+
+@pytest.fixture
+def not_modified_server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = b"<html><body>hello</body></html>"
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}/page"
+    srv.shutdown()
+
+def test_hits_batch_lru_touches(db, monkeypatch):
+    page_cache.put("https://example.com/a", b"body")
+    writes = []
+    monkeypatch.setattr(page_cache, "touch_cached_pages", lambda touches, db_path: writes.append((db_path, list(touches))))
+    for _ in range(5):
+        assert page_cache.body(page_cache.get("https://example.com/a")) == b"body"
+    assert writes == []
+    page_cache.flush_touches()
+    assert len(writes) == 1 and writes[0][0] == db.DB_PATH and [u for u, _ in writes[0][1]] == ["https://example.com/a"]
+
+def test_stale_entry_reads_blob_once_on_304(db, not_modified_server, monkeypatch):
+    url = not_modified_server
+    scheduler = HostScheduler({host_key(url): {"concurrency": 1, "min_interval": 0.0}})
+    assert fetch_page(url, scheduler=scheduler)["status"] == 200
+    reads = []
+    real = page_cache._read_blob
+    monkeypatch.setattr(page_cache, "_read_blob", lambda h: reads.append(h) or real(h))
+
+    hit, entry = cached_page(url, ttl=0)
+    assert hit is None and "body" not in entry
+    res = fetch_page(url, ttl=0, scheduler=scheduler, cached=entry)
+    assert res["not_modified"] and res["content"] == b"<html><body>hello</body></html>"
+    assert len(reads) == 1
+
+def test_pending_touches_go_to_the_database_they_were_read_from(db, tmp_path, monkeypatch):
+    page_cache.put("https://example.com/a", b"body")
+    with db.transaction() as con:
+        con.execute("UPDATE page_cache SET accessed_at=0")
+    first = db.DB_PATH
+    page_cache.get("https://example.com/a")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "other.db"))
+    page_cache.flush_touches()
+    monkeypatch.setattr(db, "DB_PATH", first)
+    assert db.get_cached_page("https://example.com/a")["accessed_at"] > 0
+    assert not (tmp_path / "other.db").exists()
+
+def test_concurrent_writes_of_the_same_body(db, monkeypatch):
+    # Both writers open their temp file before either renames it into place
+    body = b"<html>same listing page</html>"
+    urls = ["https://example.com/a", "https://example.com/b"]
+    both_writing = threading.Barrier(len(urls))
+    compress = page_cache.gzip.compress
+
+    def compress_together(data, **kw):
+        both_writing.wait()
+        return compress(data, **kw)
+
+    monkeypatch.setattr(page_cache.gzip, "compress", compress_together)
+    errors = []
+
+    def put(url):
+        try:
+            page_cache.put(url, body)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(u,)) for u in urls]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert all(page_cache.body(page_cache.get(u)) == body for u in urls)
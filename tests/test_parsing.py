@@ -0,0 +1,24 @@
+from src.parsing import parse_bytes, tags_referenced, FEED_CHUNK
+
+PAGE = (b"<html><head><script>var x = 1;</script><script type='application/ld+json'>{\"name\": \"Acme\"}</script>"
+        b"</head><body><h1>Acme<svg><text>icon</text></svg> Coffee</h1><noscript>enable js</noscript></body></html>")
+
+def test_prunes_script_and_svg_unless_an_xpath_reads_them():
+    doc = parse_bytes(PAGE, keep_tags=tags_referenced(["//h1//text()"]))
+    assert not doc.xpath("//script | //svg | //noscript")
+    assert doc.xpath("string(//h1)") == "Acme Coffee"  # the tail after a dropped element survives
+
+    keep = tags_referenced(["//script[@type='application/ld+json']/text()", "//h1//text()"])
+    assert keep == {"script"}
+    doc = parse_bytes(PAGE, keep_tags=keep)
+    assert doc.xpath("//script[@type='application/ld+json']/text()") == ['{"name": "Acme"}']
+    assert not doc.xpath("//svg")
+
+    assert parse_bytes(PAGE).xpath("count(//script | //svg | //noscript)") == 4  # keep_tags=None: nothing pruned
+
+def test_parse_stops_at_byte_ceiling():
+    filler = b"<p>" + b"x" * (3 * FEED_CHUNK) + b"</p>"
+    page = b"<html><body><h1>Acme</h1>" + filler + b"<h2>past the ceiling</h2></body></html>"
+    doc = parse_bytes(page, keep_tags=frozenset(), max_bytes=2 * FEED_CHUNK)
+    assert doc.xpath("//h1/text()") == ["Acme"] and not doc.xpath("//h2")
+    assert parse_bytes(page, keep_tags=frozenset()).xpath("//h2/text()") == ["past the ceiling"]
@@ -0,0 +1,36 @@
+import time
+
+from src import report
+
+def _scan(db, client_id, value, match):
+    row = {"site": "google", "field": "name", "url": "u", "value": value, "match": match, "scanned_at": time.time()}
+    db.save_scans([{"client_id": client_id, "mode": "full", "ssot_hash": "", "started_at": time.time(), "rows": [row]}])
+
+def test_latest_scan_carries_previous_verdict(db):
+    db.import_clients_chunk([{"external_id": "a", "name": "A"}, {"external_id": "b", "name": "B"}])
+    a, b = sorted(r[0] for r in db.client_page())
+    _scan(db, a, "Acme", 1)
+    _scan(db, b, "Bee", 1)
+    report.clear()
+    assert report.load()["prev_match"].isna().all()
+    assert report.changes(limit=None)["change"].tolist() == ["new", "new"]
+
+    _scan(db, a, "Acme Inc", 0)
+    rows = report.load(details=True, changed_only=True).sort_values("client_id")  # refreshed incrementally
+    assert rows[["client_id", "prev_value", "value", "prev_match", "match"]].fillna(-1).values.tolist() == [
+        [a, "Acme", "Acme Inc", 1.0, 0], [b, -1, "Bee", -1, 1]]
+    assert report.changes()["change"].tolist() == ["regressed", "new"]
+
+    _scan(db, a, "Acme Inc", 0)
+    assert report.changes(limit=None)["client_id"].tolist() == [b]
+    assert sorted(report.load()["client_id"]) == [a, b]
+
+def test_rescore_follows_ssot_edit(db):
+    db.import_clients_chunk([{"external_id": "a", "name": "A", "ssot_name": "Acme Coffee"}])
+    (cid, *_), = db.client_page()
+    _scan(db, cid, "Bee Bakery", 0)
+    assert report.rescore() == 0
+    db.upsert_client(cid, {"ssot_name": "Bee Bakery"})
+    assert report.rescore([cid]) == 1
+    assert report.load()["match"].tolist() == [1]
+    assert report.rescore() == 0
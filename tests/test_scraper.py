@@ -0,0 +1,83 @@
+from src import engine, scraper
+
+PAGE = {"ok": True, "url": "https://example.com/", "content": b"<html><body><h1>Acme</h1></body></html>",
+        "encoding": "utf-8", "content_hash": "abc"}
+
+def test_extracted_fields_are_cached_per_content_and_plan(db, monkeypatch):
+    calls = []
+    real = scraper.extract_all
+    monkeypatch.setattr(scraper, "extract_all", lambda *a, **kw: calls.append(1) or real(*a, **kw))
+    monkeypatch.setattr(scraper, "_extracted", type(scraper._extracted)())
+
+    first = scraper.extracted_for_result(PAGE, "google")
+    first["name"]["match"] = True  # callers annotate their copy
+    again = scraper.extracted_for_result(PAGE, "google")
+    assert len(calls) == 1 and "match" not in again["name"]
+
+    scraper.extracted_for_result({**PAGE, "content_hash": "def"}, "google")
+    assert len(calls) == 2
+
+def test_scan_queues_every_fetch_before_serving_cache_hits(db, monkeypatch):
+    from src import page_cache
+    from src.engine import HostScheduler
+    page_cache.put("https://example.com/cached", PAGE["content"])
+    events = []
+
+    class Scheduler(HostScheduler):
+        def submit(self, url, fn, *args, **kwargs):
+            events.append(("fetch", url))
+            return super().submit(url, lambda *a, **kw: (scraper.failure(url, "timeout"), 0.0))
+
+    clients = [{"id": 1, "url_google": "https://example.com/cached"},
+               {"id": 2, "url_google": "https://example.com/a"}, {"id": 3, "url_yelp": "https://example.com/b"}]
+    outs = scraper.scan_clients(clients, scheduler=Scheduler({}),
+                                on_site=lambda i, site, data: events.append(("done", data["_meta"]["url"])))
+    assert [kind for kind, _ in events][:3] == ["fetch", "fetch", "done"]
+    assert events[2] == ("done", "https://example.com/cached")
+    assert outs[0]["google"]["_meta"]["status"] == 200 and outs[1]["google"]["_meta"]["error"] == "timeout"
+
+def test_malformed_port_is_a_per_url_failure():
+    pages, rejected = scraper.plan_scan([{"url_google": "http://example.com:abc/", "url_yelp": "https://example.com/b"}])
+    assert list(pages) == [("yelp", "https://example.com/b")]
+    assert rejected[(0, "google")]["error"] == "invalid_url"
+    assert scraper.canonical_url("http://example.com:abc/") == "http://example.com:abc/"
+
+def test_site_is_classified_by_host_only():
+    url = "https://www.google.com/maps/place/Acme/?q=yelp.com"
+    pages, rejected = scraper.plan_scan([{"url_google": url, "url_yelp": "https://www.yelp.com/biz/acme?ref=google.com"}])
+    assert not rejected and [site for site, _ in pages] == ["google", "yelp"]
+    assert engine.host_key(url) == "google"
+    assert engine.host_key("https://example.com/?next=bing.com") == "example.com"
+    assert scraper.canonicalize_site_key("maps.apple.com/place?q=x") == "apple"
+
+def test_incremental_rescan_reuses_values_of_unchanged_pages(db, monkeypatch):
+    from src.engine import HostScheduler
+    db.import_clients_chunk([{"external_id": "a", "name": "Acme", "ssot_name": "Acme",
+                              "url_google": "https://www.google.com/maps/place/acme"}])
+    (cid, *_), = db.client_page()
+    page = {**PAGE, "url": "https://www.google.com/maps/place/acme", "status": 200}
+
+    class Scheduler(HostScheduler):
+        def submit(self, url, fn, *args, **kwargs):
+            return super().submit(url, lambda *a, **kw: (page, 0.0))
+
+    def scan(incremental=True):
+        out = scraper.scan_clients([db.get_client_by_id(cid)], scheduler=Scheduler({}), force_refresh=True,
+                                   incremental=incremental, record=True)
+        return out[0]["google"]
+
+    first = scan(incremental=False)
+    assert first["name"]["value"] == "Acme" and first["name"]["match"] and not first["_meta"]["reused"]
+
+    parses = []
+    monkeypatch.setattr(scraper, "extract_all", lambda *a, **kw: parses.append(1) or {})
+    monkeypatch.setattr(scraper, "_extracted", type(scraper._extracted)())
+    again = scan()
+    assert again["_meta"]["reused"] and not parses
+    assert again["name"] == {"value": "Acme", "match": True}
+
+    db.upsert_client(cid, {"ssot_name": "Bee Bakery"})  # SSOT moved: reused values are re-compared, still unparsed
+    assert scan()["name"] == {"value": "Acme", "match": False} and not parses
+
+    page = {**page, "content_hash": "changed"}
+    assert not scan()["_meta"]["reused"] and parses == [1]
@@ -0,0 +1,35 @@
+import sqlite3, subprocess, sys
+import pytest
+
+def test_failed_migration_step_rolls_back(db, monkeypatch):
+    migrations = db.MIGRATIONS
+    version, steps = migrations[-1]
+    monkeypatch.setattr(db, "MIGRATIONS", [*migrations[:-1], (version, [*steps, "CREATE BOGUS"])])
+    with pytest.raises(Exception):
+        db.ensure_db()
+    con = sqlite3.connect(db.DB_PATH)
+    assert con.execute("PRAGMA user_version").fetchone()[0] == version - 1
+    con.close()
+
+    monkeypatch.setattr(db, "MIGRATIONS", migrations)
+    db._migrated.discard(db.DB_PATH)
+    db.ensure_db()  # no "duplicate column" from the rolled-back ALTER TABLE
+    assert db.get_conn().execute("PRAGMA user_version").fetchone()[0] == version
+
+def test_reads_see_writes_from_other_processes(db):
+    db.ensure_db()
+    assert db.count_clients() == 0
+    code = ("from src import storage; storage.DB_PATH = %r; "
+            "storage.import_clients_chunk([{'external_id': 'x1', 'name': 'Acme'}])" % db.DB_PATH)
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert db.count_clients() == 1
+    assert db.client_page()[0][1] == "Acme"
+
+def test_only_jobs_without_recent_heartbeat_are_interrupted(db):
+    live = db.create_jobs([1], {}, "live-worker", 100, "host-a")[0]
+    dead = db.create_jobs([2], {}, "dead-worker", 200, "host-b")[0]
+    db.update_job(dead, heartbeat_at=0.0)
+    assert db.heartbeat_jobs("live-worker") == 1
+    assert db.interrupt_stale_jobs(60.0) == 1
+    status = {j["id"]: (j["status"], j["pid"], j["host"]) for j in db.list_jobs()}
+    assert status == {live: ("queued", 100, "host-a"), dead: ("interrupted", 200, "host-b")}
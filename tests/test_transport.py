@@ -0,0 +1,79 @@
+import threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import engine
+from src.engine import HostScheduler, CircuitBreaker
+from src.transport import fetch_page, _read_capped
+
+@pytest.fixture
+def rate_limited_server():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(time.monotonic())
+            self.send_response(429)  # no Retry-After
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}/", hits
+    srv.shutdown()
+
+def test_retries_respect_host_min_interval(db, rate_limited_server, monkeypatch):
+    url, hits = rate_limited_server
+    monkeypatch.setattr(engine, "_breaker", CircuitBreaker(failures=10))
+    host = engine.host_key(url)
+    scheduler = HostScheduler({host: {"concurrency": 1, "min_interval": 0.3}})
+    res = fetch_page(url, max_retries=2, scheduler=scheduler)
+    assert res["error"] == "rate_limited" and res["attempts"] == 3
+    gaps = [b - a for a, b in zip(hits, hits[1:])]
+    assert len(gaps) == 2 and min(gaps) >= 0.3
+    assert engine.get_breaker().snapshot()[host]["failures"] == 3
+
+def test_scheduler_caps_concurrency_and_spaces_starts_per_host(monkeypatch):
+    monkeypatch.setattr(engine, "JITTER", 0.0)
+    scheduler = HostScheduler({"google": {"concurrency": 2, "min_interval": 0.05},
+                               "yelp": {"concurrency": 1, "min_interval": 0.2}})
+    lock, running, peak, starts = threading.Lock(), {}, {}, {}
+
+    def job(host):
+        with lock:
+            starts.setdefault(host, []).append(time.monotonic())
+            running[host] = running.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), running[host])
+        time.sleep(0.15)
+        with lock:
+            running[host] -= 1
+
+    futs = [scheduler.submit(f"https://www.google.com/maps/place/{i}", job, "google") for i in range(6)]
+    futs += [scheduler.submit(f"https://www.yelp.com/biz/{i}", job, "yelp") for i in range(3)]
+    for f in futs:
+        f.result()
+    scheduler.shutdown()
+    assert peak == {"google": 2, "yelp": 1}
+    for host, interval in (("google", 0.05), ("yelp", 0.2)):
+        gaps = [b - a for a, b in zip(starts[host], starts[host][1:])]
+        assert min(gaps) >= interval - 0.02  # starts are recorded after the sleep, which may overshoot
+    # yelp's first request doesn't queue behind google's: it starts before google's pool frees a worker
+    assert starts["yelp"][0] < starts["google"][2]
+
+def test_body_read_stops_at_byte_ceiling():
+    class Resp:
+        def __init__(self):
+            self.chunks_read = 0
+
+        def iter_content(self, size):
+            for _ in range(100):
+                self.chunks_read += 1
+                yield b"x" * 1000
+
+    resp = Resp()
+    body, truncated = _read_capped(resp, 2500)
+    assert body == b"x" * 2500 and truncated and resp.chunks_read == 3
+    assert _read_capped(Resp(), 10 ** 6) == (b"x" * 100_000, False)
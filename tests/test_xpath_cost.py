@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from src.xpath_cost import best_order, expected_cost, _winners, EXACT_SEARCH_MAX
+
+def sample(rng: random.Random, pages: int, steps: int):
+    # Each step misses, or hits with one of a few values, so chains both agree and conflict across pages
+    values = [[rng.choice([None, None, "a", "b", "c"]) for _ in range(steps)] for _ in range(pages)]
+    costs = [[rng.uniform(0.1, 5.0) for _ in range(steps)] for _ in range(pages)]
+    return values, costs
+
+@pytest.mark.parametrize("steps", [2, 4, EXACT_SEARCH_MAX, EXACT_SEARCH_MAX + 2])  # exhaustive and greedy search
+def test_best_order_never_changes_a_winning_value(steps):
+    rng = random.Random(steps)
+    for _ in range(40):
+        values, costs = sample(rng, rng.randint(1, 12), steps)
+        order = best_order(values, costs)
+        assert sorted(order) == list(range(steps))
+        assert _winners(order, values) == _winners(list(range(steps)), values)
+        assert expected_cost(order, values, costs) <= expected_cost(list(range(steps)), values, costs) + 1e-9
+
+def test_cheap_step_moves_ahead_when_it_never_disagrees():
+    values = [["x", "x"], [None, "y"], ["z", None]]
+    costs = [[4.0, 1.0]] * 3
+    assert best_order(values, costs) == [1, 0]
+    values[0][1] = "other"  # now the order decides page 0's value
+    assert best_order(values, costs) == [0, 1]